@@ -0,0 +1,113 @@
+"""
+Benchmark of building and rendering each figure/ entry of outbreak reports
+
+Usage: python benchmarks/figures.py [--rows N] [--repeat R] [configs ...]
+
+Builds a synthetic linelist with N rows (default 100,000) and the columns
+used by the bundled outbreak configurations, then reports for each figure/
+entry the median time taken by the plot function (build) and by
+render_figure() (render). Entries which cannot be built, because a column
+is missing or a plot function does not accept the arguments given by the
+configuration of a past outbreak, are reported with their error.
+"""
+
+import time
+import argparse
+import functools
+import statistics
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from olm.util import read_yaml
+from olm.outbreaks import METHOD, OUTBREAKS_PATH, get_plot_method, render_figure
+
+
+def synthetic_linelist(rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    dates = pd.date_range("2024-01-01", "2025-06-30")
+
+    def choice(values: list, missing: float = 0.0) -> pd.Series:
+        return pd.Series(rng.choice(values, rows)).mask(rng.random(rows) < missing)
+
+    def random_dates(missing: float = 0.1) -> pd.Series:
+        return choice(dates, missing)
+
+    return pd.DataFrame(
+        {
+            "ID": np.arange(rows).astype(str),
+            "Case_status": choice(["confirmed", "confirmed", "probable", "suspected"]),
+            "Outcome": choice(["recovered", "death"], 0.2),
+            "Age": choice(["0-4", "20-29", "35", "40-44", ">65"], 0.2),
+            "Gender": choice(["male", "female"], 0.2),
+            "Location_Admin0": choice(
+                ["Burundi", "Uganda", "Democratic Republic of the Congo"]
+            ),
+            "Location_Admin1": choice(["Ohio", "Wyoming", "Texas", "Colorado"]),
+            "Location_District": choice(["Bata", "Ebebiyin", "Evinayong"]),
+            "Contact_animal": choice(["COMMERCIAL", "BACKYARD"], 0.2),
+            "Contact_animal_species": choice(["Cow", "Poultry", "Birds"], 0.2),
+            "Genomics_Genotype": choice(["B3.13", "D1.1"], 0.2),
+            "Symptoms": choice(["fever, cough", "conjunctivitis", "rash; fever"], 0.2),
+            "Occupation": choice(["farm worker", "veterinarian"], 0.2),
+            "Date_onset": random_dates(),
+            "Date_onset_estimated": random_dates(),
+            "Date_confirmation": random_dates(),
+            "Date_entry": random_dates(0),
+            "Date_report_source_I": random_dates(),
+            "Date_of_first_consult": random_dates(0.5),
+            "Date_death": random_dates(0.9),
+        }
+    )
+
+
+def timed(f, repeat: int):
+    times = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        result = f()
+        times.append(time.perf_counter() - start_time)
+    return result, statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "configs", nargs="*", type=Path, default=sorted(OUTBREAKS_PATH.glob("*.yml"))
+    )
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    df = synthetic_linelist(args.rows)
+
+    print(f"{'entry':<60}{'build':>10}{'render':>10}")
+    total = 0.0
+    for config in args.configs:
+        # plot entries are read directly, as configurations of past
+        # outbreaks do not have all attributes required by Outbreak
+        plots = read_yaml(config).get("plots", {})
+        for plot, kwargs in plots.items():
+            plot_type, _, *plot_info = plot.split("/")
+            kwargs = kwargs or {}
+            if plot_type != "figure" or "dataset" in kwargs or "datasets" in kwargs:
+                continue
+            name = f"{config.stem}:{plot}"
+            proc = plot_info[0] if plot_info else get_plot_method(plot)
+            try:
+                fig, build = timed(
+                    functools.partial(METHOD[proc], df, **kwargs), args.repeat
+                )
+            except (KeyError, AttributeError, TypeError) as e:
+                print(f"{name:<60}  {type(e).__name__}: {e}"[:120])
+                continue
+            _, render = timed(functools.partial(render_figure, fig, plot), args.repeat)
+            total += build + render
+            print(f"{name:<60}{build * 1000:8.1f}ms{render * 1000:8.1f}ms")
+    print(f"{'total':<60}{total * 1000:18.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Benchmark of CSV reader backends on a synthetic linelist
+
+Usage: python benchmarks/read_csv.py [--rows N] [--file FILE] [readers ...]
+
+Writes a linelist with N rows (default 2 million) to FILE, unless it
+already exists, then reports the time each reader takes to parse it and
+checks that the result is identical to the pandas reader.
+"""
+
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from olm.readers import READERS
+
+BATCH_ROWS = 500_000
+
+
+def write_linelist(file: Path, rows: int):
+    for start in range(0, rows, BATCH_ROWS):
+        n = min(BATCH_ROWS, rows - start)
+        rng = np.random.default_rng(start)
+        columns = {
+            "ID": np.arange(start, start + n).astype(str),
+            "Case_status": rng.choice(
+                ["confirmed", "probable", "suspected", "NK", ""], n
+            ),
+            "Location_Admin0": rng.choice(
+                ["Democratic Republic of the Congo", "Burundi", "Uganda", "N/K"], n
+            ),
+            "Age": rng.choice(["20-29", "0", "NA", "30-39", ""], n),
+            "Gender": rng.choice(["male", "female", ""], n),
+            "Date_onset": rng.choice(["2024-01-02", "2024-03-05", ""], n),
+            "Symptoms": rng.choice(
+                ["fever, rash", 'rash, "lesions"', "fever\ncough", ""], n
+            ),
+        }
+        for i in range(13):
+            columns[f"Column_{i}"] = rng.integers(0, 10**6, n).astype(str)
+        pd.DataFrame(columns).to_csv(
+            file, index=False, mode="a" if start else "w", header=not start
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("readers", nargs="*", default=list(READERS))
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument(
+        "--file", type=Path, default=Path(tempfile.gettempdir()) / "olm-benchmark.csv"
+    )
+    args = parser.parse_args()
+    if not args.file.exists():
+        write_linelist(args.file, args.rows)
+    print(f"{args.file}: {args.file.stat().st_size / 1024**2:,.0f} MiB")
+
+    expected = READERS["pandas"](args.file)
+    for name in args.readers:
+        start_time = time.perf_counter()
+        df = READERS[name](args.file)
+        elapsed = time.perf_counter() - start_time
+        pd.testing.assert_frame_equal(df, expected)
+        print(f"{name:<10}{elapsed:8.2f}s  {len(df) / elapsed:12,.0f} rows/s")
+        del df
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,13 @@
 import sys
 import argparse
+import datetime
 import webbrowser
 from pathlib import Path
 
-import requests
 from dotenv import load_dotenv
 
-from .util import msg_ok, msg_fail, bold_brackets
-from .outbreaks import OUTBREAKS, OUTBREAKS_PATH, Outbreak
+from .console import msg_ok, msg_fail, bold_brackets
+from .registry import OUTBREAKS, OUTBREAKS_PATH, get_metadata
 
 load_dotenv()
 
@@ -21,10 +21,13 @@ against a provided schema.
 
 olm is organised into subcommands:
 
+  [backfill]    rebuilds dated briefing reports from linelist snapshots
   [get]         saves linelist data to disk
   [lint]        lints (checks) an outbreak linelist for errors
   [list]        lists G.h outbreaks that olm supports
   [report]      generates briefing report for an outbreak
+  [serve]       serves briefing reports on demand over HTTP
+  [watch]       rebuilds briefing report whenever its sources change
 """
 
 
@@ -47,11 +50,57 @@ def main():
     lint_parser.add_argument("--data", help="Data URL")
     lint_parser.add_argument("--schema", help="Data schema path or URL")
     lint_parser.add_argument("--ignore", help="Ignore fields, comma-separated")
+    lint_parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Validate all rows, not only rows changed since the last lint",
+    )
+    lint_parser.add_argument(
+        "--reader",
+        choices=["pandas", "arrow", "chunked"],
+        help="CSV reader (default: csv_reader in configuration)",
+    )
+    lint_parser.add_argument(
+        "--format",
+        choices=["summary", "json", "html", "ndjson"],
+        default="summary",
+        help="Output errors grouped by column and message (summary, json, html), "
+        "or every error as newline delimited JSON (ndjson)",
+    )
 
     get_parser = subparsers.add_parser("get", help="Get data for outbreak")
     get_parser.add_argument("outbreak", help="Outbreak name")
+    get_parser.add_argument("--data", help="Data URL")
+    get_parser.add_argument(
+        "-o", "--output", help="Output file (default: <outbreak>.csv)"
+    )
+    get_parser.add_argument(
+        "--format",
+        choices=["csv", "parquet"],
+        default="csv",
+        help="Output format, parquet requires pyarrow (default: csv)",
+    )
+    get_parser.add_argument(
+        "--parts",
+        type=int,
+        default=8,
+        help="Parallel range requests for large files (default: 8)",
+    )
+    get_parser.add_argument(
+        "--snapshot",
+        action="store_true",
+        help="Add data as a new version to the snapshot store instead, requires pyarrow",
+    )
+    get_parser.add_argument(
+        "--store", help="Snapshot store folder (default: ~/.cache/olm/store/<outbreak>)"
+    )
 
-    _ = subparsers.add_parser("list", help="List outbreaks managed by olm")
+    list_parser = subparsers.add_parser("list", help="List outbreaks managed by olm")
+    list_parser.add_argument(
+        "--names",
+        action="store_true",
+        help="Only print names, useful for shell completion",
+    )
 
     report_parser = subparsers.add_parser("report", help="Generate briefing report")
     report_parser.add_argument("outbreak", help="Outbreak name")
@@ -66,9 +115,110 @@ def main():
     report_parser.add_argument(
         "-o", "--open", action="store_true", help="Open local file in web browser"
     )
+    report_parser.add_argument(
+        "--static",
+        action="store_true",
+        help="Render figures to static images, for a report without JavaScript",
+    )
+    report_parser.add_argument(
+        "--image-format",
+        choices=["svg", "png"],
+        default="svg",
+        help="Image format for static figures (default: svg)",
+    )
+    report_parser.add_argument(
+        "--reader",
+        choices=["pandas", "arrow", "chunked"],
+        help="CSV reader (default: csv_reader in configuration)",
+    )
+    report_parser.add_argument(
+        "-j",
+        "--processes",
+        type=int,
+        default=1,
+        help="Build figures in parallel processes sharing the linelist (requires the arrow extra)",
+    )
+
+    backfill_parser = subparsers.add_parser(
+        "backfill", help="Rebuild dated briefing reports from linelist snapshots"
+    )
+    backfill_parser.add_argument("outbreak", help="Outbreak name")
+    backfill_parser.add_argument(
+        "--from",
+        dest="start",
+        type=datetime.date.fromisoformat,
+        required=True,
+        help="First report date",
+    )
+    backfill_parser.add_argument(
+        "--to",
+        dest="end",
+        type=datetime.date.fromisoformat,
+        required=True,
+        help="Last report date",
+    )
+    backfill_parser.add_argument(
+        "--snapshots",
+        help="Folder of snapshots named by date, snapshot store folder, or versioned S3 object "
+        "(default: outbreak data URL)",
+    )
+    backfill_parser.add_argument(
+        "-o", "--output", help="Output folder (default: backfill/<outbreak>)"
+    )
+    backfill_parser.add_argument(
+        "-a", "--add-archive", help="Add link to archived reports", action="store_true"
+    )
+    backfill_parser.add_argument(
+        "-b", "--bucket", help="S3 bucket to upload reports to"
+    )
+    backfill_parser.add_argument(
+        "--cloudfront", help="Cloudfront distribution which should be invalidated"
+    )
+    backfill_parser.add_argument(
+        "--static", action="store_true", help="Render figures to static images"
+    )
+    backfill_parser.add_argument(
+        "-j", "--processes", type=int, help="Number of processes (default: CPU count)"
+    )
+
+    watch_parser = subparsers.add_parser(
+        "watch",
+        help="Rebuild briefing report when configuration, templates or data change",
+    )
+    watch_parser.add_argument("outbreak", help="Outbreak name")
+    watch_parser.add_argument("--data", help="Data URL")
+    watch_parser.add_argument(
+        "--data-interval",
+        type=float,
+        default=60,
+        help="Interval in seconds between checks for data changes (default: 60)",
+    )
+
+    serve_parser = subparsers.add_parser(
+        "serve", help="Serve briefing reports, built on request and cached in memory"
+    )
+    serve_parser.add_argument(
+        "--host", default="127.0.0.1", help="Host to listen on (default: 127.0.0.1)"
+    )
+    serve_parser.add_argument(
+        "--port", type=int, default=8000, help="Port to listen on (default: 8000)"
+    )
+    serve_parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=2,
+        help="Threads which build plot entries (default: 2)",
+    )
+    serve_parser.add_argument(
+        "--data-folder",
+        action="append",
+        default=[],
+        help="Folder of local files which can be requested with ?data=, can be repeated",
+    )
 
     args = parser.parse_args()
-    if args.command and args.command != "list" and args.outbreak not in OUTBREAKS:
+    if args.command not in ["list", "serve", None] and args.outbreak not in OUTBREAKS:
         abort(
             "outbreak not known, choose from: \033[1m"
             + ", ".join(OUTBREAKS)
@@ -79,39 +229,139 @@ def main():
     except AttributeError:
         bold_outbreak = None
 
+    # data processing libraries are slow to import, and not required for
+    # commands that only operate on outbreak metadata
+    if args.command not in ["list", None]:
+        from .outbreaks import Outbreak
+
     match args.command:
         case "list":
-            for outbreak in OUTBREAKS:
-                outbreak = Outbreak(OUTBREAKS_PATH / f"{outbreak}.yml")
+            for outbreak in sorted(OUTBREAKS):
+                if args.names:
+                    print(outbreak)
+                    continue
+                try:
+                    metadata = get_metadata(outbreak)
+                except ValueError as e:
+                    msg_fail("list", f"{outbreak}: {e}")
+                    continue
                 print(
-                    f"\033[1m{outbreak.name:12s} \033[0m{outbreak.metadata['description']} [{outbreak.metadata['id']}]"
+                    f"\033[1m{outbreak:12s} \033[0m{metadata['description']} [{metadata['id']}]"
                 )
         case "get":
-            outbreak = Outbreak(OUTBREAKS_PATH / f"{args.outbreak}.yml")
-            if outbreak.url is None:
+            from .util import read_raw
+            from .store import get_store
+            from .readers import detect_format
+            from .download import download, download_parquet
+
+            if (url := args.data or get_metadata(args.outbreak).get("url")) is None:
                 abort(f"no data URL found for {bold_outbreak}")
-            output_file = f"{args.outbreak}.csv"
-            if (res := requests.get(outbreak.url)).status_code == 200:
-                Path(output_file).write_text(res.text)
+            reader = get_metadata(args.outbreak).get("csv_reader", "pandas")
+            if args.snapshot:
+                store = get_store(args.outbreak, args.store)
+                snapshot = store.add(read_raw(url, reader), source=url)
+                msg_ok(
+                    "get",
+                    f"stored {store.manifest_file(snapshot.version)} "
+                    f"with {snapshot.n_new_rows} new of {snapshot.n_rows} rows",
+                )
+            else:
+                output_file = args.output or f"{args.outbreak}.{args.format}"
+                if detect_format(url)[0] == "snapshot":
+                    # restores a version from the snapshot store
+                    df = read_raw(url)
+                    if args.format == "parquet":
+                        df.to_parquet(output_file, index=False)
+                    else:
+                        df.to_csv(output_file, index=False)
+                elif args.format == "parquet":
+                    download_parquet(url, output_file)
+                else:
+                    download(url, output_file, parts=args.parts)
                 msg_ok("get", "wrote " + output_file)
         case "lint":
             outbreak = Outbreak(OUTBREAKS_PATH / f"{args.outbreak}.yml", args.data)
+            if args.schema:
+                outbreak.schema_url = args.schema
+            if args.reader:
+                outbreak.reader = args.reader
             ignore_keys = args.ignore.split(",") if args.ignore is not None else []
-            if (lint_result := outbreak.lint(ignore_keys)).ok:
+            if args.format == "ndjson":
+                # stdout only has errors, so that it can be piped
+                lint_result = outbreak.lint(
+                    ignore_keys, incremental=not args.full, errors_file=sys.stdout
+                )
+                sys.exit(0 if lint_result.ok else 2)
+            lint_result = outbreak.lint(ignore_keys, incremental=not args.full)
+            if args.format != "summary":
+                print(
+                    lint_result.as_json()
+                    if args.format == "json"
+                    else lint_result.as_html()
+                )
+            elif lint_result.ok:
                 msg_ok("lint", "succeeded for " + bold_outbreak)
             else:
-                msg_fail("lint", "failed for " + bold_outbreak)
+                msg_fail(
+                    "lint",
+                    f"failed for {bold_outbreak} with {lint_result.n_errors} errors",
+                )
                 print(lint_result)
+            if not lint_result.ok:
                 sys.exit(2)
         case "report":
             outbreak = Outbreak(OUTBREAKS_PATH / f"{args.outbreak}.yml", args.data)
+            if args.reader:
+                outbreak.reader = args.reader
             outbreak.make_report(
                 args.add_archive,
                 args.bucket,
                 cloudfront_distribution=args.cloudfront,
+                static=args.static,
+                image_format=args.image_format,
+                processes=args.processes,
             )
-            if args.open and (Path(args.outbreak + ".html")).exists():
-                webbrowser.open("file://" + str(Path.cwd() / (args.outbreak + ".html")))
+            output_file = args.outbreak + ("-static.html" if args.static else ".html")
+            if args.open and (Path(output_file)).exists():
+                webbrowser.open("file://" + str(Path.cwd() / output_file))
+        case "backfill":
+            from .backfill import backfill
+
+            if args.start > args.end:
+                abort("--from must not be after --to")
+            backfill(
+                OUTBREAKS_PATH / f"{args.outbreak}.yml",
+                args.start,
+                args.end,
+                snapshots=args.snapshots,
+                output_folder=args.output,
+                output_bucket=args.bucket,
+                cloudfront_distribution=args.cloudfront,
+                add_archive=args.add_archive,
+                static=args.static,
+                processes=args.processes,
+            )
+        case "watch":
+            from .watch import watch
+
+            if (get_metadata(args.outbreak).get("url") or args.data) is None:
+                abort(f"no data URL found for {bold_outbreak}")
+            try:
+                watch(args.outbreak, args.data, data_interval=args.data_interval)
+            except KeyboardInterrupt:
+                pass
+        case "serve":
+            from .serve import serve
+
+            try:
+                serve(
+                    args.host,
+                    args.port,
+                    workers=args.workers,
+                    data_folders=args.data_folder,
+                )
+            except KeyboardInterrupt:
+                pass
         case None:
             print(bold_brackets(USAGE))
 
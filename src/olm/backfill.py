@@ -0,0 +1,258 @@
+"""
+Rebuilds dated archive reports from versioned linelist snapshots
+"""
+
+import re
+import bisect
+import datetime
+import logging
+import concurrent.futures
+from pathlib import Path, PurePosixPath
+from urllib.parse import urlparse, parse_qs
+
+import boto3
+
+from .util import (
+    CACHE_FOLDER,
+    temporary_file,
+    replace_file,
+    upload_files,
+    invalidate_cache,
+    msg_ok,
+    msg_fail,
+)
+from .outbreaks import Outbreak, write_report, compile_template
+
+SNAPSHOTS_FOLDER = CACHE_FOLDER / "snapshots"
+REGEX_SNAPSHOT_DATE = re.compile(r"\d{4}-\d{2}-\d{2}")
+# virtual hosted style S3 URLs, https://<bucket>.s3.<region>.amazonaws.com/<key>
+REGEX_S3_HTTPS = re.compile(
+    r"^https://([^./]+)\.s3[.-](?:[a-z0-9-]+\.)?amazonaws\.com/(.+)$"
+)
+
+
+def parse_s3_url(url: str) -> tuple[str, str] | None:
+    "Returns bucket and key for s3:// and S3 https URLs, None for other URLs"
+    if url.startswith("s3://"):
+        parsed = urlparse(url)
+        return parsed.netloc, parsed.path.lstrip("/")
+    if match := REGEX_S3_HTTPS.match(url):
+        return match.group(1), match.group(2)
+    return None
+
+
+def local_snapshots(folder: str | Path) -> dict[datetime.date, str]:
+    """Returns snapshots in a folder by date
+
+    Snapshot file names must contain their date as YYYY-MM-DD, for example
+    2024-06-01.csv or latest-2024-06-01.csv. This includes the manifests of
+    a snapshot store, see olm.store. If a folder has several snapshots on a
+    date, the last one in sorted order is used.
+    """
+    snapshots = {}
+    for file in sorted(Path(folder).iterdir()):
+        if file.is_file() and (match := REGEX_SNAPSHOT_DATE.search(file.name)):
+            snapshots[datetime.date.fromisoformat(match.group())] = str(file)
+    return snapshots
+
+
+def s3_snapshots(bucket: str, key: str) -> dict[datetime.date, str]:
+    """Returns object versions by date, as s3://bucket/key?versionId=... URLs
+
+    For each date, the last version modified on that date is used.
+    """
+    versions: dict[datetime.date, tuple[datetime.datetime, str]] = {}
+    paginator = boto3.client("s3").get_paginator("list_object_versions")
+    for page in paginator.paginate(Bucket=bucket, Prefix=key):
+        for version in page.get("Versions", []):
+            if version["Key"] != key:
+                continue
+            modified = version["LastModified"]
+            if (
+                modified.date() not in versions
+                or versions[modified.date()][0] < modified
+            ):
+                versions[modified.date()] = (modified, version["VersionId"])
+    return {
+        date: f"s3://{bucket}/{key}?versionId={version_id}"
+        for date, (_, version_id) in sorted(versions.items())
+    }
+
+
+def get_snapshots(source: str) -> dict[datetime.date, str]:
+    "Returns snapshots by date from a local folder or the versions of a S3 object"
+    if (s3_object := parse_s3_url(source)) is not None:
+        return s3_snapshots(*s3_object)
+    if Path(source).is_dir():
+        return local_snapshots(source)
+    raise ValueError(
+        f"Snapshots must be a folder or a versioned S3 object, got {source}"
+    )
+
+
+def fetch_snapshot(url: str) -> str:
+    """Returns local path for a snapshot
+
+    S3 object versions are immutable, so they are downloaded once to the
+    olm cache folder. Cached versions keep the extension of the key, from
+    which the format is detected, see olm.readers.detect_format().
+    """
+    if not url.startswith("s3://"):
+        return url
+    parsed = urlparse(url)
+    key = parsed.path.lstrip("/")
+    version_id = parse_qs(parsed.query)["versionId"][0]
+    file = (
+        SNAPSHOTS_FOLDER
+        / parsed.netloc
+        / key
+        / f"{version_id}{PurePosixPath(key).suffix}"
+    )
+    if not file.exists():
+        file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = temporary_file(file)
+        boto3.client("s3").download_file(
+            parsed.netloc, key, str(tmp_file), ExtraArgs={"VersionId": version_id}
+        )
+        replace_file(tmp_file, file)
+    return str(file)
+
+
+def group_dates(
+    snapshots: dict[datetime.date, str], dates: list[datetime.date]
+) -> dict[str, list[datetime.date]]:
+    """Groups report dates by the latest snapshot on or before each date
+
+    Dates before the first snapshot are left out.
+    """
+    groups: dict[str, list[datetime.date]] = {}
+    snapshot_dates = sorted(snapshots)
+    for date in dates:
+        if (i := bisect.bisect_right(snapshot_dates, date)) == 0:
+            logging.warning(f"No snapshot on or before {date}")
+            continue
+        groups.setdefault(snapshots[snapshot_dates[i - 1]], []).append(date)
+    return groups
+
+
+def get_snapshot(source: str, date: datetime.date) -> str:
+    "Returns local path for the latest snapshot of source on or before date"
+    if not (groups := group_dates(get_snapshots(source), [date])):
+        raise ValueError(f"No snapshot of {source} on or before {date}")
+    return fetch_snapshot(next(iter(groups)))
+
+
+def build_snapshot_reports(
+    config: str,
+    snapshot: str,
+    dates: list[datetime.date],
+    output_folder: Path,
+    add_archive: bool = False,
+    static: bool = False,
+    image_format: str = "svg",
+) -> dict[datetime.date, Path]:
+    """Builds reports for dates which use the same snapshot
+
+    The snapshot is read once, and plot caches keyed by the dataframe are
+    shared by all dates. Secondary datasets are read from their snapshot on
+    or before each date, see Outbreak.dataset_url(), and building fails if
+    a dataset has no snapshot, rather than using its current data.
+    """
+    outbreak = Outbreak(config, fetch_snapshot(snapshot))
+    outbreak.snapshot_datasets = True
+    files = {}
+    for date in dates:
+        var = outbreak.build_report(date, add_archive, static, image_format)
+        write_report(
+            outbreak.name,
+            var,
+            str(files.setdefault(date, output_folder / f"{date}.html")),
+        )
+    return files
+
+
+def backfill(
+    config: str,
+    start: datetime.date,
+    end: datetime.date,
+    snapshots: str | None = None,
+    output_folder: str | Path | None = None,
+    output_bucket: str | None = None,
+    cloudfront_distribution: str | None = None,
+    add_archive: bool = False,
+    static: bool = False,
+    image_format: str = "svg",
+    processes: int | None = None,
+) -> dict[datetime.date, Path]:
+    """Rebuilds dated reports from start to end (inclusive) from linelist snapshots
+
+    Parameters
+    ----------
+    config
+        Outbreak configuration
+    start, end
+        Report dates to build
+    snapshots
+        Folder of snapshots with dates in file names, such as a snapshot
+        store folder, or a s3:// or S3 https
+        URL of a versioned object, defaults to the outbreak data URL
+    output_folder
+        Folder to write reports to as {date}.html, defaults to backfill/{outbreak}
+    output_bucket
+        If specified, reports are uploaded to {outbreak}/{date}.html once
+        they are all built
+    cloudfront_distribution
+        If specified, invalidates the cache for uploaded reports
+    add_archive, static, image_format
+        See Outbreak.make_report()
+    processes
+        Number of processes, each building the reports which use one snapshot
+    """
+    outbreak = Outbreak(config)
+    compile_template(outbreak.name)  # fail early if template is not present
+    if (source := snapshots or outbreak.url) is None:
+        raise ValueError(
+            f"No snapshots specified and no data URL for outbreak: {outbreak.name}"
+        )
+    output_folder = Path(output_folder or Path("backfill") / outbreak.name)
+    output_folder.mkdir(parents=True, exist_ok=True)
+    dates = [start + datetime.timedelta(days=i) for i in range((end - start).days + 1)]
+    groups = group_dates(get_snapshots(source), dates)
+
+    files: dict[datetime.date, Path] = {}
+    with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+        futures = {
+            executor.submit(
+                build_snapshot_reports,
+                config,
+                snapshot,
+                snapshot_dates,
+                output_folder,
+                add_archive,
+                static,
+                image_format,
+            ): snapshot_dates
+            for snapshot, snapshot_dates in groups.items()
+        }
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                built = future.result()
+            except Exception as e:
+                msg_fail(
+                    "backfill",
+                    f"failed for {', '.join(map(str, futures[future]))}: {e}",
+                )
+                raise
+            files.update(built)
+            msg_ok("backfill", "built " + ", ".join(str(d) for d in sorted(built)))
+
+    if output_bucket:
+        keys = {
+            f"{outbreak.report_prefix(static)}/{date}.html": file
+            for date, file in sorted(files.items())
+        }
+        upload_files(output_bucket, keys, content_type="text/html")
+        msg_ok("backfill", f"uploaded {len(keys)} reports to s3://{output_bucket}")
+        if cloudfront_distribution:
+            invalidate_cache(cloudfront_distribution, ["/" + k for k in keys])
+    return dict(sorted(files.items()))
@@ -0,0 +1,16 @@
+"""
+Terminal output helpers
+"""
+
+
+def msg_ok(module: str, s: str):
+    print(f"\033[0;32m✓ olm[{module}]\t\033[0m {s}")
+
+
+def msg_fail(module: str, s: str):
+    print(f"\033[0;31m✗ olm[{module}]\t\033[0m {s}")
+
+
+def bold_brackets(s: str) -> str:
+    """Given a text with brackets such as [this], renders it in bold font"""
+    return s.replace("[", "\033[1m").replace("]", "\033[0m")
@@ -0,0 +1,196 @@
+"""
+Differences between two versions of a linelist
+"""
+
+import weakref
+import warnings
+import dataclasses
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+
+@dataclasses.dataclass
+class LinelistDiff:
+    """Rows added, removed and changed between two versions of a linelist,
+    indexed by ID
+
+    changed and changed_previous hold the current and previous versions
+    of the changed rows, and changed_columns is True for each column that
+    changed in a row.
+    """
+
+    added: pd.DataFrame
+    removed: pd.DataFrame
+    changed: pd.DataFrame
+    changed_previous: pd.DataFrame
+    changed_columns: pd.DataFrame
+
+    def delta(
+        self,
+        by: str | list[str],
+        where: Callable[[pd.DataFrame], pd.Series] | None = None,
+    ) -> pd.Series:
+        """Returns change in number of rows for each group
+
+        Only rows that were added, removed or changed are used, so this is
+        equivalent to, but faster than, the difference between group counts of
+        the current and previous linelists.
+
+        Parameters
+        ----------
+        by
+            Column or columns to group by
+        where
+            If specified, a function returning a boolean mask for a linelist,
+            to only count matching rows
+        """
+
+        def counts(df: pd.DataFrame) -> pd.Series:
+            if where is not None:
+                df = df[where(df)]
+            return df.groupby(by).size()
+
+        delta = (
+            counts(self.added)
+            .add(counts(self.changed), fill_value=0)
+            .sub(counts(self.removed), fill_value=0)
+            .sub(counts(self.changed_previous), fill_value=0)
+            .astype(int)
+        )
+        return delta[delta != 0]
+
+    def total(self, where: Callable[[pd.DataFrame], pd.Series]) -> int:
+        "Returns change in number of rows matching a boolean mask"
+        return int(
+            sum(where(df).sum() for df in [self.added, self.changed])
+            - sum(where(df).sum() for df in [self.removed, self.changed_previous])
+        )
+
+
+def index_by_id(df: pd.DataFrame, id_col: str) -> pd.DataFrame:
+    if df[id_col].duplicated().any():
+        warnings.warn(
+            f"Duplicate {id_col} values found, only the last row for each is compared"
+        )
+        df = df.drop_duplicates(id_col, keep="last")
+    return df.set_index(id_col)
+
+
+def diff_linelists(
+    previous: pd.DataFrame, current: pd.DataFrame, id_col: str = "ID"
+) -> LinelistDiff:
+    """Compares two versions of a linelist joined on ID
+
+    Rows are compared using content hashes, so only rows that changed are
+    compared column by column.
+    """
+    previous, current = index_by_id(previous, id_col), index_by_id(current, id_col)
+    columns = current.columns.union(previous.columns, sort=False)
+    previous, current = (
+        previous.reindex(columns=columns),
+        current.reindex(columns=columns),
+    )
+
+    # position of each current row in the previous linelist, -1 if added
+    positions = previous.index.get_indexer(current.index)
+    in_previous = positions >= 0
+    current_hashes = pd.util.hash_pandas_object(current, index=False).to_numpy()
+    previous_hashes = pd.util.hash_pandas_object(previous, index=False).to_numpy()
+    is_changed = in_previous & (current_hashes != previous_hashes[positions])
+    changed_ids = current.index[is_changed]
+    removed = np.ones(len(previous), dtype=bool)
+    removed[positions[in_previous]] = False
+
+    changed, changed_previous = current.loc[changed_ids], previous.loc[changed_ids]
+    changed_columns = ~(
+        (changed == changed_previous) | (changed.isna() & changed_previous.isna())
+    )
+    return LinelistDiff(
+        added=current[~in_previous],
+        removed=previous[removed],
+        changed=changed,
+        changed_previous=changed_previous,
+        changed_columns=changed_columns,
+    )
+
+
+_diff_cache: dict[tuple[int, int], LinelistDiff] = {}
+
+
+def get_diff(previous: pd.DataFrame, current: pd.DataFrame) -> LinelistDiff:
+    """Returns difference between two linelists, cached for the lifetime of
+    both dataframes, so that several report entries can share it"""
+    key = (id(previous), id(current))
+    if key not in _diff_cache:
+        _diff_cache[key] = diff_linelists(previous, current)
+        weakref.finalize(previous, _diff_cache.pop, key, None)
+        weakref.finalize(current, _diff_cache.pop, key, None)
+    return _diff_cache[key]
+
+
+def count_added(
+    previous: pd.DataFrame, current: pd.DataFrame, id_col: str = "ID"
+) -> int:
+    """Returns number of rows in current which are not in previous
+
+    Rows are matched on id_col if both linelists have it, otherwise on
+    their values in the columns present in both linelists.
+    """
+    if id_col in current.columns and id_col in previous.columns:
+        return len(diff_linelists(previous, current, id_col).added)
+    columns = current.columns.intersection(previous.columns, sort=False)
+    current_counts, previous_counts = (
+        pd.util.hash_pandas_object(df[columns], index=False).value_counts()
+        for df in (current, previous)
+    )
+    return int(current_counts.sub(previous_counts, fill_value=0).clip(lower=0).sum())
+
+
+def is_farm_worker(df: pd.DataFrame) -> pd.Series:
+    return (df.Case_status == "confirmed") & df.Occupation.str.lower().str.contains(
+        "farm worker", na=False
+    )
+
+
+def get_changes(
+    df: pd.DataFrame,
+    previous: pd.DataFrame,
+    statuses: list[str] = ["confirmed", "probable", "suspected"],
+    prefix: str = "n_new",
+) -> dict[str, int | bool]:
+    """Returns change in counts since a previous linelist, for use in templates
+
+    Parameters
+    ----------
+    df
+        Current linelist
+    previous
+        Linelist used for the previous report
+    statuses
+        Case statuses for which changes are returned
+    prefix
+        Prefix of returned keys, for example n_new_confirmed, n_new_dead
+
+    Returns added, removed and changed row counts, and the changes in
+    counts returned by get_counts(): cases by status, deaths and
+    (if Occupation is present) farm workers infected. Changes can be
+    negative, so each is also returned as a boolean which is only true
+    for increases, with has_ replacing n_, for example has_new_confirmed.
+    """
+    diff = get_diff(previous, df)
+    status = diff.delta("Case_status")
+    changes = {
+        **{f"{prefix}_{s}": int(status.get(s, 0)) for s in statuses},
+        f"{prefix}_dead": diff.total(lambda d: d.Outcome == "death"),
+    }
+    if "Occupation" in df.columns:
+        changes[f"{prefix}_farm_workers_infected"] = diff.total(is_farm_worker)
+    return {
+        "n_rows_added": len(diff.added),
+        "n_rows_removed": len(diff.removed),
+        "n_rows_changed": len(diff.changed),
+        **changes,
+        **{f"has_{k.removeprefix('n_')}": n > 0 for k, n in changes.items()},
+    }
@@ -0,0 +1,311 @@
+"""
+Streaming, resumable downloads of linelists
+"""
+
+import io
+import os
+import json
+import hashlib
+import logging
+import concurrent.futures
+from pathlib import Path
+
+import requests
+import pandas as pd
+from requests.adapters import HTTPAdapter
+
+from .readers import EXTRA_NA_VALUES, detect_format
+
+CHUNK_SIZE = 1024 * 1024
+PART_SIZE = 16 * 1024 * 1024
+# objects at least this size are downloaded in parallel using range requests
+PARALLEL_THRESHOLD = 4 * PART_SIZE
+CSV_CHUNK_ROWS = 100_000
+
+
+def get_session(pool_size: int = 8) -> requests.Session:
+    "Returns session with a connection pool large enough for parallel requests"
+    session = requests.Session()
+    # compressed transfers would make Content-Length and byte ranges refer
+    # to the encoded data
+    session.headers["Accept-Encoding"] = "identity"
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def verify_download(file: Path, size: int | None, etag: str | None):
+    "Checks file size against Content-Length, and MD5 against ETag if it is a MD5 hash"
+    if size is not None and (actual := file.stat().st_size) != size:
+        raise ValueError(f"Downloaded {actual} bytes, expected {size} bytes")
+    # S3 ETags are the MD5 hash of the object, except for multipart uploads
+    if etag and len(etag := etag.strip('"')) == 32 and "-" not in etag:
+        md5 = hashlib.md5()
+        with file.open("rb") as f:
+            while chunk := f.read(CHUNK_SIZE):
+                md5.update(chunk)
+        if md5.hexdigest() != etag:
+            raise ValueError(
+                f"Downloaded file MD5 {md5.hexdigest()} does not match ETag {etag}"
+            )
+
+
+def download_range(
+    session: requests.Session,
+    url: str,
+    file: Path,
+    start: int,
+    end: int,
+    etag: str | None,
+):
+    "Downloads bytes start to end (inclusive) of url to the same position in file"
+    headers = {"Range": f"bytes={start}-{end}"}
+    if etag:
+        headers["If-Match"] = etag
+    with session.get(url, headers=headers, stream=True, timeout=60) as res:
+        if res.status_code != 206:
+            res.raise_for_status()
+            raise ValueError(
+                f"Server did not return partial content for range {start}-{end}"
+            )
+        fd = os.open(file, os.O_WRONLY)
+        try:
+            offset = start
+            for chunk in res.iter_content(CHUNK_SIZE):
+                os.pwrite(fd, chunk, offset)
+                offset += len(chunk)
+        finally:
+            os.close(fd)
+    if offset != end + 1:
+        raise ValueError(
+            f"Incomplete range {start}-{end}, received {offset - start} bytes"
+        )
+
+
+class RangeRequestsNotSupported(ValueError):
+    pass
+
+
+class HTTPRangeFile(io.RawIOBase):
+    """Read only file object for a URL, reading with range requests
+
+    Used to read parts of remote files, such as the footer, row groups and
+    columns of a Parquet file, without downloading the whole file. Reads
+    shorter than min_read bytes fetch min_read bytes, which are kept for
+    subsequent reads.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        session: requests.Session | None = None,
+        min_read: int = 16 * 1024,
+    ):
+        self.url = url
+        self.session = session or get_session(1)
+        self.min_read = min_read
+        self.position = 0
+        self.buffer_start, self.buffer = 0, b""
+        self.bytes_fetched = 0
+        head = self.session.head(url, allow_redirects=True, timeout=30)
+        head.raise_for_status()
+        if (
+            head.headers.get("Accept-Ranges") != "bytes"
+            or "Content-Length" not in head.headers
+        ):
+            raise RangeRequestsNotSupported(
+                f"Server does not support range requests for {url}"
+            )
+        self.size = int(head.headers["Content-Length"])
+        self.etag = head.headers.get("ETag")
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self.position, io.SEEK_END: self.size}[
+            whence
+        ]
+        self.position = base + offset
+        return self.position
+
+    def fetch(self, start: int, end: int) -> bytes:
+        "Returns bytes start to end (exclusive)"
+        headers = {"Range": f"bytes={start}-{end - 1}"}
+        if self.etag:
+            headers["If-Match"] = self.etag
+        res = self.session.get(self.url, headers=headers, timeout=60)
+        if res.status_code != 206:
+            res.raise_for_status()
+            raise ValueError(
+                f"Server did not return partial content for range {start}-{end - 1}"
+            )
+        self.bytes_fetched += len(res.content)
+        return res.content
+
+    def readinto(self, b) -> int:
+        end = min(self.position + len(b), self.size)
+        if end <= self.position:
+            return 0
+        buffer_end = self.buffer_start + len(self.buffer)
+        if not (self.buffer_start <= self.position and end <= buffer_end):
+            self.buffer_start = self.position
+            self.buffer = self.fetch(
+                self.position, min(max(end, self.position + self.min_read), self.size)
+            )
+        offset = self.position - self.buffer_start
+        n = end - self.position
+        b[:n] = self.buffer[offset : offset + n]
+        self.position = end
+        return n
+
+
+def download(
+    url: str,
+    output_file: str | Path,
+    session: requests.Session | None = None,
+    parts: int = 8,
+) -> Path:
+    """Downloads url to output_file, streaming to disk
+
+    Downloads are written to a .part file which is renamed once the download
+    is complete and verified, and removed if verification fails. Large objects are downloaded in parallel with
+    range requests. Interrupted downloads are resumed if the server supports
+    range requests and the object has not changed.
+
+    Parameters
+    ----------
+    url
+        URL to download
+    output_file
+        File to write to
+    session
+        Session to use, a pooled session is created if not specified
+    parts
+        Number of parallel range requests for large objects
+    """
+    session = session or get_session(parts)
+    output_file = Path(output_file)
+    part_file = output_file.with_name(output_file.name + ".part")
+    state_file = output_file.with_name(output_file.name + ".part.json")
+
+    head = session.head(url, allow_redirects=True, timeout=30)
+    head.raise_for_status()
+    size = (
+        int(head.headers["Content-Length"])
+        if "Content-Length" in head.headers
+        else None
+    )
+    etag = head.headers.get("ETag")
+    ranges = head.headers.get("Accept-Ranges") == "bytes" and size is not None
+    if "Content-Encoding" in head.headers:
+        # Content-Length is the encoded size, which cannot be checked
+        size, ranges = None, False
+
+    # discard partial download if the object changed
+    state = json.loads(state_file.read_text()) if state_file.exists() else {}
+    if state.get("etag") != etag or state.get("size") != size or not etag:
+        part_file.unlink(missing_ok=True)
+        state = {"etag": etag, "size": size, "completed": []}
+    state_file.write_text(json.dumps(state))
+
+    if ranges and size >= PARALLEL_THRESHOLD:
+        if not part_file.exists():
+            with part_file.open("wb") as f:
+                f.truncate(size)
+        pending = [
+            (start, min(start + PART_SIZE, size) - 1)
+            for start in range(0, size, PART_SIZE)
+            if start not in state["completed"]
+        ]
+        logging.info(f"Downloading {url} in {len(pending)} parts")
+        with concurrent.futures.ThreadPoolExecutor(max_workers=parts) as executor:
+            futures = {
+                executor.submit(
+                    download_range, session, url, part_file, start, end, etag
+                ): start
+                for start, end in pending
+            }
+            for future in concurrent.futures.as_completed(futures):
+                future.result()
+                state["completed"].append(futures[future])
+                state_file.write_text(json.dumps(state))
+    else:
+        offset = part_file.stat().st_size if part_file.exists() and ranges else 0
+        headers = {"Range": f"bytes={offset}-", "If-Range": etag} if offset else {}
+        with session.get(url, headers=headers, stream=True, timeout=60) as res:
+            res.raise_for_status()
+            # servers respond with the full object if the range is not satisfied
+            mode = "ab" if res.status_code == 206 else "wb"
+            with part_file.open(mode) as f:
+                for chunk in res.iter_content(CHUNK_SIZE):
+                    f.write(chunk)
+
+    try:
+        verify_download(part_file, size, etag)
+    except ValueError:
+        # a corrupt download must not be resumed
+        part_file.unlink(missing_ok=True)
+        state_file.unlink(missing_ok=True)
+        raise
+    part_file.replace(output_file)
+    state_file.unlink()
+    return output_file
+
+
+def download_parquet(
+    url: str,
+    output_file: str | Path,
+    session: requests.Session | None = None,
+    chunk_rows: int = CSV_CHUNK_ROWS,
+) -> Path:
+    """Downloads CSV from url and converts it to Parquet while streaming
+
+    The CSV, which may be compressed, is parsed in chunks of chunk_rows rows
+    as it is received, with the same string typing and NA values as
+    read_csv(). Parquet files are downloaded as they are. Requires pyarrow.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError(
+            "Conversion to Parquet requires pyarrow, install olm with the arrow extra"
+        )
+    fmt, compression = detect_format(url)
+    if fmt == "parquet":
+        return download(url, output_file, session)
+    session = session or get_session(1)
+    output_file = Path(output_file)
+    part_file = output_file.with_name(output_file.name + ".part")
+    with session.get(url, stream=True, timeout=60) as res:
+        res.raise_for_status()
+        res.raw.decode_content = True
+        with pd.read_csv(
+            res.raw,
+            dtype=str,
+            na_values=EXTRA_NA_VALUES,
+            compression=compression,
+            chunksize=chunk_rows,
+        ) as reader:
+            # the writer is created from the first chunk, which has no rows
+            # if the CSV only has a header, so that an empty table is written
+            chunk = reader.get_chunk()
+            schema = pa.schema([(c, pa.string()) for c in chunk.columns])
+            with pq.ParquetWriter(part_file, schema, compression="zstd") as writer:
+                writer.write_table(
+                    pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+                )
+                for chunk in reader:
+                    writer.write_table(
+                        pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+                    )
+    part_file.replace(output_file)
+    return output_file
@@ -0,0 +1,108 @@
+"""
+Lightweight figure builder producing Plotly JSON specs
+
+Plot functions build figures as dictionaries following the Plotly JSON
+schema, with data and layout keys, directly from NumPy arrays. This skips
+the property validation of plotly.graph_objects and the data wrangling of
+plotly.express, which dominate the time taken to build figures with large
+traces. The olm theme is registered once as the "olm" plotly template,
+which figure() embeds in each figure.
+"""
+
+from typing import Any
+
+import numpy as np
+import pandas as pd
+import plotly.io
+import plotly.graph_objects as go
+
+from .theme import (
+    FONT,
+    TITLE_FONT,
+    PALETTE,
+    LEGEND_FONT_SIZE,
+    BG_COLOR,
+    FG_COLOR,
+    GRID_COLOR,
+    LEGEND_BG_COLOR,
+)
+
+TEMPLATE = "olm"
+
+# Figure specification, with data and layout keys
+Figure = dict[str, Any]
+
+standard_plot_layout = {
+    "plot_bgcolor": BG_COLOR,
+    "font_family": FONT,
+    "legend_font_family": TITLE_FONT,
+    "legend_font_size": LEGEND_FONT_SIZE,
+    "paper_bgcolor": BG_COLOR,
+    "hoverlabel_font_family": FONT,
+    "legend_bgcolor": LEGEND_BG_COLOR,
+    "title_font_color": FG_COLOR,
+    "title_font_family": TITLE_FONT,
+}
+
+standard_axis_layout = {
+    "title_font_family": TITLE_FONT,
+    "gridcolor": GRID_COLOR,
+    "linecolor": GRID_COLOR,
+    "title_font_color": FG_COLOR,
+}
+
+
+def register_template() -> dict[str, Any]:
+    """Registers the olm theme as a plotly template, returning it as JSON
+
+    The template extends plotly_white with the standard plot and axis
+    layouts, so graph_objects figures can use it with template="olm".
+    """
+    template = go.layout.Template(plotly.io.templates["plotly_white"])
+    template.layout.update(standard_plot_layout, colorway=PALETTE)
+    template.layout.xaxis.update(standard_axis_layout)
+    template.layout.yaxis.update(standard_axis_layout)
+    plotly.io.templates[TEMPLATE] = template
+    return template.to_plotly_json()
+
+
+TEMPLATE_JSON = register_template()
+
+
+def to_array(values: Any) -> np.ndarray | list:
+    """Returns values in a form serialised to JSON without conversion
+
+    Dates are formatted as strings, with the time only if any value has one.
+    Missing values of dates and non-numeric data are replaced by None.
+    """
+    values = (
+        values.to_numpy()
+        if isinstance(values, (pd.Series, pd.Index))
+        else np.asarray(values)
+    )
+    if values.dtype.kind == "M":
+        missing = np.isnat(values)
+        unit = (
+            "D" if (values.astype("datetime64[D]") == values)[~missing].all() else "s"
+        )
+        strings = np.datetime_as_string(values, unit=unit).astype(object)
+        strings[missing] = None
+        return strings.tolist()
+    if values.dtype.kind in "biuf":
+        return values
+    return [None if pd.isna(v) else v for v in values.tolist()]
+
+
+def figure(data: list[dict[str, Any]], layout: dict[str, Any] | None = None) -> Figure:
+    """Returns figure with traces and layout in the Plotly JSON format
+
+    Layout properties are nested dictionaries, such as
+    {"xaxis": {"title": {"text": "Date"}}}, as the underscore shorthand of
+    graph_objects is not expanded. The olm template is applied.
+    """
+    return {"data": data, "layout": {"template": TEMPLATE_JSON, **(layout or {})}}
+
+
+def is_figure(fig: Any) -> bool:
+    "Returns True for graph_objects figures and figure specifications"
+    return isinstance(fig, go.Figure) or (isinstance(fig, dict) and "data" in fig)
@@ -0,0 +1,294 @@
+"""
+Schema loading and validation for linelist linting
+
+Rows are validated one at a time against the outbreak schema. Checks across
+rows or columns, such as unique IDs, are lint rules declared in the
+outbreak configuration, which are run as vectorized passes over all rows:
+
+    lint_rules:
+      - {rule: unique, columns: [ID]}
+      - {rule: date_order, columns: [Date_onset, Date_death]}
+"""
+
+import os
+import json
+import random
+import hashlib
+import importlib.util
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, TextIO
+
+import numpy as np
+import pandas as pd
+import fastjsonschema
+
+from .types import RowError, ErrorGroup, LintRule
+from .util import CACHE_FOLDER, cached_get, temporary_file, replace_file
+
+VALIDATORS_FOLDER = CACHE_FOLDER / "validators"
+LINT_INDEX_FOLDER = CACHE_FOLDER / "lint"
+MAX_EXAMPLES = 5
+
+Validator = Callable[[dict[str, Any]], dict[str, Any]]
+
+_validators: dict[str, Validator] = {}
+
+
+def read_schema(schema_url: str) -> dict[str, Any]:
+    "Reads JSON schema from URL (cached on disk) or local path"
+    if schema_url.startswith("http"):
+        return json.loads(cached_get(schema_url, "schemas").read_text())
+    return json.loads(Path(schema_url).read_text())
+
+
+def schema_hash(schema: dict[str, Any]) -> str:
+    "Returns hash of schema, which also depends on the fastjsonschema version"
+    return hashlib.sha256(
+        (fastjsonschema.VERSION + json.dumps(schema, sort_keys=True)).encode("utf-8")
+    ).hexdigest()
+
+
+def get_validator(schema: dict[str, Any]) -> Validator:
+    """Returns compiled validator for schema
+
+    The validator source generated by fastjsonschema is stored in the olm
+    cache folder as a module named by the schema hash, so that code generation
+    only happens once for each schema.
+    """
+    key = schema_hash(schema)
+    if key in _validators:
+        return _validators[key]
+    module_file = VALIDATORS_FOLDER / f"schema_{key}.py"
+    if not module_file.exists():
+        VALIDATORS_FOLDER.mkdir(parents=True, exist_ok=True)
+        tmp_file = module_file.with_suffix(f".{os.getpid()}.tmp")
+        tmp_file.write_text(fastjsonschema.compile_to_code(schema))
+        tmp_file.replace(module_file)
+    spec = importlib.util.spec_from_file_location(f"olm_schema_{key}", module_file)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    _validators[key] = module.validate
+    return module.validate
+
+
+def validate_row(
+    row: dict[str, Any], validator: Validator, ignore_fields: list[str] = []
+) -> RowError | None:
+    "Validates a row, returning the first error or None"
+    nrow = {k: v for k, v in row.items() if pd.notnull(v) and k not in ignore_fields}
+    try:
+        validator(nrow)
+    except fastjsonschema.JsonSchemaValueException as e:
+        column = e.path[1]
+        return RowError(row["ID"], column, nrow[column], e.message)
+    return None
+
+
+def validate_rows(
+    df: pd.DataFrame, validator: Validator, ignore_fields: list[str] = []
+) -> Iterator[RowError]:
+    "Validates each row in a dataframe, yielding errors"
+    for row in df.to_dict("records"):
+        if (error := validate_row(row, validator, ignore_fields)) is not None:
+            yield error
+
+
+def row_hashes(df: pd.DataFrame) -> pd.Series:
+    "Returns content hash of each row"
+    return pd.util.hash_pandas_object(df, index=False).astype(str)
+
+
+def read_lint_index(outbreak: str, key: str) -> dict[str, list[Any] | None]:
+    """Reads errors for each row hash from the previous lint of an outbreak
+
+    Returns an empty index if there was no previous lint, or if the previous
+    lint used a different schema, columns or ignored fields
+    """
+    index_file = LINT_INDEX_FOLDER / f"{outbreak}.json"
+    if (
+        index_file.exists()
+        and (index := json.loads(index_file.read_text())).get("key") == key
+    ):
+        return index.get("rows", {})
+    return {}
+
+
+def write_lint_index(outbreak: str, key: str, rows: dict[str, list[Any] | None]):
+    LINT_INDEX_FOLDER.mkdir(parents=True, exist_ok=True)
+    index_file = LINT_INDEX_FOLDER / f"{outbreak}.json"
+    tmp_file = temporary_file(index_file)
+    tmp_file.write_text(json.dumps({"key": key, "rows": rows}))
+    replace_file(tmp_file, index_file)
+
+
+def iter_lint_rows(
+    outbreak: str,
+    df: pd.DataFrame,
+    schema: dict[str, Any],
+    ignore_fields: list[str] = [],
+    incremental: bool = True,
+) -> Iterator[RowError]:
+    """Validates rows against schema, yielding errors in row order
+
+    When incremental is True, rows are hashed and only rows whose hash was
+    not seen in the previous lint are validated; errors for the other rows
+    are reused from the previous lint. The hash covers every column,
+    including ID, so rows sharing an ID are looked up separately. Any change
+    to the schema, columns or ignored fields causes all rows to be validated.
+
+    Errors are yielded as rows are validated, so that consumers such as
+    aggregate_errors() use bounded memory. Incremental lints also keep the
+    column, value and message of the error (if any) for each row hash, which
+    is the lint index written once all rows have been validated.
+    """
+    validator = get_validator(schema)
+    if not incremental:
+        yield from validate_rows(df, validator, ignore_fields)
+        return
+    key = hashlib.sha256(
+        json.dumps(
+            [schema_hash(schema), list(df.columns), sorted(ignore_fields)]
+        ).encode("utf-8")
+    ).hexdigest()
+    previous = read_lint_index(outbreak, key)
+    hashes = row_hashes(df).tolist()
+    changed = np.array([h not in previous for h in hashes], dtype=bool)
+    changed_rows = iter(df[changed].to_dict("records"))
+
+    rows: dict[str, list[Any] | None] = {}
+    for id, h, is_changed in zip(df["ID"], hashes, changed):
+        if is_changed:
+            error = validate_row(next(changed_rows), validator, ignore_fields)
+        else:
+            error = None if previous[h] is None else RowError(id, *previous[h])
+        rows[h] = None if error is None else list(error[1:])
+        if error is not None:
+            yield error
+    write_lint_index(outbreak, key, rows)
+
+
+def lint_rows(
+    outbreak: str,
+    df: pd.DataFrame,
+    schema: dict[str, Any],
+    ignore_fields: list[str] = [],
+    incremental: bool = True,
+) -> list[RowError]:
+    "Validates rows against schema, returning errors, see iter_lint_rows()"
+    return list(iter_lint_rows(outbreak, df, schema, ignore_fields, incremental))
+
+
+def check_unique(df: pd.DataFrame, columns: list[str]) -> Iterator[RowError]:
+    """Yields an error for each row whose values of columns are also in another row
+
+    Duplicates are found in one pass with a hash table of the values of
+    columns. Rows with missing values in columns are not checked.
+    """
+    keys = df[columns].reset_index(drop=True).dropna()
+    duplicates = keys[keys.duplicated(keep=False).to_numpy()]
+    column = ", ".join(columns)
+    ids = df["ID"].to_numpy()[duplicates.index]
+    for id, values in zip(ids, duplicates.itertuples(index=False)):
+        yield RowError(
+            id, column, ", ".join(map(str, values)), f"{column} must be unique"
+        )
+
+
+def as_lint_dates(s: pd.Series) -> pd.Series:
+    "Returns ISO 8601 dates, with other values set to NaT, as they are schema errors"
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return s
+    return pd.to_datetime(s, format="ISO8601", errors="coerce")
+
+
+def check_date_order(df: pd.DataFrame, columns: list[str]) -> Iterator[RowError]:
+    """Yields an error for each date which is before a date in a previous column
+
+    For example, with columns [Date_onset, Date_death], rows with a death
+    before onset are errors. Missing dates are not checked.
+    """
+    dates = [as_lint_dates(df[c]).to_numpy() for c in columns]
+    ids = df["ID"].to_numpy()
+    for i, column in enumerate(columns[1:], start=1):
+        # column with the latest of the previous dates
+        latest = np.zeros(len(df), dtype=int)
+        for k in range(1, i):
+            previous = np.choose(latest, dates[:k])
+            latest[(dates[k] > previous) | np.isnat(previous)] = k
+        rows = np.flatnonzero(dates[i] < np.choose(latest, dates[:i]))
+        values = df[column].to_numpy()[rows]
+        for id, value, k in zip(ids[rows], values, latest[rows]):
+            yield RowError(
+                id, column, value, f"{column} must not be before {columns[k]}"
+            )
+
+
+LINT_RULES: dict[str, Callable[[pd.DataFrame, list[str]], Iterator[RowError]]] = {
+    "unique": check_unique,
+    "date_order": check_date_order,
+}
+
+
+def parse_lint_rules(config: list[dict[str, Any]]) -> list[LintRule]:
+    "Returns lint rules from the lint_rules key of an outbreak configuration"
+    rules = []
+    for rule in config:
+        if rule.get("rule") not in LINT_RULES:
+            raise ValueError(
+                f"Unknown lint rule {rule.get('rule')}, expected one of {list(LINT_RULES)}"
+            )
+        columns = rule.get("columns")
+        if isinstance(columns, str):
+            columns = [columns]
+        if not columns or (rule["rule"] == "date_order" and len(columns) < 2):
+            raise ValueError(
+                f"Lint rule {rule['rule']} requires columns, got {columns}"
+            )
+        rules.append(LintRule(rule["rule"], columns))
+    return rules
+
+
+def iter_rule_errors(
+    df: pd.DataFrame, rules: list[LintRule], ignore_fields: list[str] = []
+) -> Iterator[RowError]:
+    "Yields errors of lint rules, skipping rules which use ignored fields"
+    for rule in rules:
+        if set(rule.columns) & set(ignore_fields):
+            continue
+        if missing := [c for c in rule.columns if c not in df.columns]:
+            raise ValueError(
+                f"Lint rule {rule.rule} uses columns not present in data: {', '.join(missing)}"
+            )
+        yield from LINT_RULES[rule.rule](df, rule.columns)
+
+
+def write_ndjson(errors: Iterable[RowError], file: TextIO) -> Iterator[RowError]:
+    "Writes each error to file as a line of JSON as it passes through"
+    for e in errors:
+        file.write(json.dumps(e._asdict(), default=str) + "\n")
+        yield e
+
+
+def aggregate_errors(
+    errors: Iterable[RowError], max_examples: int = MAX_EXAMPLES, seed: int = 0
+) -> list[ErrorGroup]:
+    """Groups errors by column and message, in order of decreasing count
+
+    Each group keeps its count, the first and last IDs seen, and a reservoir
+    sample of at most max_examples (ID, value) pairs, so memory use depends
+    on the number of distinct errors, not the number of failing rows.
+    """
+    rng = random.Random(seed)
+    groups: dict[tuple[str, str], ErrorGroup] = {}
+    for e in errors:
+        if (group := groups.get((e.column, e.message))) is None:
+            group = groups[e.column, e.message] = ErrorGroup(
+                e.column, e.message, first_id=e.id
+            )
+        group.count += 1
+        group.last_id = e.id
+        if len(group.examples) < max_examples:
+            group.examples.append((e.id, e.value))
+        elif (i := rng.randrange(group.count)) < max_examples:
+            group.examples[i] = (e.id, e.value)
+    return sorted(groups.values(), key=lambda g: g.count, reverse=True)
@@ -2,21 +2,30 @@
 Outbreak configurations
 """
 
-import json
+import io
+import re
+import time
+import base64
 import warnings
+import contextlib
 import datetime
+import functools
+import itertools
+import concurrent.futures
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterator, TextIO
 
 import chevron
-import requests
 import mistune
+import botocore.exceptions
 import pandas as pd
 from ..plots import (
     get_counts,
     get_aggregate,
     get_countries_with_status,
     get_countries_with_anyof_statuses,
+    get_delay_summary,
+    get_dataset_counts,
     plot_epicurve,
     plot_timeseries_location_status,
     plot_age_gender,
@@ -25,20 +34,42 @@ from ..plots import (
     plot_trailing_case_count,
     plot_term_frequency,
     plot_wordcloud,
+    image_wordcloud,
 )
 
 import plotly.io
-import fastjsonschema
+import plotly.graph_objects as go
+from PIL import Image
+from ..diff import get_changes
+from ..profile import get_data_profile
+from ..figures import Figure, is_figure
+from ..shared import shared_linelists, attach_linelist
+from ..lint import (
+    read_schema,
+    iter_lint_rows,
+    aggregate_errors,
+    write_ndjson,
+    parse_lint_rules,
+    iter_rule_errors,
+)
 from ..util import (
     read_csv,
     read_yaml,
-    store_s3,
+    copy_s3,
+    S3Writer,
     invalidate_cache,
     msg_ok,
+    msg_fail,
     rename_columns,
-    get_archives_for_outbreak
+    get_archives_for_outbreak,
+)
+from ..registry import (
+    OUTBREAKS,  # noqa: F401
+    OUTBREAKS_PATH,
+    REQUIRED_OUTBREAK_ATTRIBUTES,  # noqa: F401
+    read_metadata,
 )
-from ..types import LintResult, RowError
+from ..types import LintResult
 from ..sources import source_databutton, source_google_sheet
 from .avian_influenza import plot_avian_influenza_age_gender, plot_avian_influenza_genomics, \
     table_avian_influenza_exposure
@@ -52,6 +83,10 @@ ALLOWED_METHODS = OUTBREAK_SPECIFIC_METHODS + [
     get_aggregate,
     get_countries_with_status,
     get_countries_with_anyof_statuses,
+    get_delay_summary,
+    get_dataset_counts,
+    get_changes,
+    get_data_profile,
     plot_age_gender,
     plot_data_availability,
     plot_delay_distribution,
@@ -67,21 +102,137 @@ ALLOWED_METHODS = OUTBREAK_SPECIFIC_METHODS + [
     rename_columns,
 ]
 
-OUTBREAKS_PATH = Path(__file__).parents[3] / "outbreaks"
 INCLUDES = OUTBREAKS_PATH / "includes"
-OUTBREAKS = [f.stem for f in OUTBREAKS_PATH.glob("*.yml")]
 TEMPLATES = OUTBREAKS_PATH / "templates"
-HEADER = (TEMPLATES / "_header.html").read_text()
-FOOTER = (TEMPLATES / "_footer.html").read_text()
 
 TABLE_POSTPROCESSORS = {"rename_columns"}
-REQUIRED_OUTBREAK_ATTRIBUTES = {"id", "description", "name", "display_name", "update_number", "reporting_period",
-                                "event_classification", "primary_data_sources"}
 METHOD = {f.__name__: f for f in ALLOWED_METHODS}
 
+# as_of offsets of secondary datasets from the report date, such as -7d or -1w
+REGEX_OFFSET = re.compile(r"^-(\d+)([dw])$")
+
+# Methods used in place of figure methods for static reports, returning
+# images directly instead of wrapping them in a plotly figure
+STATIC_METHOD = {"plot_wordcloud": image_wordcloud}
+
+
+def render_figure(fig: go.Figure | Figure, key: str) -> dict[str, str]:
+    """Renders plotly figure or figure specification (see olm.figures) to HTML
+
+    Figure specifications are serialised as they are, without validation.
+    """
+    return {
+        key: plotly.io.to_html(
+            fig,
+            include_plotlyjs=False,
+            full_html=False,
+            config={"displayModeBar": False},
+            validate=False,
+        )
+    }
+
+
+def render_static_figure(
+    fig: go.Figure | Figure | Image.Image | str, key: str, image_format: str = "svg"
+) -> dict[str, str]:
+    """Renders figure to an image that is inlined in the report
+
+    Parameters
+    ----------
+    fig
+        Plotly figure, figure specification, plotly figure as JSON, or image
+    key
+        Template variable to render figure to
+    image_format
+        Image format, one of svg or png. Images are always rendered as png.
+    """
+    if isinstance(fig, str):
+        fig = plotly.io.from_json(fig)
+    if is_figure(fig):
+        image = plotly.io.to_image(
+            fig,
+            format=image_format,
+            scale=1 if image_format == "svg" else 2,
+            validate=False,
+        )
+        if image_format == "svg":
+            return {key: f'<div class="static-figure">{image.decode("utf-8")}</div>'}
+        fig = Image.open(io.BytesIO(image))
+    buf = io.BytesIO()
+    fig.save(buf, format="PNG", optimize=True)
+    return {
+        key: f'<img class="static-figure" alt="{key}" '
+        f'src="data:image/png;base64,{base64.b64encode(buf.getvalue()).decode("ascii")}">'
+    }
+
+
+Token = tuple[str, str]
+
+_template_cache: dict[str, tuple[tuple[int, ...], list[list[Token]]]] = {}
+
 
-def render_figure(fig, key: str) -> str:
-    return {key: plotly.io.to_html(fig, include_plotlyjs=False, full_html=False, config={'displayModeBar': False})}
+def compile_template(outbreak: str) -> list[list[Token]]:
+    """Returns tokenized report template for an outbreak, with the common
+    header and footer
+
+    Tokens are grouped into top level chunks, each of which is either a
+    single literal or variable, or a complete section, so that chunks can be
+    rendered independently. Compiled templates are cached by modification
+    time of the template files.
+    """
+    if not (template := TEMPLATES / f"{outbreak}.html").exists():
+        raise FileNotFoundError(f"Template for outbreak not found at: {template}")
+    files = [TEMPLATES / "_header.html", template, TEMPLATES / "_footer.html"]
+    mtimes = tuple(f.stat().st_mtime_ns for f in files)
+    if (cached := _template_cache.get(outbreak)) is not None and cached[0] == mtimes:
+        return cached[1]
+    chunks, chunk, depth = [], [], 0
+    for tag, key in chevron.tokenizer.tokenize("".join(f.read_text() for f in files)):
+        chunk.append((tag, key))
+        if tag in ["section", "inverted section"]:
+            depth += 1
+        elif tag == "end":
+            depth -= 1
+        if depth == 0:
+            chunks.append(chunk)
+            chunk = []
+    _template_cache[outbreak] = (mtimes, chunks)
+    return chunks
+
+
+def render_template(outbreak: str, var: dict[str, Any]) -> Iterator[str]:
+    "Renders report template for an outbreak in chunks"
+    for chunk in compile_template(outbreak):
+        yield chevron.render(chunk, var)
+
+
+def write_report(
+    outbreak: str,
+    var: dict[str, Any],
+    output_file: str,
+    output_bucket: str | None = None,
+    keys: list[str] = [],
+) -> int:
+    """Renders report to a local file and optionally to a S3 bucket
+
+    The report is written in chunks, and uploaded to the first key at the same
+    time; the object is then copied to the other keys. Returns number of
+    bytes written.
+    """
+    with contextlib.ExitStack() as stack:
+        outputs = [stack.enter_context(open(output_file, "w"))]
+        if output_bucket:
+            outputs.append(
+                stack.enter_context(
+                    S3Writer(output_bucket, keys[0], content_type="text/html")
+                )
+            )
+        for chunk in render_template(outbreak, var):
+            for output in outputs:
+                output.write(chunk)
+    if output_bucket:
+        copy_s3(output_bucket, keys[0], keys[1:])
+    return Path(output_file).stat().st_size
 
 
 def get_plot_method(key: str) -> str | None:
@@ -108,48 +259,237 @@ def read_includes(outbreak: str, date: datetime.date) -> dict[str, Any]:
     for md_file in markdown_includes:
         data[md_file.stem.removeprefix(f"{date}_")] = mistune.html(md_file.read_text())
     if yaml_include.exists():
-        data = data.update(read_yaml(yaml_include))
+        data.update(read_yaml(yaml_include))
     return data
 
 
+def parse_offset(offset: str) -> datetime.timedelta:
+    "Returns offset from the report date, such as -7d (days) or -1w (weeks)"
+    if (match := REGEX_OFFSET.match(str(offset))) is None:
+        raise ValueError(
+            f"Invalid as_of offset {offset!r}, expected days or weeks before the report date, such as -7d"
+        )
+    n = int(match.group(1))
+    return (
+        -datetime.timedelta(days=n)
+        if match.group(2) == "d"
+        else -datetime.timedelta(weeks=n)
+    )
+
+
+class DatasetUnavailable(ValueError):
+    "Raised for plot entries using a secondary dataset which has no snapshot"
+
+
 class Outbreak:
     def __init__(self, config: str, url: str | None = None):
-        self.metadata = read_yaml(config)
-        assert (
-                REQUIRED_OUTBREAK_ATTRIBUTES <= set(self.metadata.keys())
-        ), f"All required attributes not present in YAML file: {REQUIRED_OUTBREAK_ATTRIBUTES}"
-        self.schema = None
+        self.config = config
+        self.metadata = read_metadata(config)
         self.name = Path(config).stem
         assert " " not in self.name, "Outbreak name should not have spaces"
 
         self.schema_url = self.metadata.get("schema")
+        # checks across rows or columns, see olm.lint.LINT_RULES
+        self.lint_rules = parse_lint_rules(self.metadata.get("lint_rules", []))
         self.additional_date_columns = self.metadata.get("additional_date_columns", [])
+        # CSV reader backend, see olm.readers
+        self.reader = self.metadata.get("csv_reader", "pandas")
+        # columns to read and Parquet row filters, see olm.readers.read_parquet()
+        self.columns = self.metadata.get("columns")
+        self.filters = self.metadata.get("filters")
         self.display_name = self.metadata.get("display_name")
         self.update_number = self.metadata.get("update_number")
         self.reporting_period = self.metadata.get("reporting_period")
         self.event_classification = self.metadata.get("event_classification")
         self.primary_data_sources = self.metadata.get("primary_data_sources")
         self.url = self.metadata.get("url")
-        self.url_cattle = self.metadata.get("url_cattle")
-        self.url_poultry = self.metadata.get("url_poultry")
+        # secondary datasets, from the datasets key or url_<name> keys
+        self.dataset_config: dict[str, dict[str, Any]] = {
+            k.removeprefix("url_"): {"url": v}
+            for k, v in self.metadata.items()
+            if k.startswith("url_")
+        } | {
+            k: v if isinstance(v, dict) else {"url": v}
+            for k, v in self.metadata.get("datasets", {}).items()
+        }
+        for config in self.dataset_config.values():
+            if "as_of" in config:
+                parse_offset(config["as_of"])  # fail early on invalid offsets
         self.plots = self.metadata.get("plots", {})
-        if isinstance(self.schema_url, str):
-            if (
-                    self.schema_url.startswith("http")
-                    and (res := requests.get(self.schema_url)).status_code == 200
-            ):
-                self.schema = res.json()
-            else:
-                self.schema = json.loads(Path(self.schema_url).read_text())
+        self.datasets: dict[str, pd.DataFrame] = {}
+        # report date and URL each loaded dataset was read from, None if unavailable
+        self.dataset_urls: dict[str, tuple[datetime.date, str | None]] = {}
+        # report date, from which dataset snapshots are found, defaults to today
+        self.date: datetime.date | None = None
+        # if True, every secondary dataset is read from its snapshot on or
+        # before the report date, as for backfilled reports
+        self.snapshot_datasets = False
+        self._snapshot_urls: dict[tuple[str, datetime.date], str] = {}
         if url:
             self.url = url
-        if self.url:
-            self.data = self.read(url)
+
+    @functools.cached_property
+    def data(self) -> pd.DataFrame:
+        "Outbreak data, only downloaded when first accessed"
+        return self.read()
+
+    def snapshot_url(self, source: str, date: datetime.date) -> str:
+        """Returns local path for the latest snapshot of source on or before
+        date, see olm.backfill.get_snapshot()
+
+        Snapshots before today do not change, so they are only looked up once.
+        """
+        # imported here as olm.backfill builds outbreak reports
+        from ..backfill import get_snapshot
+
+        if (url := self._snapshot_urls.get((source, date))) is None:
+            url = get_snapshot(source, date)
+            if date < datetime.date.today():
+                self._snapshot_urls[source, date] = url
+        return url
+
+    def dataset_url(self, name: str, date: datetime.date | None = None) -> str | None:
+        """Returns URL to read a secondary dataset from for a report date
+
+        A dataset with an as_of offset, such as -7d, is read from its latest
+        snapshot on or before the report date (default today) plus the
+        offset. Snapshots are the versions of the S3 object at the dataset
+        URL, or the files of the folder in the snapshots key of the dataset,
+        see olm.backfill.get_snapshots(). If snapshot_datasets is True, other
+        datasets are read from their snapshot on or before the report date.
+
+        If no snapshot is found, this raises for snapshot_datasets, and
+        otherwise returns None with a warning, and plot entries using the
+        dataset are left out of the report.
+        """
+        if name not in self.dataset_config:
+            raise ValueError(f"Dataset {name} not specified for outbreak: {self.name}")
+        config = self.dataset_config[name]
+        date = date or datetime.date.today()
+        if "as_of" in config:
+            date += parse_offset(config["as_of"])
+        elif not self.snapshot_datasets:
+            return config["url"]
+        source = config.get("snapshots", config["url"])
+        if self.snapshot_datasets:
+            return self.snapshot_url(source, date)
+        try:
+            return self.snapshot_url(source, date)
+        except (
+            ValueError,
+            botocore.exceptions.BotoCoreError,
+            botocore.exceptions.ClientError,
+        ) as e:
+            msg_fail(
+                "report",
+                f"dataset {name} not loaded, no snapshot on or before {date}: {e}",
+            )
+            return None
+
+    def read_dataset(self, name: str, url: str | None = None) -> pd.DataFrame:
+        "Loads secondary dataset from URL or path, by default dataset_url()"
+        config = self.dataset_config[name]
+        if (url := url or self.dataset_url(name, self.date)) is None:
+            raise DatasetUnavailable(
+                f"Dataset {name} has no snapshot for outbreak: {self.name}"
+            )
+        return read_csv(
+            url, config.get("additional_date_columns", []), reader=self.reader
+        )
+
+    def load(self, datasets: list[str] | None = None):
+        """Downloads outbreak data and secondary datasets concurrently
+
+        Parameters
+        ----------
+        datasets
+            Secondary datasets to load, defaults to all datasets. Datasets
+            which are already loaded for the report date, see dataset_url(),
+            are not downloaded again.
+        """
+        date = self.date or datetime.date.today()
+        names = [
+            n
+            for n in (self.dataset_config if datasets is None else datasets)
+            if n not in self.dataset_urls or self.dataset_urls[n][0] != date
+        ]
+        with concurrent.futures.ThreadPoolExecutor() as executor:
+            data = executor.submit(lambda: self.data)
+            urls = dict(
+                zip(
+                    names, executor.map(self.dataset_url, names, itertools.repeat(date))
+                )
+            )
+            read = {
+                n: url
+                for n, url in urls.items()
+                if url is not None
+                and (n not in self.datasets or self.dataset_urls[n][1] != url)
+            }
+            self.datasets.update(
+                zip(read, executor.map(self.read_dataset, read, read.values()))
+            )
+            for n, url in urls.items():
+                if url is None:
+                    self.datasets.pop(n, None)
+                self.dataset_urls[n] = (date, url)
+            data.result()
+
+    def plot_datasets(self) -> list[str]:
+        "Returns secondary datasets used by plot entries"
+        names = []
+        for kwargs in self.plots.values():
+            kwargs = kwargs or {}
+            names.extend(
+                ([kwargs["dataset"]] if "dataset" in kwargs else [])
+                + list(kwargs.get("datasets", {}).values())
+            )
+        return sorted(set(names))
+
+    def plot_arguments(
+        self, plot: str, df: pd.DataFrame
+    ) -> tuple[pd.DataFrame, dict[str, Any]]:
+        """Returns data and keyword arguments for a plot entry
+
+        A plot entry can specify a secondary dataset to use instead of the
+        outbreak data with the dataset key, and pass secondary datasets
+        as keyword arguments with the datasets key, which maps argument names
+        to dataset names.
+        """
+        kwargs = dict(self.plots[plot] or {})
+        names = kwargs.pop("datasets", {})
+        if (dataset := kwargs.pop("dataset", None)) is not None:
+            names = {"": dataset} | names
+        self.load(list(names.values()))
+        if missing := [n for n in names.values() if n not in self.datasets]:
+            raise DatasetUnavailable(
+                f"Dataset {', '.join(missing)} not loaded for plot entry {plot}"
+            )
+        for argument, dataset in names.items():
+            if argument:
+                kwargs[argument] = self.datasets[dataset]
+            else:
+                df = self.datasets[dataset]
+        return df, kwargs
+
+    @functools.cached_property
+    def schema(self) -> dict[str, Any] | None:
+        "Outbreak schema, only fetched when first accessed"
+        if isinstance(self.schema_url, str):
+            return read_schema(self.schema_url)
+        return None
 
     def read(
-            self, data_url: str | None = None, convert_dates: bool = True
+        self,
+        data_url: str | None = None,
+        convert_dates: bool = True,
+        select: bool = True,
     ) -> pd.DataFrame:
-        "Loads outbreak data from URL or path"
+        """Loads outbreak data from URL or path
+
+        If select is True, only the columns and rows selected by the columns
+        and filters keys of the outbreak configuration are read.
+        """
         data_url = data_url or self.url
         if data_url is None:
             raise ValueError(
@@ -160,52 +500,133 @@ class Outbreak:
             data_url,
             additional_date_columns=self.additional_date_columns,
             convert_dates=convert_dates,
+            reader=self.reader,
+            columns=self.columns if select else None,
+            filters=self.filters if select else None,
         )
 
-    def lint(self, ignore_fields: list[str] = []) -> LintResult:
-        errors: list[RowError] = []
-        if not self.schema:
-            raise ValueError("No schema supplied for outbreak in configuration")
-        # do not convert dates as fastjsonschema will check date string representation
-        df = self.read(convert_dates=False)
-        validator = fastjsonschema.compile(self.schema)
+    def lint(
+        self,
+        ignore_fields: list[str] = [],
+        incremental: bool = True,
+        errors_file: TextIO | None = None,
+    ) -> LintResult:
+        """Lints outbreak data against the outbreak schema and lint rules
 
-        for row in df.to_dict("records"):
-            id = row["ID"]
-            nrow = {
-                k: v for k, v in row.items() if pd.notnull(v) and k not in ignore_fields
-            }
-            try:
-                validator(nrow)
-            except fastjsonschema.JsonSchemaValueException as e:
-                column = e.path[1]
-                errors.append(RowError(id, column, nrow[column], e.message))
-        return LintResult(self.name, str(self.schema_url), len(errors) == 0, errors)
-
-    def make_report(
-            self,
-            add_archive: bool = False,
-            output_bucket: str | None = None,
-            cloudfront_distribution: str | None = None,
-    ):
-        """Build epidemiological report
+        Errors are aggregated by column and message as they are found, see
+        aggregate_errors(). Lint rules, such as unique IDs, are always checked
+        on all rows, as rows which did not change can conflict with rows
+        which did.
 
         Parameters
         ----------
-        add_archive
-            Add links to report archives if True
-        output_bucket
-            Output S3 bucket to write result to, in addition to local HTML output
-            to {outbreak_name}.html
-        cloudfront_distribution
-            If specified, invalidates the cache for the cloudfront distribution
-            without which changes are not made available
+        ignore_fields
+            Fields which are not validated
+        incremental
+            If True, only rows which are new or have changed since the
+            previous lint are validated
+        errors_file
+            If specified, every error is also written to this file as
+            newline delimited JSON
+        """
+        if not self.schema and not self.lint_rules:
+            raise ValueError(
+                "No schema or lint rules supplied for outbreak in configuration"
+            )
+        # do not convert dates as fastjsonschema will check date string representation
+        df = self.read(convert_dates=False, select=False)
+        errors = itertools.chain(
+            iter_lint_rows(self.name, df, self.schema, ignore_fields, incremental)
+            if self.schema
+            else [],
+            iter_rule_errors(df, self.lint_rules, ignore_fields),
+        )
+        if errors_file is not None:
+            errors = write_ndjson(errors, errors_file)
+        groups = aggregate_errors(errors)
+        return LintResult(self.name, str(self.schema_url), len(groups) == 0, groups)
+
+    def build_plot(
+        self, plot: str, df: pd.DataFrame, static: bool = False
+    ) -> dict[str, Any]:
+        """Returns template variables for a plot entry
+
+        For static reports, figures are not rendered and are returned as
+        plotly figures or images, to be rendered by render_static_figure()
+        """
+        plot_type, plot_key, *plot_info = plot.split("/")
+        try:
+            df, kwargs = self.plot_arguments(plot, df)
+        except DatasetUnavailable as e:
+            msg_fail("report", f"left out {plot}: {e}")
+            return {}
+        match plot_type:
+            case "data":
+                return METHOD[plot_info[0] if plot_info else plot_key](df, **kwargs)
+            case "table":
+                if (
+                    proc := plot_info[0] if plot_info else get_plot_method(plot)
+                ) is None:
+                    raise ValueError(
+                        f"No plotting function specified or inferred from plot key: {plot}"
+                    )
+                if plot_key.startswith("exposure_over_states"):
+                    return {plot_key: METHOD[proc](df, **kwargs)}
+
+                # drop post processors from kwargs
+                proc_kwargs = {
+                    k: v for k, v in kwargs.items() if k not in TABLE_POSTPROCESSORS
+                }
+                table_data = METHOD[proc](df, **proc_kwargs)
+                for post_processor in TABLE_POSTPROCESSORS & set(kwargs):
+                    table_data = METHOD[post_processor](
+                        table_data, kwargs[post_processor]
+                    )
+                return {plot_key: table_data.to_html(index=False)}
+            case "figure":
+                if (
+                    proc := plot_info[0] if plot_info else get_plot_method(plot)
+                ) is None:
+                    raise ValueError(
+                        f"No plotting function specified or inferred from plot key: {plot}"
+                    )
+                if static:
+                    return {
+                        plot_key: STATIC_METHOD.get(proc, METHOD[proc])(df, **kwargs)
+                    }
+                return render_figure(METHOD[proc](df, **kwargs), plot_key)
+        return {}
+
+    def build_plots(
+        self, df: pd.DataFrame, static: bool = False, processes: int = 1
+    ) -> Iterator[dict[str, Any]]:
+        """Returns template variables for each plot entry, in order
+
+        With more than one process, the outbreak data and loaded secondary
+        datasets are published once as shared linelists (see olm.shared),
+        and plot entries are built by worker processes attached to them,
+        instead of each worker receiving a pickled copy.
         """
-        date = datetime.datetime.today().date()
-        output_file = f"{self.name}.html"
-        if not (template := TEMPLATES / output_file).exists():
-            raise FileNotFoundError(f"Template for outbreak not found at: {template}")
-        template_text = HEADER + template.read_text() + FOOTER
+        if processes <= 1:
+            for plot in self.plots:
+                yield self.build_plot(plot, df, static=static)
+            return
+        with (
+            shared_linelists({"": df, **self.datasets}) as files,
+            concurrent.futures.ProcessPoolExecutor(
+                processes,
+                initializer=attach_outbreak,
+                initargs=(self.config, self.url, files, self.date, self.dataset_urls),
+            ) as executor,
+        ):
+            yield from executor.map(
+                build_attached_plot, self.plots, itertools.repeat(static)
+            )
+
+    def report_variables(
+        self, date: datetime.date, add_archive: bool = False, static: bool = False
+    ) -> dict[str, Any]:
+        "Returns template variables which do not depend on outbreak data"
         if self.url is None:
             raise ValueError("No data url specified")
         var = {
@@ -219,62 +640,128 @@ class Outbreak:
             "event_classification": self.event_classification,
             "primary_data_sources": self.primary_data_sources,
             "data_url": self.metadata.get("url", ""),
+            "static": static,
         }
         if add_archive:
             archives = get_archives_for_outbreak(self.name)
             var["archives"] = [{"link": a, "text": a.removesuffix(".html")} for a in archives]
         # read includes from outbreaks/<outbreak>/includes
         # each include file must be prefixed by date
-        var.update(read_includes(self.name, datetime.datetime.utcnow().date()))
-        df = read_csv(self.url, self.metadata.get("additional_date_columns", []))
-        for plot in self.plots:
-            plot_type, plot_key, *plot_info = plot.split("/")
-            kwargs = self.plots[plot]
-            if kwargs is None:
-                kwargs = {}
-            match plot_type:
-                case "data":
-                    var.update(METHOD[plot_key](df, **kwargs))
-                case "table":
-                    if (
-                            proc := plot_info[0] if plot_info else get_plot_method(plot)
-                    ) is None:
-                        raise ValueError(
-                            f"No plotting function specified or inferred from plot key: {plot}"
-                        )
-                    if plot_key.startswith('exposure_over_states'):
-                        var[plot_key] = METHOD[proc](df, **kwargs)
-                    else:
-
-                        # drop post processors from kwargs
-                        proc_kwargs = {
-                            k: v for k, v in kwargs.items() if k not in TABLE_POSTPROCESSORS
-                        }
-                        table_data = METHOD[proc](df, **proc_kwargs)
-                        for post_processor in TABLE_POSTPROCESSORS & set(kwargs):
-                            table_data = METHOD[post_processor](
-                                table_data, kwargs[post_processor]
-                            )
-                        var[plot_key] = table_data.to_html(index=False)
-                case "figure":
-                    if (
-                            proc := plot_info[0] if plot_info else get_plot_method(plot)
-                    ) is None:
-                        raise ValueError(
-                            f"No plotting function specified or inferred from plot key: {plot}"
-                        )
-                    var.update(render_figure(METHOD[proc](df, **kwargs), plot_key))
-
-        report_data = chevron.render(template_text, var)
-        Path(output_file).write_text(report_data)
-        msg_ok("report", "wrote " + output_file)
+        var.update(read_includes(self.name, date))
+        return var
 
-        if output_bucket:
-            store_s3(
-                report_data,
-                [f"{self.name}/index.html", f"{self.name}/{date}.html"],
-                bucket_name=output_bucket,
-                content_type="text/html",
-            )
+    def build_report(
+        self,
+        date: datetime.date,
+        add_archive: bool = False,
+        static: bool = False,
+        image_format: str = "svg",
+        processes: int = 1,
+    ) -> dict[str, Any]:
+        "Returns template variables for the report published on date, see make_report()"
+        var = self.report_variables(date, add_archive, static)
+        self.date = date
+        self.load(self.plot_datasets())
+        df = self.data
+        figures = {}
+        for plot, plot_var in zip(self.plots, self.build_plots(df, static, processes)):
+            if static and plot.startswith("figure/"):
+                figures.update(plot_var)
+            else:
+                var.update(plot_var)
+        if figures:
+            # image export is slow, so figures are rendered in parallel
+            with concurrent.futures.ProcessPoolExecutor() as executor:
+                for rendered in executor.map(
+                    render_static_figure,
+                    [
+                        fig.to_json() if isinstance(fig, go.Figure) else fig
+                        for fig in figures.values()
+                    ],
+                    figures.keys(),
+                    itertools.repeat(image_format),
+                ):
+                    var.update(rendered)
+        return var
+
+    def make_report(
+        self,
+        add_archive: bool = False,
+        output_bucket: str | None = None,
+        cloudfront_distribution: str | None = None,
+        static: bool = False,
+        image_format: str = "svg",
+        processes: int = 1,
+        date: datetime.date | None = None,
+    ):
+        """Build epidemiological report
+
+        Parameters
+        ----------
+        add_archive
+            Add links to report archives if True
+        output_bucket
+            Output S3 bucket to write result to, in addition to local HTML output
+            to {outbreak_name}.html
+        cloudfront_distribution
+            If specified, invalidates the cache for the cloudfront distribution
+            without which changes are not made available
+        static
+            If True, renders figures to static images instead of interactive
+            plotly figures, so that the report does not require JavaScript.
+            Static reports are written to {outbreak_name}-static.html
+        image_format
+            Image format for static figures, one of svg or png
+        processes
+            Number of processes used to build plot entries, see build_plots()
+        date
+            Date the report is published on, defaults to today
+        """
+        start_time = time.perf_counter()
+        date = date or datetime.datetime.today().date()
+        output_file = f"{self.name}-static.html" if static else f"{self.name}.html"
+        compile_template(self.name)  # fail early if template is not present
+        var = self.build_report(date, add_archive, static, image_format, processes)
+        keys = [
+            f"{self.report_prefix(static)}/index.html",
+            f"{self.report_prefix(static)}/{date}.html",
+        ]
+        size = write_report(self.name, var, output_file, output_bucket, keys)
+        msg_ok(
+            "report",
+            f"wrote {output_file} ({size / 1024:,.0f} KiB"
+            + ("" if static else ", without plotly.js")
+            + f", {time.perf_counter() - start_time:.1f}s)",
+        )
         if cloudfront_distribution:
-            invalidate_cache(cloudfront_distribution)
+            invalidate_cache(cloudfront_distribution, ["/" + k for k in keys])
+
+    def report_prefix(self, static: bool = False) -> str:
+        "Returns S3 key prefix for reports"
+        return f"{self.name}/static" if static else self.name
+
+
+# outbreak attached to shared linelists in plot worker processes
+_attached_outbreak: Outbreak | None = None
+
+
+def attach_outbreak(
+    config: str,
+    url: str | None,
+    files: dict[str, Path],
+    date: datetime.date | None = None,
+    dataset_urls: dict[str, tuple[datetime.date, str | None]] = {},
+):
+    "Initialises plot worker process with outbreak data from shared linelists"
+    global _attached_outbreak
+    _attached_outbreak = Outbreak(config, url)
+    _attached_outbreak.date = date
+    _attached_outbreak.dataset_urls = dict(dataset_urls)
+    _attached_outbreak.datasets = {
+        name: attach_linelist(file) for name, file in files.items()
+    }
+    _attached_outbreak.data = _attached_outbreak.datasets.pop("")
+
+
+def build_attached_plot(plot: str, static: bool = False) -> dict[str, Any]:
+    return _attached_outbreak.build_plot(plot, _attached_outbreak.data, static=static)
@@ -1,8 +1,20 @@
 "Avian Influenza outbreak specific functions"
 
+import numpy as np
 import pandas as pd
 
+from ..diff import get_diff
 from ..plots import stacked_barchart
+from ..summary import summary_counts
+
+EXPOSURE_COLUMNS = [
+    "Exposure from Commercial Cattle",
+    "Exposure from Commercial Poultry",
+    "Other Animal Exposure",
+    "Exposure Source Unknown",
+]
+TOTAL_COLUMN = "Total"
+CHANGE_COLUMN = "Change Since Last Report"
 
 
 def plot_avian_influenza_age_gender(df: pd.DataFrame) -> pd.DataFrame:
@@ -35,38 +47,68 @@ def plot_avian_influenza_genomics(df: pd.DataFrame) -> pd.DataFrame:
     return stacked_barchart(df, y_axis, color_column, "Case Count", "Genomics Genotype")
 
 
-def table_avian_influenza_exposure(df: pd.DataFrame, case_status_value: str, groupby_col: str, groupby_col_name: str,
-                                   change_since_last_report: dict[str, int]):
-    cattle_column = 'Exposure from Commercial Cattle'
-    poultry_column = 'Exposure from Commercial Poultry'
-    other_column = 'Other Animal Exposure'
-    unknown_column = 'Exposure Source Unknown'
-    total_column = 'Total'
-    change_column = 'Change Since Last Report'
-
-    # Extract details for exposure source over location
-    df = df[df['Case_status'] == case_status_value]
-    total_count = df[groupby_col].value_counts()
-    additional_counts = [
-        {'column_name': cattle_column, 'data': df[df['Contact_animal_species'] == 'Cow'][groupby_col].value_counts()},
-        {'column_name': poultry_column,
-         'data': df[(df['Contact_animal'] == 'COMMERCIAL') & (df['Contact_animal_species'] == 'Poultry')][
-             groupby_col].value_counts()},
-        {'column_name': other_column, 'data': df[df['Contact_animal'] == 'BACKYARD'][groupby_col].value_counts()},
-        {'column_name': unknown_column, 'data': df[df['Contact_animal'].isna()][groupby_col].value_counts()},
-        {'column_name': change_column, 'data': change_since_last_report},
+def get_avian_influenza_exposure(df: pd.DataFrame) -> pd.Series:
+    """Returns exposure class for each case
+
+    Each case is assigned the first matching class, in order: commercial cattle,
+    commercial poultry, other animal (backyard) and unknown exposure. Cases
+    matching no class are only counted in the total.
+    """
+    return pd.Series(
+        np.select(
+            [
+                df["Contact_animal_species"] == "Cow",
+                (df["Contact_animal"] == "COMMERCIAL")
+                & (df["Contact_animal_species"] == "Poultry"),
+                df["Contact_animal"] == "BACKYARD",
+                df["Contact_animal"].isna(),
+            ],
+            EXPOSURE_COLUMNS,
+            default=None,
+        ),
+        index=df.index,
+        name="Exposure",
+    )
+
+
+def table_avian_influenza_exposure(
+    df: pd.DataFrame,
+    case_status_value: str,
+    groupby_col: str,
+    groupby_col_name: str,
+    change_since_last_report: dict[str, int] = {},
+    previous: pd.DataFrame | None = None,
+):
+    """Returns table of cases by exposure source over location
+
+    Change since last report is taken from change_since_last_report, or
+    computed from the previous linelist if specified
+    """
+    if previous is not None:
+        change_since_last_report = get_diff(previous, df).delta(
+            groupby_col, where=lambda d: d["Case_status"] == case_status_value
+        )
+
+    # Extract details for exposure source over location, locations with
+    # most cases first
+    counts = summary_counts(
+        df, ["Case_status", groupby_col, "Contact_animal", "Contact_animal_species"]
+    )
+    counts = counts[
+        (counts["Case_status"] == case_status_value) & counts[groupby_col].notna()
     ]
-
-    # Generate dataframe
-    table = pd.DataFrame({groupby_col_name: total_count.index, total_column: total_count.values})
-    for additional_count in additional_counts:
-        table[additional_count['column_name']] = table[groupby_col_name].map(additional_count['data'])
-
-    # Reorder dataframe columns
-    table = table.loc[
-        :, [groupby_col_name, cattle_column, poultry_column, other_column, unknown_column, total_column,
-            change_column]]
-
-    # Replace float values with int and fill empty cells with zeros
-    pd.options.display.float_format = '{:,.0f}'.format
-    return table.fillna(int(0))
\ No newline at end of file
+    total_count = (
+        counts.groupby(groupby_col).n.sum().sort_values(ascending=False, kind="stable")
+    )
+    table = (
+        counts.assign(Exposure=get_avian_influenza_exposure(counts))
+        .pivot_table(index=groupby_col, columns="Exposure", values="n", aggfunc="sum")
+        .reindex(index=total_count.index, columns=EXPOSURE_COLUMNS)
+        .fillna(0)
+        .astype(int)
+    )
+    table[TOTAL_COLUMN] = total_count
+    table[CHANGE_COLUMN] = (
+        table.index.map(change_since_last_report).fillna(0).astype(int)
+    )
+    return table.rename_axis(index=groupby_col_name, columns=None).reset_index()
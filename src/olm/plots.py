@@ -1,72 +1,75 @@
 """
 Library of plots used in most outbreaks
 """
+
+import io
+import json
+import base64
+import hashlib
+import weakref
 import collections
-import logging
 from typing import Any
 
 import pandas as pd
 import numpy as np
-from dateutil.parser import ParserError
 import plotly.graph_objects as go
-import plotly.express as px
 
+from PIL import Image
 from plotly.subplots import make_subplots
 from wordcloud import WordCloud
 from datetime import timedelta
 
 from .util import (
-    percentage_occurrence,
     name_bin,
     AGE_BINS,
     get_age_bins,
     non_null_unique,
+    CACHE_FOLDER,
+    temporary_file,
+    replace_file,
+)
+from .types import DelayDistribution, TermFrequencies
+from .diff import count_added
+from .summary import get_summary_table, summary_counts, VALID_AGE_GENDER, FARM_WORKER
+from .profile import get_profile
+from .figures import (
+    Figure,
+    figure,
+    to_array,
+    standard_plot_layout,
+    standard_axis_layout,
 )
 from .theme import (
-    FONT,
     TITLE_FONT,
     PALETTE,
     LEGEND_FONT_SIZE,
     BLUE_PRIMARY_COLOR,
     PRIMARY_COLOR,
     SECONDARY_COLOR,
-    BG_COLOR,
     FG_COLOR,
-    GRID_COLOR,
-    LEGEND_BG_COLOR,
 )
 
 REGEX_DATE = r"^202\d-[0,1]\d-[0-3]\d"
+DELAY_QUANTILES = [0.05, 0.25, 0.5, 0.75, 0.95]
+TERM_SEPARATOR = r"[,;]"
+# epicurve resampling periods: epidemiological weeks (Sunday to Saturday),
+# ISO weeks (Monday to Sunday) and calendar months
+EPICURVE_PERIODS = {"epiweek": "W-SAT", "isoweek": "W-SUN", "month": "M"}
+WORDCLOUD_CACHE_FOLDER = CACHE_FOLDER / "wordclouds"
 
 pd.options.mode.chained_assignment = None
 
-standard_plot_layout = {
-    'plot_bgcolor': BG_COLOR,
-    'font_family': FONT,
-    'legend_font_family': TITLE_FONT,
-    'legend_font_size': LEGEND_FONT_SIZE,
-    'paper_bgcolor': BG_COLOR,
-    'hoverlabel_font_family': FONT,
-    'legend_bgcolor': LEGEND_BG_COLOR,
-    'title_font_color': FG_COLOR,
-    'title_font_family': TITLE_FONT,
-}
-
-standard_axis_layout = {
-    'title_font_family': TITLE_FONT,
-    'gridcolor': GRID_COLOR,
-    'linecolor': GRID_COLOR,
-    'title_font_color': FG_COLOR
-}
-
 
 def get_aggregate(
         df: pd.DataFrame, country_col: str, columns=list[tuple[str, str]]
 ) -> pd.DataFrame:
     "Get aggregate for line list"
+    table = get_summary_table(df, [country_col, *(col for col, _ in columns)])
     dfs = []
     for col, value in columns:
-        dfs.append(df[df[col] == value].groupby(country_col).size().rename(value))
+        dfs.append(
+            table[table[col] == value].groupby(country_col).n.sum().rename(value)
+        )
     return pd.DataFrame(dfs).T.fillna(0).astype(int).reset_index()
 
 
@@ -79,14 +82,14 @@ def get_countries_with_status(
     """For a set of statuses, gets number of countries which have the status,
     and the number of countries who have that status exclusively"""
 
+    table = get_summary_table(df, [status_col, country_col])
     out = {}
     for status in statuses:
-        out[f"n_countries_{status}"] = len(
-            df[df[status_col] == status][country_col].unique()
-        )
+        has_status = table[status_col] == status
+        countries = pd.Index(table[has_status][country_col].unique())
+        out[f"n_countries_{status}"] = len(countries)
         out[f"n_countries_{status}_only"] = len(
-            set(df[df[status_col] == status][country_col])
-            - set(df[df[status_col] != status][country_col])
+            countries.difference(table[~has_status][country_col].unique())
         )
     return out
 
@@ -98,24 +101,21 @@ def get_countries_with_anyof_statuses(
         status_col: str = "Case_status",
 ) -> dict[str, int]:
     "Gets number of countries which have any of the statuses listed"
+    table = get_summary_table(df, [status_col, country_col])
     return {
         "n_countries_" + "_or_".join(sorted(statuses)): len(
-            df[df[status_col].isin(statuses)][country_col].unique()
+            table[table[status_col].isin(statuses)][country_col].unique()
         )
     }
 
 
 def get_age_bin_data(df: pd.DataFrame) -> pd.DataFrame:
-    confirmed = df[df.Case_status == "confirmed"][["Age", "Gender"]]
+    counts = summary_counts(df, ["Case_status", "Age", "Gender"])
+    confirmed = counts[counts.Case_status == "confirmed"]
     confirmed["Gender"] = confirmed.Gender.apply(
         lambda x: x.strip() if isinstance(x, str) else x
     )
-    age_gender = (
-        confirmed.groupby(["Age", "Gender"])
-        .size()
-        .reset_index()
-        .rename(columns={0: "n"})
-    )
+    age_gender = confirmed.groupby(["Age", "Gender"]).n.sum().reset_index()
     age_gender["Age_bins"] = age_gender.Age.map(get_age_bins)
     age_gender["distributed_n"] = age_gender.n / age_gender.Age_bins.map(len)
 
@@ -127,30 +127,121 @@ def get_age_bin_data(df: pd.DataFrame) -> pd.DataFrame:
     return final.groupby(["Bin", "Gender"]).sum().reset_index()
 
 
+def as_dates(s: pd.Series) -> pd.Series:
+    "Returns series as dates, with values not matching REGEX_DATE set to NaT"
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return s
+    return pd.to_datetime(
+        s.where(s.astype(str).str.fullmatch(REGEX_DATE)),
+        format="%Y-%m-%d",
+        errors="coerce",
+    )
+
+
+_delay_cache: dict[tuple[int, str], pd.DataFrame] = {}
+
+
+def get_delay_frame(df: pd.DataFrame, onset_col: str = "Date_onset") -> pd.DataFrame:
+    """Returns delays from onset_col to every other date column
+
+    Delays for all date columns are computed in one vectorized pass and cached
+    for the lifetime of the dataframe, so that several delay distributions from
+    the same onset column share the work. Dataframes are not expected to be
+    modified in place once read.
+    """
+    key = (id(df), onset_col)
+    if key not in _delay_cache:
+        date_columns = [
+            c
+            for c in df.columns
+            if c != onset_col
+            and (c.startswith("Date_") or pd.api.types.is_datetime64_any_dtype(df[c]))
+        ]
+        dates = pd.DataFrame({c: as_dates(df[c]) for c in date_columns}, index=df.index)
+        _delay_cache[key] = dates.sub(as_dates(df[onset_col]), axis=0)
+        weakref.finalize(df, _delay_cache.pop, key, None)
+    return _delay_cache[key]
+
+
 def get_delays(
         df: pd.DataFrame, target_col: str, onset_col: str = "Date_onset"
 ) -> pd.Series:
-    both = df[
-        ~pd.isna(df[target_col])
-        & ~pd.isna(df[onset_col])
-        & df[target_col].astype(str).str.fullmatch(REGEX_DATE)
-        & df[onset_col].astype(str).str.fullmatch(REGEX_DATE)
-        ]
-    try:
-        both[target_col] = pd.to_datetime(both[target_col])
-        both[onset_col] = pd.to_datetime(both[onset_col])
-    except ParserError:
-        logging.error("Error occured when parsing date from column")
-        raise
-    return both[target_col] - both[onset_col]
+    "Returns delays from onset_col to target_col where both dates are present"
+    return get_delay_frame(df, onset_col)[target_col].dropna()
+
+
+def get_delay_distributions(
+    df: pd.DataFrame,
+    targets: list[str],
+    onset_col: str = "Date_onset",
+    max_delay_days: int | None = None,
+    quantiles: list[float] = DELAY_QUANTILES,
+) -> dict[str, DelayDistribution]:
+    """Returns delay distributions from onset for target date columns
+
+    Parameters
+    ----------
+    df
+        Data from which delays are obtained
+    targets
+        Target date columns, e.g. ['Date_death', 'Date_of_first_consult']
+    onset_col
+        Onset date column
+    max_delay_days
+        Delays above this value are counted in n_beyond_max, and the
+        histogram always includes this value
+    quantiles
+        Quantiles of the delay distribution to return
+    """
+    days = get_delay_frame(df, onset_col)[targets] / pd.Timedelta(days=1)
+    summary = days.quantile(sorted({0.25, 0.5, 0.75, *quantiles}))
+    out = {}
+    for target in targets:
+        delays = days[target].dropna()
+        histogram = delays.astype(int).value_counts().sort_index()
+        if max_delay_days is not None and max_delay_days not in histogram:
+            histogram[max_delay_days] = 0
+        out[target] = DelayDistribution(
+            target=target,
+            n=len(delays),
+            median=summary.at[0.5, target],
+            iqr=summary.at[0.75, target] - summary.at[0.25, target],
+            quantiles={q: summary.at[q, target] for q in quantiles},
+            n_beyond_max=int((delays > max_delay_days).sum())
+            if max_delay_days is not None
+            else 0,
+            histogram=histogram,
+        )
+    return out
+
+
+def get_delay_summary(
+    df: pd.DataFrame,
+    targets: list[str],
+    onset_col: str = "Date_onset",
+    max_delay_days: int | None = None,
+) -> dict[str, Any]:
+    "Returns median, IQR and count of delays from onset for each target column"
+    out = {}
+    for target, dist in get_delay_distributions(
+        df, targets, onset_col, max_delay_days
+    ).items():
+        prefix = "delay_" + target.removeprefix("Date_").lower()
+        out[f"{prefix}_n"] = dist.n
+        out[f"{prefix}_median"] = dist.median
+        out[f"{prefix}_iqr"] = dist.iqr
+        if max_delay_days is not None:
+            out[f"{prefix}_n_beyond_max"] = dist.n_beyond_max
+    return out
 
 
 def get_epicurve(
-        df: pd.DataFrame,
-        date_col: str,
-        groupby_col: str,
-        values: list[str] | None = None,
-        cumulative: bool = True,
+    df: pd.DataFrame,
+    date_col: str,
+    groupby_col: str,
+    values: list[str] | None = None,
+    cumulative: bool = True,
+    resample: str | None = None,
 ) -> pd.DataFrame:
     """Returns epidemic curve
 
@@ -166,42 +257,133 @@ def get_epicurve(
         Values of the column to plot, e.g. ['confirmed', 'probable']
     cumulative
         Whether to return cumulative counts (default = true)
+    resample
+        If specified, counts are summed over periods, one of epiweek, isoweek
+        or month (see EPICURVE_PERIODS), and indexed by the start of each period
     """
     values = non_null_unique(df[groupby_col]) if values is None else values
+    counts = summary_counts(df, [date_col, groupby_col])
     epicurve = (
-        df[~pd.isna(df[date_col]) & df[groupby_col].isin(values)]
-        .groupby([date_col, groupby_col])
-        .size()
-        .reset_index()
-        .pivot(index=date_col, columns=groupby_col, values=0)
+        counts[counts[date_col].notna() & counts[groupby_col].isin(values)]
+        .pivot(index=date_col, columns=groupby_col, values="n")
+        .sort_index()
         .fillna(0)
         .astype(int)
     )
+    if resample is not None:
+        if resample not in EPICURVE_PERIODS:
+            raise ValueError(
+                f"Unknown epicurve resample period {resample}, expected one of {list(EPICURVE_PERIODS)}"
+            )
+        periods = pd.DatetimeIndex(epicurve.index).to_period(EPICURVE_PERIODS[resample])
+        epicurve = epicurve.groupby(periods).sum()
+        epicurve.index = epicurve.index.start_time.rename(date_col)
     return epicurve.cumsum() if cumulative else epicurve
 
 
-def get_counts(df: pd.DataFrame, date_col: str, static_counts: dict[str, int] = {}) -> dict[str, int]:
-    status = df.Case_status.value_counts()
-    confirmed = df[df.Case_status == "confirmed"]
-    outcome = df['Outcome']
+def lttb(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    """Returns indices of points to keep when downsampling a line to max_points
+
+    Uses the largest triangle three buckets algorithm, which keeps the first
+    and last points, and from each bucket of points in between, the point
+    forming the largest triangle with the point kept from the previous bucket
+    and the mean of the next bucket, so that the shape of the line is kept.
+    """
+    n = len(x)
+    if max_points >= n or max_points < 3:
+        return np.arange(n)
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, max_points - 1).astype(int)
+    indices = np.zeros(max_points, dtype=int)
+    indices[-1] = n - 1
+    for i in range(max_points - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        next_x, next_y = x[end:next_end].mean(), y[end:next_end].mean()
+        prev_x, prev_y = x[indices[i]], y[indices[i]]
+        areas = np.abs(
+            (prev_x - next_x) * (y[start:end] - prev_y)
+            - (prev_x - x[start:end]) * (next_y - prev_y)
+        )
+        indices[i + 1] = start + areas.argmax()
+    return indices
+
+
+def downsample(series: pd.Series, max_points: int | None) -> pd.Series:
+    "Downsamples a series with a date index to at most max_points using lttb()"
+    if max_points is None or len(series) <= max_points:
+        return series
+    x = pd.DatetimeIndex(series.index).asi8
+    return series.iloc[lttb(x, series.to_numpy(), max_points)]
+
+
+def get_counts(
+    df: pd.DataFrame, date_col: str, static_counts: dict[str, int] = {}
+) -> dict[str, int]:
+    table = get_summary_table(
+        df, ["Case_status", "Outcome", "Location_Admin1", VALID_AGE_GENDER, FARM_WORKER]
+    )
+    status = table.groupby("Case_status").n.sum()
+    confirmed = table[table.Case_status == "confirmed"]
     counts = {
-        "n_confirmed": int(status.confirmed),
+        "n_confirmed": int(status["confirmed"]),
         "n_probable": int(status.get("probable", 0)),
         "n_suspected": int(status.get("suspected", 0)),
-        "n_dead": int(outcome.value_counts().get("death", 0)),
-        "date": df[~pd.isna(df[date_col])][date_col].max().strftime('%Y-%m-%d'),
-        "pc_valid_age_gender": percentage_occurrence(
-            confirmed,
-            (~confirmed.Age.isna()) & (~confirmed.Gender.isna()),
+        "n_dead": int(table.n[table.Outcome == "death"].sum()),
+        "date": df[date_col].max().strftime("%Y-%m-%d"),
+        "pc_valid_age_gender": int(
+            round(
+                100 * confirmed.n[confirmed[VALID_AGE_GENDER]].sum() / confirmed.n.sum()
+            )
         ),
         **static_counts,
     }
     if 'Location_Admin1' in df.columns:
-        location_admin1 = df['Location_Admin1']
-        counts["n_unique_states"] = len(location_admin1.value_counts()),
-    if 'Occupation' in df.columns:
-        occupation = df[df.Case_status == "confirmed"]['Occupation'].dropna()
-        counts["n_farm_workers_infected"] = sum('farm worker' in ov.lower() for ov in occupation.values)
+        # FIXME: n_unique_states has always been a 1-tuple (note the trailing
+        # comma), which templates render as "(n,)". It is kept as is so that
+        # reports do not change, until templates are checked and updated.
+        counts["n_unique_states"] = (table.Location_Admin1.nunique(),)
+    if "Occupation" in df.columns:
+        counts["n_farm_workers_infected"] = int(
+            confirmed.n[confirmed[FARM_WORKER]].sum()
+        )
+    return counts
+
+
+def get_dataset_counts(
+    df: pd.DataFrame,
+    prefix: str,
+    location_col: str | None = None,
+    location_name: str = "states",
+    previous: pd.DataFrame | None = None,
+) -> dict[str, int | bool]:
+    """Returns number of cases in a dataset, and number of locations affected
+
+    Parameters
+    ----------
+    df
+        Data from which counts are obtained, usually a secondary dataset
+    prefix
+        Prefix for the returned keys, e.g. 'poultry' returns n_poultry_cases
+    location_col
+        If specified, also returns the number of unique values of this
+        column as n_{prefix}_{location_name}_affected
+    location_name
+        Name of locations used in the returned key
+    previous
+        If specified, the version of the dataset used for the previous
+        report, also returns the number of rows added since then as
+        n_new_{prefix}_cases, matched on ID if present (see
+        olm.diff.count_added()), and has_new_{prefix}_cases, true if any
+        rows were added
+    """
+    counts = {f"n_{prefix}_cases": len(df)}
+    if location_col is not None:
+        counts[f"n_{prefix}_{location_name}_affected"] = df[location_col].nunique()
+    if previous is not None:
+        n_new = count_added(previous, df)
+        counts[f"n_new_{prefix}_cases"] = n_new
+        counts[f"has_new_{prefix}_cases"] = n_new > 0
     return counts
 
 
@@ -210,43 +392,43 @@ def get_timeseries_location_status(
 ) -> pd.DataFrame:
     "Returns a time series case dataset (number of cases by location by date stratified by confirmed and probable)"
     statuses = ["confirmed", "probable"]
-    df = df[
-        df.Case_status.isin(statuses)
-        & ~pd.isna(df.Date_onset_estimated)
-        & ~pd.isna(df.Location_District)
-        ]
-    locations = sorted(set(df.Location_District)) + [None]
-    mindate, maxdate = df.Date_onset_estimated.min(), df.Date_onset_estimated.max()
+    counts = summary_counts(
+        df, ["Case_status", "Date_onset_estimated", "Location_District"]
+    )
+    counts = counts[
+        counts.Case_status.isin(statuses)
+        & counts.Date_onset_estimated.notna()
+        & counts.Location_District.notna()
+    ]
+    locations = sorted(set(counts.Location_District)) + [None]
+    mindate, maxdate = (
+        counts.Date_onset_estimated.min(),
+        counts.Date_onset_estimated.max(),
+    )
 
     def timeseries_for_location(location: str | None) -> pd.DataFrame:
-        if location is None:
-            counts = (
-                df.groupby(["Date_onset_estimated", "Case_status"])
-                .size()
-                .reset_index()
-                .pivot(index="Date_onset_estimated", columns="Case_status", values=0)
-                .fillna(0)
-                .astype(int)
-            )
-        else:
-            counts = (
-                df[df.Location_District == location]
-                .groupby(["Date_onset_estimated", "Case_status"])
-                .size()
-                .reset_index()
-                .pivot(index="Date_onset_estimated", columns="Case_status", values=0)
-                .fillna(0)
-                .astype(int)
+        rows = (
+            counts if location is None else counts[counts.Location_District == location]
+        )
+        daily = (
+            rows.pivot_table(
+                index="Date_onset_estimated",
+                columns="Case_status",
+                values="n",
+                aggfunc="sum",
             )
+            .fillna(0)
+            .astype(int)
+        )
         if fill_index:
-            counts = counts.reindex(pd.date_range(mindate, maxdate), fill_value=0)
-        for status in set(statuses) - set(counts.columns):
-            counts[status] = 0
-        counts = counts.rename(columns={s: "daily_" + s for s in statuses})
+            daily = daily.reindex(pd.date_range(mindate, maxdate), fill_value=0)
+        for status in set(statuses) - set(daily.columns):
+            daily[status] = 0
+        daily = daily.rename(columns={s: "daily_" + s for s in statuses})
         for s in statuses:
-            counts["cumulative_" + s] = counts["daily_" + s].cumsum()
-        counts["Location_District"] = location if location else "Total"
-        return counts
+            daily["cumulative_" + s] = daily["daily_" + s].cumsum()
+        daily["Location_District"] = location if location else "Total"
+        return daily
 
     timeseries = pd.concat(map(timeseries_for_location, locations)).fillna(0)
     for col in ["daily_" + s for s in statuses] + ["cumulative_" + s for s in statuses]:
@@ -266,7 +448,9 @@ def get_trailing_case_count(df: pd.DataFrame, date_col: str, trailing_time_in_da
     trailing_time_in_days
         How many days cases will trail on chart
     """
-    date_and_count = df[date_col].value_counts().sort_index()
+    date_and_count = (
+        summary_counts(df, [date_col]).dropna().set_index(date_col).n.sort_index()
+    )
     x = date_and_count.index
     y = date_and_count.values
 
@@ -342,85 +526,100 @@ def plot_timeseries_location_status(
 
 
 def plot_epicurve(
-        df: pd.DataFrame,
-        title: str,
-        date_col: str,
-        groupby_col: str,
-        values: list[str] | None = None,
-        cumulative: bool = True,
-        palette: list[str] = PALETTE,
-):
+    df: pd.DataFrame,
+    title: str,
+    date_col: str,
+    groupby_col: str,
+    values: list[str] | None = None,
+    cumulative: bool = True,
+    palette: list[str] = PALETTE,
+    resample: str | None = None,
+    max_points: int | None = None,
+) -> Figure:
+    """Creates epidemic curve, with a line for each value of groupby_col
+
+    Parameters
+    ----------
+    resample
+        Period over which to sum counts, see get_epicurve()
+    max_points
+        If specified, each line is downsampled to at most max_points points,
+        preserving its shape, see lttb()
+    """
     values = non_null_unique(df[groupby_col]) if values is None else values
-    data = get_epicurve(df, date_col, groupby_col, values, cumulative=cumulative)
-    fig = go.Figure()
+    data = get_epicurve(
+        df, date_col, groupby_col, values, cumulative=cumulative, resample=resample
+    )
+    traces = []
     for idx, value in enumerate(values):
         if value in data.columns:
-            fig.add_trace(
-                go.Scatter(
-                    x=data.index,
-                    y=data[value],
-                    name=value,
-                    line_color=palette[idx],  # turn off for higher counts of elements
-                    line_width=3,
-                ),
+            line = downsample(data[value], max_points)
+            traces.append(
+                {
+                    "type": "scatter",
+                    "x": to_array(line.index),
+                    "y": to_array(line),
+                    "name": value,
+                    "line": {
+                        "color": palette[idx],
+                        "width": 3,
+                    },  # turn off color for higher counts of elements
+                }
             )
 
-    fig.update_xaxes(
-        **standard_axis_layout,
-        title_text=title,
-    )
-
-    fig.update_yaxes(
-        **standard_axis_layout,
-        title_text="Cumulative cases" if cumulative else "Cases",
-        zeroline=False,
+    y_title = (
+        "Cumulative cases"
+        if cumulative
+        else (
+            f"Cases per {resample.removeprefix('iso').removeprefix('epi')}"
+            if resample
+            else "Cases"
+        )
     )
-    fig.update_layout(
-        **standard_plot_layout,
-        margin={"l": 0, "r": 0, "t": 0, "b": 0},
+    return figure(
+        traces,
+        {
+            "xaxis": {"title": {"text": title}},
+            "yaxis": {"title": {"text": y_title}, "zeroline": False},
+            "margin": {"l": 0, "r": 0, "t": 0, "b": 0},
+        },
     )
 
-    return fig
-
 
 def plot_delay_distribution(
-        df: pd.DataFrame,
-        col: str,
-        title: str,
-        index: str,
-        max_delay_days: int = 30,
-):
-    delays = get_delays(df, col).dt.days.value_counts()
-    if max_delay_days not in delays:
-        delays[max_delay_days] = 0
-    delays = delays.reset_index().rename({"index": title, 0: "count"}, axis=1)
-    fig = px.bar(
-        delays,
-        x=title,
-        y="count",
-        color_discrete_sequence=[PRIMARY_COLOR],
-    )
-    fig.update_layout(
-        **standard_plot_layout,
-        title=index,
-        bargap=0.2,
-        margin={"l": 0, "r": 0, "t": 5, "b": 5},
-    )
-    fig.update_xaxes(
-        **standard_axis_layout,
-        linewidth=3,
-    )
-    fig.update_yaxes(
-        **standard_axis_layout,
-        showline=False,
+    df: pd.DataFrame,
+    col: str,
+    title: str,
+    index: str,
+    max_delay_days: int = 30,
+    onset_col: str = "Date_onset",
+) -> Figure:
+    histogram = get_delay_distributions(df, [col], onset_col, max_delay_days)[
+        col
+    ].histogram
+    return figure(
+        [
+            {
+                "type": "bar",
+                "x": to_array(histogram.index),
+                "y": to_array(histogram),
+                "marker": {"color": PRIMARY_COLOR},
+                "showlegend": False,
+                "hovertemplate": f"{title}=%{{x}}<br>count=%{{y}}<extra></extra>",
+            }
+        ],
+        {
+            "title": {"text": index},
+            "bargap": 0.2,
+            "margin": {"l": 0, "r": 0, "t": 5, "b": 5},
+            "xaxis": {"title": {"text": title}, "linewidth": 3},
+            "yaxis": {"title": {"text": "count"}, "showline": False},
+        },
     )
 
-    return fig
-
 
-def plot_age_gender(df: pd.DataFrame):
+def plot_age_gender(df: pd.DataFrame) -> Figure:
     df = get_age_bin_data(df)
-    fig = go.Figure()
     vals = {}
     for row in df.itertuples():
         vals[(row.Bin, row.Gender)] = row.N
@@ -429,245 +628,429 @@ def plot_age_gender(df: pd.DataFrame):
     female_binvals = -np.array([vals.get((bin, "female"), 0) for bin in bin_names])
     male_binvals = np.array([vals.get((bin, "male"), 0) for bin in bin_names])
 
-    y = bin_names
     max_binval = max(-female_binvals.max(), male_binvals.max())
     nearest = int(((max_binval // 5) + 1) * 5)
     ticks = np.linspace(-nearest, nearest, 2 * nearest + 1).astype(int)
 
-    fig.update_yaxes(**standard_axis_layout, title="Age")
-    fig.update_xaxes(
-        **standard_axis_layout,
-        range=[-nearest, nearest],
-        tickvals=ticks,
-        ticktext=list(map(abs, ticks)),
-        title="Counts",
-        zeroline=False,
-    )
-    fig.update_layout(
-        **standard_plot_layout,
-        barmode="overlay",
-        bargap=0.1,
-        template="plotly_white",
-        margin={"l": 0, "r": 0, "t": 5, "b": 5},
-    )
-
-    fig.add_trace(
-        go.Bar(
-            y=y,
-            x=male_binvals,
-            orientation="h",
-            name="male",
-            hoverinfo="skip",
-            hovertemplate=None,
-            textposition="none",
-            marker={"color": SECONDARY_COLOR},
-        )
-    )
-    fig.add_trace(
-        go.Bar(
-            y=y,
-            x=female_binvals,
-            orientation="h",
-            name="female",
-            text=-female_binvals.astype("int"),
-            hoverinfo="skip",
-            hovertemplate=None,
-            textposition="none",
-            marker={"color": BLUE_PRIMARY_COLOR},
-        )
+    bar = {
+        "type": "bar",
+        "y": bin_names,
+        "orientation": "h",
+        "hoverinfo": "skip",
+        "textposition": "none",
+    }
+    return figure(
+        [
+            {
+                **bar,
+                "x": male_binvals,
+                "name": "male",
+                "marker": {"color": SECONDARY_COLOR},
+            },
+            {
+                **bar,
+                "x": female_binvals,
+                "name": "female",
+                "text": -female_binvals.astype("int"),
+                "marker": {"color": BLUE_PRIMARY_COLOR},
+            },
+        ],
+        {
+            "barmode": "overlay",
+            "bargap": 0.1,
+            "margin": {"l": 0, "r": 0, "t": 5, "b": 5},
+            "yaxis": {"title": {"text": "Age"}},
+            "xaxis": {
+                "range": [-nearest, nearest],
+                "tickvals": ticks,
+                "ticktext": np.abs(ticks),
+                "title": {"text": "Counts"},
+                "zeroline": False,
+            },
+        },
     )
 
-    return fig
-
 
-def plot_data_availability(df: pd.DataFrame):
+def plot_data_availability(df: pd.DataFrame, top_values: int = 3) -> Figure:
     """Creates data availability plot horizontal barplot
 
+    Each bar shows the values present in a column, and values which were
+    read as missing because they were NA markers (such as N/K) or invalid
+    dates, from the data quality profile (see olm.profile).
+
     Parameters
     ----------
     df
         Data from which column availability is obtained
+    top_values
+        Number of most frequent values of each column shown on hover
     """
-    # Get metadata (column names, count, row count)
-    y = df.columns.values
-    row_count = len(df.index)
-    column_count = len(y)
-
-    fig = go.Figure()
-    fig.update_yaxes(**standard_axis_layout, title="Variable", dtick=1)
-    fig.update_xaxes(
-        **standard_axis_layout,
-        tickvals=np.linspace(0., row_count, num=10 + 1),
-        ticktext=list(map(lambda t: f'{t / 10 * 100}%', range(11))),
-        title="Percentage of available data",
-        zeroline=False,
-    )
-    fig.update_layout(
-        **standard_plot_layout,
-        barmode="overlay",
-        bargap=0.1,
-        template="plotly_white",
-        height=250 + column_count * 15,  # Scale the height depending on how many columns are in the dataframe
-        margin={"l": 0, "r": 0, "t": 5, "b": 5},
+    result = get_profile(df, top_values)
+    columns = result.columns
+    row_count = result.n_rows
+    y = [c.column for c in columns]
+
+    def percentages(counts: list[int]) -> np.ndarray:
+        return (
+            np.round(np.array(counts) / row_count * 100, 1)
+            if row_count
+            else np.zeros(len(counts))
+        )
+
+    present = {
+        "type": "bar",
+        "y": y,
+        "x": [c.count for c in columns],
+        "orientation": "h",
+        "name": "present",
+        "textposition": "none",
+        "marker": {"color": PRIMARY_COLOR},
+        "customdata": np.column_stack(
+            [
+                percentages([c.count for c in columns]),
+                [c.distinct for c in columns],
+                [
+                    "<br>".join(f"{value}: {n}" for value, n in c.top_values)
+                    for c in columns
+                ],
+            ]
+        ).tolist(),
+        "hovertemplate": "%{y} completeness: %{customdata[0]}%<br>"
+        "%{customdata[1]} distinct values<br>%{customdata[2]}<extra></extra>",
+    }
+    traces = [present]
+    for name, counts, color in [
+        ("not known", [c.na_markers for c in columns], SECONDARY_COLOR),
+        ("invalid date", [c.invalid_dates for c in columns], PALETTE[3]),
+    ]:
+        if any(counts):
+            traces.append(
+                {
+                    "type": "bar",
+                    "y": y,
+                    "x": counts,
+                    "orientation": "h",
+                    "name": name,
+                    "textposition": "none",
+                    "marker": {"color": color},
+                    "customdata": percentages(counts),
+                    "hovertemplate": f"%{{y}} {name}: %{{x}} (%{{customdata}}%)<extra></extra>",
+                }
+            )
+
+    return figure(
+        traces,
+        {
+            "barmode": "stack",
+            "bargap": 0.1,
+            "showlegend": len(traces) > 1,
+            "height": 250
+            + len(y)
+            * 15,  # Scale the height depending on how many columns are in the dataframe
+            "margin": {"l": 0, "r": 0, "t": 5, "b": 5},
+            "yaxis": {"title": {"text": "Variable"}, "dtick": 1},
+            "xaxis": {
+                "range": [0, row_count],
+                "tickvals": np.linspace(0.0, row_count, num=10 + 1),
+                "ticktext": [f"{t / 10 * 100}%" for t in range(11)],
+                "title": {"text": "Percentage of available data"},
+                "zeroline": False,
+            },
+        },
     )
 
-    fig.add_trace(
-        go.Bar(
-            y=y,
-            x=df.count(),
-            orientation="h",
-            name="",
-            hovertemplate=None,
-            textposition="none",
-            marker={"color": PRIMARY_COLOR},
-        )
+
+def normalise_terms(terms: pd.Series) -> pd.Series:
+    "Lowercases terms and joins words with underscores"
+    return terms.str.lower().str.replace(r"[^\w]+", "_", regex=True).str.strip("_")
+
+
+def term_frequencies(
+    df: pd.DataFrame,
+    term_column: str,
+    synonyms: dict[str, list[str]] = {},
+    separator: str = TERM_SEPARATOR,
+) -> TermFrequencies:
+    """Counts terms in a free-text column, with each term counted once per entry
+
+    Entries are split on separator, and terms are normalised by
+    normalise_terms() and mapped to their canonical term using synonyms,
+    a mapping of canonical terms to their alternative spellings. Only
+    distinct entries are split and normalised, so the cost depends on the
+    vocabulary rather than the number of rows.
+    """
+    # free-text entries repeat, so distinct entries are split and counted,
+    # weighted by the number of rows with each entry
+    entry_codes, entries = pd.factorize(df[term_column])
+    weights = np.bincount(entry_codes[entry_codes >= 0], minlength=len(entries))
+    raw_terms = (
+        pd.Series(entries, dtype=object).str.split(separator, regex=True).explode()
     )
-    fig.update_traces(
-        customdata=list(map(lambda c: round(c / row_count * 100, 1), df.count())),  # Completeness percentage
-        hovertemplate="<br>".join([
-            "%{y} completeness: %{customdata}%",
-        ])
+    codes, vocabulary = pd.factorize(raw_terms)
+    canonical = {
+        alternative: term
+        for term, alternatives in synonyms.items()
+        for alternative in normalise_terms(
+            pd.Series([term, *alternatives], dtype=object)
+        )
+    }
+    terms = normalise_terms(pd.Series(vocabulary, dtype=object))
+    terms = terms.map(lambda t: canonical.get(t, t)).replace("", np.nan)
+    term_codes, term_names = pd.factorize(terms)
+    # raw terms missing from the vocabulary (code -1) index the trailing -1
+    codes = np.append(term_codes, -1)[codes]
+
+    # count each (entry, term) pair once
+    pairs = pd.DataFrame({"entry": raw_terms.index.to_numpy(), "term": codes})
+    pairs = pairs[pairs.term >= 0].drop_duplicates()
+    counts = np.bincount(
+        pairs.term.to_numpy(),
+        weights=weights[pairs.entry.to_numpy()],
+        minlength=len(term_names),
+    ).astype(int)
+    order = np.lexsort((term_names.to_numpy(dtype=str), -counts))
+    return TermFrequencies(
+        counts={str(term_names[i]): int(counts[i]) for i in order if counts[i]},
+        total_entry_count=int(weights[pairs.entry.unique()].sum()),
     )
 
-    return fig
 
-
-# TODO Ideally we would want the term frequency plot to generate automatically from the dataset
-#      due to complex preprocessing for Avian Influenza 2024 we need to extract it manually
-def plot_term_frequency(_: pd.DataFrame, term_column: str, term_values: dict[str, int], total_entry_count: int,
-                        y_label: str):
+_term_cache: dict[tuple[int, str, str, str], TermFrequencies] = {}
+
+
+def get_term_frequencies(
+    df: pd.DataFrame,
+    term_column: str,
+    synonyms: dict[str, list[str]] = {},
+    separator: str = TERM_SEPARATOR,
+) -> TermFrequencies:
+    """Returns term frequencies, cached for the lifetime of the dataframe
+    so that the wordcloud and term frequency figures share one pass"""
+    key = (id(df), term_column, json.dumps(synonyms, sort_keys=True), separator)
+    if key not in _term_cache:
+        _term_cache[key] = term_frequencies(df, term_column, synonyms, separator)
+        weakref.finalize(df, _term_cache.pop, key, None)
+    return _term_cache[key]
+
+
+def plot_term_frequency(
+    df: pd.DataFrame,
+    term_column: str,
+    term_values: dict[str, int] | None = None,
+    total_entry_count: int | None = None,
+    y_label: str = "Term",
+    synonyms: dict[str, list[str]] = {},
+    separator: str = TERM_SEPARATOR,
+    max_terms: int | None = None,
+) -> Figure:
     """Creates term frequency horizontal barplot
 
     Parameters
     ----------
+    df
+        Data from which terms are extracted, if term_values is not specified
     term_column
         Name of term column containing terms
     term_values
-        Terms and their cardinality for wordcloud visualization
+        Terms and their cardinality, extracted from term_column if not specified
     total_entry_count
-        Number of all entries that are used to calculate word frequency
+        Number of all entries that are used to calculate word frequency,
+        defaults to the number of entries in term_column with terms
     y_label
         Y axis label
+    synonyms
+        Canonical terms and their alternative spellings, see term_frequencies()
+    separator
+        Regular expression separating terms in an entry
+    max_terms
+        If specified, only show the most frequent terms
     """
+    if term_values is None:
+        term_values, n_entries = get_term_frequencies(
+            df, term_column, synonyms, separator
+        )
+        total_entry_count = total_entry_count or n_entries
+    if max_terms is not None:
+        term_values = dict(list(term_values.items())[:max_terms])
     y = list(term_values.keys())
-    term_occurrences = pd.Series(data=term_values, index=y)
-
-    fig = go.Figure()
-    fig.update_yaxes(**standard_axis_layout, title=y_label, dtick=1)
-    fig.update_xaxes(
-        **standard_axis_layout,
-        tickvals=np.linspace(0., total_entry_count, num=10 + 1),
-        ticktext=list(map(lambda t: f'{t / 10 * 100}%', range(11))),
-        title=f"Term frequency in {term_column}",
-        zeroline=False,
-    )
-
-    fig.update_layout(
-        **standard_plot_layout,
-        barmode="overlay",
-        bargap=0.1,
-        template="plotly_white",
-        height=250 + len(y) * 15,
-        margin={"l": 0, "r": 0, "t": 5, "b": 5},
+    term_occurrences = np.array(list(term_values.values()))
+
+    return figure(
+        [
+            {
+                "type": "bar",
+                "y": y,
+                "x": term_occurrences,
+                "orientation": "h",
+                "name": "",
+                "textposition": "none",
+                "marker": {"color": PRIMARY_COLOR},
+                # show percentage on hover
+                "customdata": np.round(term_occurrences / total_entry_count * 100, 1),
+                "hovertemplate": "%{y} : %{customdata}%",
+            }
+        ],
+        {
+            "barmode": "overlay",
+            "bargap": 0.1,
+            "height": 250 + len(y) * 15,
+            "margin": {"l": 0, "r": 0, "t": 5, "b": 5},
+            "yaxis": {"title": {"text": y_label}, "dtick": 1},
+            "xaxis": {
+                "tickvals": np.linspace(0.0, total_entry_count, num=10 + 1),
+                "ticktext": [f"{t / 10 * 100}%" for t in range(11)],
+                "title": {"text": f"Term frequency in {term_column}"},
+                "zeroline": False,
+            },
+        },
     )
 
-    fig.add_trace(
-        go.Bar(
-            y=y,
-            x=pd.Series(data=term_values, index=y),
-            orientation="h",
-            name="",
-            hovertemplate=None,
-            textposition="none",
-            marker={"color": PRIMARY_COLOR},
-        )
-    )
 
-    # Update to show percentage on hover
-    fig.update_traces(
-        customdata=list(map(lambda c: round(c / total_entry_count * 100, 1), term_occurrences)),
-        hovertemplate="<br>".join([
-            "%{y} : %{customdata}%",
-        ])
-    )
+# Wordcloud image dimensions, scaled down by WORDCLOUD_SCALE_FACTOR to generate
+# a higher resolution image that fits in a smaller container
+WORDCLOUD_WIDTH = 1600
+WORDCLOUD_HEIGHT = 800
+WORDCLOUD_SCALE_FACTOR = 0.5
 
-    return fig
 
+def wordcloud_png(term_values: dict[str, float]) -> bytes:
+    """Returns wordcloud PNG, cached on disk by a hash of the term frequencies
 
-# TODO Ideally we would want the wordcloud to generate automatically from the dataset
-#      due to complex preprocessing for Avian Influenza 2024 we need to extract it manually
-def plot_wordcloud(_: pd.DataFrame, term_values: dict[str, float]):
-    """Creates wordcloud visualization
+    Wordcloud layout is the slowest part of building a report, and is only
+    redone when the term frequencies change.
+    """
+    key = hashlib.sha256(
+        json.dumps(
+            [sorted(term_values.items()), WORDCLOUD_WIDTH, WORDCLOUD_HEIGHT]
+        ).encode("utf-8")
+    ).hexdigest()
+    png_file = WORDCLOUD_CACHE_FOLDER / f"{key}.png"
+    if png_file.exists():
+        return png_file.read_bytes()
+    buf = io.BytesIO()
+    WordCloud(
+        background_color="rgba(255, 255, 255, 0)",
+        mode="RGBA",
+        width=WORDCLOUD_WIDTH,
+        height=WORDCLOUD_HEIGHT,
+        prefer_horizontal=1,
+    ).generate_from_frequencies(term_values).to_image().save(buf, format="png")
+    WORDCLOUD_CACHE_FOLDER.mkdir(parents=True, exist_ok=True)
+    tmp_file = temporary_file(png_file)
+    tmp_file.write_bytes(buf.getvalue())
+    replace_file(tmp_file, png_file)
+    return buf.getvalue()
+
+
+def wordcloud_terms(
+    df: pd.DataFrame,
+    term_values: dict[str, float] | None,
+    term_column: str | None,
+    synonyms: dict[str, list[str]],
+    separator: str,
+) -> dict[str, float]:
+    if term_values is not None:
+        return term_values
+    if term_column is None:
+        raise ValueError("Wordcloud requires either term_values or term_column")
+    return get_term_frequencies(df, term_column, synonyms, separator).counts
+
+
+def image_wordcloud(
+    df: pd.DataFrame,
+    term_values: dict[str, float] | None = None,
+    term_column: str | None = None,
+    synonyms: dict[str, list[str]] = {},
+    separator: str = TERM_SEPARATOR,
+) -> Image.Image:
+    """Creates wordcloud image
 
     Parameters
     ----------
     term_values
         Terms and their cardinality for wordcloud visualization
+    term_column
+        Column to extract terms from, if term_values is not specified
+    synonyms
+        Canonical terms and their alternative spellings, see term_frequencies()
+    separator
+        Regular expression separating terms in an entry
     """
-    # Constants
-    img_width = 1600
-    img_height = 800
-    # we use scaling to generate higher resolution image and make it fit in smaller container
-    # while maintaining resolution
-    scale_factor = 0.5
-
-    wordcloud = WordCloud(
-        background_color="rgba(255, 255, 255, 0)",
-        mode="RGBA",
-        width=img_width,
-        height=img_height,
-        prefer_horizontal=1
-    ).generate_from_frequencies(term_values)
-
-    fig = go.Figure()
-
-    # Add invisible scatter trace.
-    # This trace is added to help the autoresize logic work.
-    fig.add_trace(
-        go.Scatter(
-            x=[0, img_width * scale_factor],
-            y=[0, img_height * scale_factor],
-            mode="markers",
-            marker_opacity=0
-        )
-    )
+    terms = wordcloud_terms(df, term_values, term_column, synonyms, separator)
+    return Image.open(io.BytesIO(wordcloud_png(terms)))
 
-    # Configure axes
-    fig.update_xaxes(
-        visible=False,
-        range=[0, img_width * scale_factor]
-    )
-    fig.update_yaxes(
-        visible=False,
-        range=[0, img_height * scale_factor],
-        scaleanchor="x"
-    )
 
-    # Add image to plotly canvas
-    fig.add_layout_image(
-        dict(
-            x=0,
-            sizex=img_width * scale_factor,
-            y=img_height * scale_factor,
-            sizey=img_height * scale_factor,
-            xref="x",
-            yref="y",
-            opacity=1.0,
-            layer="below",
-            sizing="stretch",
-            source=wordcloud.to_image())
-    )
+def plot_wordcloud(
+    df: pd.DataFrame,
+    term_values: dict[str, float] | None = None,
+    term_column: str | None = None,
+    synonyms: dict[str, list[str]] = {},
+    separator: str = TERM_SEPARATOR,
+) -> Figure:
+    """Creates wordcloud visualization
 
-    fig.update_layout(
-        **standard_plot_layout,
-        margin={"l": 0, "r": 0, "t": 0, "b": 0},
+    Parameters
+    ----------
+    term_values
+        Terms and their cardinality for wordcloud visualization
+    term_column
+        Column to extract terms from, if term_values is not specified
+    synonyms
+        Canonical terms and their alternative spellings, see term_frequencies()
+    separator
+        Regular expression separating terms in an entry
+    """
+    terms = wordcloud_terms(df, term_values, term_column, synonyms, separator)
+    # embed the cached PNG directly, rather than re-encoding an image
+    source = "data:image/png;base64," + base64.b64encode(wordcloud_png(terms)).decode(
+        "ascii"
+    )
+    width = WORDCLOUD_WIDTH * WORDCLOUD_SCALE_FACTOR
+    height = WORDCLOUD_HEIGHT * WORDCLOUD_SCALE_FACTOR
+
+    return figure(
+        # invisible scatter trace, added to help the autoresize logic work
+        [
+            {
+                "type": "scatter",
+                "x": [0, width],
+                "y": [0, height],
+                "mode": "markers",
+                "marker": {"opacity": 0},
+            }
+        ],
+        {
+            "xaxis": {"visible": False, "range": [0, width]},
+            "yaxis": {"visible": False, "range": [0, height], "scaleanchor": "x"},
+            # image on the plotly canvas
+            "images": [
+                {
+                    "x": 0,
+                    "sizex": width,
+                    "y": height,
+                    "sizey": height,
+                    "xref": "x",
+                    "yref": "y",
+                    "opacity": 1.0,
+                    "layer": "below",
+                    "sizing": "stretch",
+                    "source": source,
+                }
+            ],
+            "margin": {"l": 0, "r": 0, "t": 0, "b": 0},
+        },
     )
-
-    return fig
 
 
-def plot_trailing_case_count(df: pd.DataFrame, date_col: str, trailing_time_in_days: int, x_label: str, y_label: str,
-                             palette: list[str] = PALETTE):
+def plot_trailing_case_count(
+    df: pd.DataFrame,
+    date_col: str,
+    trailing_time_in_days: int,
+    x_label: str,
+    y_label: str,
+    palette: list[str] = PALETTE,
+    max_points: int | None = None,
+) -> Figure:
     """Creates trailing case count plot
 
     Parameters
@@ -684,26 +1067,45 @@ def plot_trailing_case_count(df: pd.DataFrame, date_col: str, trailing_time_in_d
         Y axis label
     palette
         Color palette for plot
+    max_points
+        If specified, the line is downsampled to at most max_points points,
+        preserving its shape, see lttb()
     """
     trailing_data = get_trailing_case_count(df, date_col, trailing_time_in_days)
-
-    fig = go.Figure()
-    fig.add_trace(
-        go.Scatter(x=list(trailing_data.keys()), y=list(trailing_data.values()), line_color=palette[0], line_width=3))
-    fig.update_yaxes(**standard_axis_layout, title=x_label)
-    fig.update_xaxes(**standard_axis_layout, title=y_label)
-    fig.update_layout(
-        **standard_plot_layout,
-        barmode="overlay",
-        bargap=0.1,
-        template="plotly_white",
-        margin={"l": 0, "r": 0, "t": 5, "b": 5},
+    if max_points is not None:
+        line = downsample(
+            pd.Series(trailing_data, index=pd.to_datetime(list(trailing_data))),
+            max_points,
+        )
+        trailing_data = dict(zip(line.index.strftime("%Y-%m-%d"), line))
+
+    return figure(
+        [
+            {
+                "type": "scatter",
+                "x": list(trailing_data.keys()),
+                "y": list(trailing_data.values()),
+                "line": {"color": palette[0], "width": 3},
+            }
+        ],
+        {
+            "barmode": "overlay",
+            "bargap": 0.1,
+            "margin": {"l": 0, "r": 0, "t": 5, "b": 5},
+            "yaxis": {"title": {"text": x_label}},
+            "xaxis": {"title": {"text": y_label}},
+        },
     )
-    return fig
 
 
-def stacked_barchart(df: pd.DataFrame, y_axis: Any, color_column: str, x_label: str, y_label: str,
-                     palette: list[str] = PALETTE):
+def stacked_barchart(
+    df: pd.DataFrame,
+    y_axis: Any,
+    color_column: str,
+    x_label: str,
+    y_label: str,
+    palette: list[str] = PALETTE,
+) -> Figure:
     """Creates stacked bar chart plot
 
     Parameters
@@ -721,13 +1123,31 @@ def stacked_barchart(df: pd.DataFrame, y_axis: Any, color_column: str, x_label:
     palette
         Color palette for plot
     """
-    fig = px.bar(df, y=y_axis, color=color_column, orientation='h', color_discrete_sequence=palette)
-    fig.update_layout(
-        template="plotly_white",
-        **standard_plot_layout,
-        margin={"l": 0, "r": 0, "t": 5, "b": 5},
+    # one bar segment per row is drawn as a single segment with the row count
+    df = df[df[color_column].notna()]
+    counts = df.groupby([color_column, y_axis], sort=False).size()
+    traces = []
+    for idx, color in enumerate(pd.unique(df[color_column])):
+        bars = counts[color]
+        traces.append(
+            {
+                "type": "bar",
+                "x": bars.to_numpy(),
+                "y": to_array(bars.index),
+                "orientation": "h",
+                "name": str(color),
+                "legendgroup": str(color),
+                "marker": {"color": palette[idx % len(palette)]},
+                "hoverinfo": "skip",
+            }
+        )
+    return figure(
+        traces,
+        {
+            "barmode": "relative",
+            "legend": {"title": {"text": color_column}, "tracegroupgap": 0},
+            "margin": {"l": 0, "r": 0, "t": 5, "b": 5},
+            "xaxis": {"title": {"text": x_label}},
+            "yaxis": {"title": {"text": y_label}},
+        },
     )
-    fig.update_xaxes(title=x_label)
-    fig.update_yaxes(title=y_label)
-    fig.update_traces(hoverinfo="skip", hovertemplate=None)
-    return fig
@@ -0,0 +1,222 @@
+"""
+One-pass data quality profile of linelists
+
+Each column is factorized once, and the number of present and missing
+values, the number of distinct values and the most frequent values are
+derived from the codes. NA markers and invalid dates, which are set to
+missing when the linelist is read, are taken from the statistics recorded
+by read_csv(). Profiles are cached for the lifetime of the dataframe, and
+on disk by a hash of the data.
+"""
+
+import re
+import json
+import hashlib
+import weakref
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from .types import ColumnProfile, DataProfile
+from .util import (
+    CACHE_FOLDER,
+    READ_STATS,
+    REGEX_DATE,
+    date_columns,
+    temporary_file,
+    replace_file,
+)
+
+PROFILE_CACHE_FOLDER = CACHE_FOLDER / "profiles"
+TOP_VALUES = 5
+
+
+def data_hash(df: pd.DataFrame) -> str:
+    """Returns content hash of a dataframe, including its read statistics
+
+    Columns backed by NumPy or Arrow arrays are hashed from their buffers,
+    which is faster than hashing each value; other columns are hashed with
+    pd.util.hash_pandas_object().
+    """
+    h = hashlib.sha256(
+        json.dumps(
+            [
+                list(map(str, df.columns)),
+                list(map(str, df.dtypes)),
+                len(df),
+                df.attrs.get(READ_STATS),
+            ],
+            default=str,
+        ).encode("utf-8")
+    )
+    for _, s in df.items():
+        if isinstance(s.dtype, np.dtype) and s.dtype.kind in "biufmM":
+            h.update(np.ascontiguousarray(s.to_numpy()).view(np.uint8))
+        elif getattr(s.dtype, "storage", None) == "pyarrow":
+            for chunk in s.array.__arrow_array__().chunks:
+                # buffers of sliced arrays extend beyond the slice
+                h.update(f"{chunk.offset},{len(chunk)}".encode("ascii"))
+                for buffer in chunk.buffers():
+                    if buffer is not None:
+                        h.update(buffer)
+        else:
+            h.update(
+                pd.util.hash_pandas_object(s, index=False).to_numpy().view(np.uint8)
+            )
+    return h.hexdigest()
+
+
+_hash_cache: dict[int, str] = {}
+
+
+def get_data_hash(df: pd.DataFrame) -> str:
+    "Returns data_hash(), cached for the lifetime of the dataframe"
+    key = id(df)
+    if key not in _hash_cache:
+        _hash_cache[key] = data_hash(df)
+        weakref.finalize(df, _hash_cache.pop, key, None)
+    return _hash_cache[key]
+
+
+def format_value(value) -> str:
+    if isinstance(value, pd.Timestamp):
+        return (
+            value.strftime("%Y-%m-%d")
+            if value == value.normalize()
+            else value.isoformat()
+        )
+    return str(value)
+
+
+def profile_column(
+    s: pd.Series,
+    top_values: int = TOP_VALUES,
+    na_markers: int = 0,
+    invalid_dates: int | None = 0,
+) -> ColumnProfile:
+    """Returns profile of a column from a single factorization
+
+    Parameters
+    ----------
+    s
+        Column to profile
+    top_values
+        Number of most frequent values to return
+    na_markers
+        Number of values which were NA markers, see replace_na_markers()
+    invalid_dates
+        Number of values which were not dates, see fix_datetimes(). If None,
+        values not starting with a date are counted as invalid, for date
+        columns which were not converted.
+    """
+    codes, uniques = pd.factorize(s)
+    counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+    if invalid_dates is None:
+        is_date = [
+            isinstance(v, str) and re.match(REGEX_DATE, v) is not None for v in uniques
+        ]
+        invalid_dates = int(counts[~np.array(is_date, dtype=bool)].sum())
+    top = np.arange(len(counts))
+    if len(counts) > top_values > 0:
+        # only values at least as frequent as the last top value are sorted
+        threshold = np.partition(counts, len(counts) - top_values)[
+            len(counts) - top_values
+        ]
+        top = np.flatnonzero(counts >= threshold)
+    # most frequent first, ties in order of appearance
+    top = top[np.argsort(-counts[top], kind="stable")][:top_values]
+    return ColumnProfile(
+        column=str(s.name),
+        count=int(counts.sum()),
+        missing=int(len(s) - counts.sum()),
+        distinct=len(uniques),
+        top_values=[(format_value(uniques[i]), int(counts[i])) for i in top],
+        na_markers=na_markers,
+        invalid_dates=invalid_dates,
+    )
+
+
+def profile(df: pd.DataFrame, top_values: int = TOP_VALUES) -> DataProfile:
+    """Returns data quality profile of a linelist
+
+    NA markers and invalid dates are taken from the read statistics of
+    read_csv(), if they describe this dataframe. Otherwise, date columns
+    which were not converted are checked for values which are not dates.
+    """
+    stats = df.attrs.get(READ_STATS) or {}
+    if stats.get("n_rows") != len(df):
+        stats = {}
+    na_markers = stats.get("na_markers", {})
+    invalid_dates = stats.get("invalid_dates", {})
+    unconverted_dates = {
+        c for c in date_columns(df) if not pd.api.types.is_datetime64_any_dtype(df[c])
+    }
+    return DataProfile(
+        n_rows=len(df),
+        columns=[
+            profile_column(
+                df[c],
+                top_values,
+                na_markers.get(c, 0),
+                None if c in unconverted_dates else invalid_dates.get(c, 0),
+            )
+            for c in df.columns
+        ],
+    )
+
+
+_profile_cache: dict[tuple[int, int], DataProfile] = {}
+
+
+def get_profile(df: pd.DataFrame, top_values: int = TOP_VALUES) -> DataProfile:
+    """Returns data quality profile, cached for the lifetime of the dataframe
+    and on disk by get_data_hash(), so that unchanged data is not profiled again"""
+    key = (id(df), top_values)
+    if key in _profile_cache:
+        return _profile_cache[key]
+    file = PROFILE_CACHE_FOLDER / f"{get_data_hash(df)}-{top_values}.json"
+    if file.exists():
+        result = DataProfile.from_json(file.read_text())
+    else:
+        result = profile(df, top_values)
+        PROFILE_CACHE_FOLDER.mkdir(parents=True, exist_ok=True)
+        # threads and processes building reports for the same data may write the same file
+        tmp_file = temporary_file(file)
+        tmp_file.write_text(result.as_json())
+        replace_file(tmp_file, file)
+    _profile_cache[key] = result
+    weakref.finalize(df, _profile_cache.pop, key, None)
+    return result
+
+
+def get_data_profile(df: pd.DataFrame, top_values: int = 3) -> dict[str, Any]:
+    """Returns data quality profile for use in templates
+
+    Returns profile_n_rows, profile_pc_complete, the percentage of values
+    present across all columns, and profile_columns, a list with the
+    statistics of each column.
+    """
+    result = get_profile(df, top_values)
+    n_values = result.n_rows * len(result.columns)
+    return {
+        "profile_n_rows": result.n_rows,
+        "profile_pc_complete": round(
+            100 * sum(c.count for c in result.columns) / n_values, 1
+        )
+        if n_values
+        else 0,
+        "profile_columns": [
+            {
+                "column": c.column,
+                "count": c.count,
+                "missing": c.missing,
+                "pc_complete": round(100 * c.completeness, 1),
+                "distinct": c.distinct,
+                "na_markers": c.na_markers,
+                "invalid_dates": c.invalid_dates,
+                "top_values": ", ".join(f"{value} ({n})" for value, n in c.top_values),
+            }
+            for c in result.columns
+        ],
+    }
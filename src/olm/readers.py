@@ -0,0 +1,326 @@
+"""
+CSV reader backends and format detection for read_csv()
+
+All readers return every column as strings, with the same missing values
+as pd.read_csv(filename, dtype=str, na_values=na_values), where na_values
+defaults to the NA markers EXTRA_NA_VALUES:
+
+- pandas: pandas C parser (default)
+- arrow: multi-threaded pyarrow parser, requires the arrow extra
+- chunked: local files are split into chunks at line boundaries, which are
+  parsed by the pandas C parser in parallel processes
+
+CSV files may be gzip or zstd compressed. Parquet files are read with
+read_parquet(), which only fetches the columns and row groups needed.
+"""
+
+import io
+import os
+import csv
+import concurrent.futures
+from pathlib import PurePosixPath
+from typing import Any, Callable
+from urllib.parse import urlparse
+
+import numpy as np
+import pandas as pd
+import requests
+
+EXTRA_NA_VALUES = ["N/K", "NK"]
+# default missing values of pd.read_csv(), see pandas._libs.parsers.STR_NA_VALUES
+PANDAS_NA_VALUES = [
+    "",
+    "#N/A",
+    "#N/A N/A",
+    "#NA",
+    "-1.#IND",
+    "-1.#QNAN",
+    "-NaN",
+    "-nan",
+    "1.#IND",
+    "1.#QNAN",
+    "<NA>",
+    "N/A",
+    "NA",
+    "NULL",
+    "NaN",
+    "None",
+    "n/a",
+    "nan",
+    "null",
+]
+# chunked reader splits files into chunks of at least this size
+CHUNK_SIZE = 32 * 1024 * 1024
+BLOCK_SIZE = 1024 * 1024
+
+COMPRESSION_EXTENSIONS = {".gz": "gzip", ".zst": "zstd"}
+PARQUET_EXTENSIONS = {".parquet", ".pq"}
+# manifests of the snapshot store, see olm.store
+SNAPSHOT_EXTENSION = ".snapshot"
+CONTENT_TYPES = {
+    "application/gzip": ("csv", "gzip"),
+    "application/x-gzip": ("csv", "gzip"),
+    "application/zstd": ("csv", "zstd"),
+    "application/vnd.apache.parquet": ("parquet", None),
+    "application/x-parquet": ("parquet", None),
+}
+
+Reader = Callable[..., pd.DataFrame]
+
+
+def detect_format(filename: str) -> tuple[str, str | None]:
+    """Returns format (csv, parquet or snapshot) and compression of a file or URL
+
+    The format is detected from the extension, such as .csv.gz, .csv.zst,
+    .parquet or .snapshot. For URLs without a known extension, the Content-Type of a HEAD
+    request is used.
+    """
+    filename = str(filename)
+    suffix = PurePosixPath(
+        urlparse(filename).path if "://" in filename else filename
+    ).suffix.lower()
+    if suffix in PARQUET_EXTENSIONS:
+        return "parquet", None
+    if suffix == SNAPSHOT_EXTENSION:
+        return "snapshot", None
+    if suffix in COMPRESSION_EXTENSIONS:
+        return "csv", COMPRESSION_EXTENSIONS[suffix]
+    if suffix != ".csv" and filename.startswith(("http://", "https://")):
+        res = requests.head(filename, allow_redirects=True, timeout=30)
+        res.raise_for_status()
+        content_type = res.headers.get("Content-Type", "").split(";")[0].strip().lower()
+        return CONTENT_TYPES.get(content_type, ("csv", None))
+    return "csv", None
+
+
+def read_pandas(
+    filename: str,
+    compression: str | None = None,
+    columns: list[str] | None = None,
+    na_values: list[str] = EXTRA_NA_VALUES,
+) -> pd.DataFrame:
+    return pd.read_csv(
+        filename,
+        dtype=str,
+        na_values=na_values,
+        compression=compression,
+        usecols=columns,
+    )
+
+
+def local_path(filename: str) -> str | None:
+    "Returns path for local files and file:// URLs, None for other URLs"
+    filename = str(filename)
+    if filename.startswith("file://"):
+        return filename.removeprefix("file://")
+    return None if "://" in filename else filename
+
+
+def parse_header(line: bytes) -> list[str]:
+    # pandas removes a UTF-8 byte order mark
+    return next(csv.reader([line.decode("utf-8-sig")]))
+
+
+def read_header(source: Any) -> list[str]:
+    "Parses header of a seekable file, which is rewound to the start"
+    data = b""
+    while b"\n" not in data and (block := source.read(BLOCK_SIZE)):
+        data += block
+    source.seek(0)
+    return parse_header(data.split(b"\n", 1)[0].rstrip(b"\r"))
+
+
+def import_pyarrow(purpose: str):
+    try:
+        import pyarrow
+        import pyarrow.csv  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        raise ImportError(
+            f"{purpose} requires pyarrow, install olm with the arrow extra"
+        )
+    return pyarrow
+
+
+def arrow_to_pandas(table: Any) -> pd.DataFrame:
+    "Converts Arrow table of strings to a dataframe with the string dtype used by pd.read_csv()"
+    pa = import_pyarrow("Conversion from Arrow")
+    dtype = pd.Series(dtype=str).dtype
+    if isinstance(dtype, pd.StringDtype):
+        return table.to_pandas(
+            types_mapper=lambda t: dtype if pa.types.is_string(t) else None
+        )
+    # pandas < 3 uses object columns with NaN for missing values
+    return table.to_pandas().fillna(np.nan)
+
+
+def read_arrow(
+    filename: str,
+    compression: str | None = None,
+    columns: list[str] | None = None,
+    na_values: list[str] = EXTRA_NA_VALUES,
+) -> pd.DataFrame:
+    "Reads CSV using the multi-threaded pyarrow parser"
+    pa = import_pyarrow("The arrow CSV reader")
+    if (path := local_path(filename)) is not None:
+        source = pa.memory_map(path)
+    else:
+        res = requests.get(filename, timeout=60)
+        res.raise_for_status()
+        source = pa.BufferReader(res.content)
+    if compression is not None:
+        source = pa.BufferReader(
+            pa.CompressedInputStream(source, compression).read_buffer()
+        )
+    header = read_header(source)
+    # types are set for every column, as type inference would parse numbers
+    table = pa.csv.read_csv(
+        source,
+        read_options=pa.csv.ReadOptions(use_threads=True, block_size=BLOCK_SIZE),
+        # quoted fields may contain line breaks
+        parse_options=pa.csv.ParseOptions(newlines_in_values=True),
+        convert_options=pa.csv.ConvertOptions(
+            column_types={c: pa.string() for c in header},
+            include_columns=[c for c in header if c in columns]
+            if columns is not None
+            else None,
+            null_values=PANDAS_NA_VALUES + na_values,
+            strings_can_be_null=True,
+            quoted_strings_can_be_null=True,
+        ),
+    )
+    return arrow_to_pandas(table)
+
+
+def read_parquet(
+    filename: str, columns: list[str] | None = None, filters: list[Any] | None = None
+) -> pd.DataFrame:
+    """Reads Parquet file, with every column converted to strings
+
+    Parameters
+    ----------
+    filename
+        File or URL to read from. URLs are read with range requests, so
+        only the footer and the column chunks which are read are fetched,
+        unless the server does not support range requests.
+    columns
+        Columns to read, defaults to all columns
+    filters
+        Row filters in the format of pyarrow.parquet.read_table(), for
+        example [["Case_status", "in", ["confirmed", "probable"]]]. Row
+        groups whose statistics do not match are not read.
+    """
+    pa = import_pyarrow("Reading Parquet")
+    if (path := local_path(filename)) is not None:
+        source = path
+    else:
+        from .download import HTTPRangeFile, RangeRequestsNotSupported
+
+        try:
+            source = HTTPRangeFile(filename)
+        except RangeRequestsNotSupported:
+            # servers without range requests, such as http.server, send the whole file
+            res = requests.get(filename, timeout=60)
+            res.raise_for_status()
+            source = pa.BufferReader(res.content)
+    filters = [tuple(f) for f in filters] if filters else None
+    table = pa.parquet.read_table(source, columns=columns, filters=filters)
+    table = table.cast(pa.schema([(f.name, pa.string()) for f in table.schema]))
+    return arrow_to_pandas(table)
+
+
+def chunk_offsets(path: str, chunk_size: int = CHUNK_SIZE) -> list[tuple[int, int]]:
+    """Returns byte ranges of chunks of a CSV file after the header
+
+    Chunks end at line boundaries which are not inside quoted fields, which
+    may contain line breaks. Quotes are counted up to each boundary, as a
+    boundary is inside a quoted field if an odd number of quotes precede it.
+    """
+    size = os.path.getsize(path)
+    offsets = []
+    with open(path, "rb") as f:
+        start = len(f.readline())
+        quotes = 0
+        position = start
+        while position < size:
+            target = min(position + chunk_size, size)
+            quotes += f.read(target - position).count(b'"')
+            # move to next line boundary outside quotes
+            while True:
+                line = f.readline()
+                quotes += line.count(b'"')
+                if quotes % 2 == 0 or not line:
+                    break
+            offsets.append((position, f.tell()))
+            position = f.tell()
+    return offsets
+
+
+def read_chunk(
+    path: str,
+    start: int,
+    end: int,
+    names: list[str],
+    columns: list[str] | None,
+    na_values: list[str],
+) -> pd.DataFrame:
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    return pd.read_csv(
+        io.BytesIO(data),
+        header=None,
+        names=names,
+        dtype=str,
+        na_values=na_values,
+        usecols=columns,
+    )
+
+
+def read_chunked(
+    filename: str,
+    compression: str | None = None,
+    columns: list[str] | None = None,
+    na_values: list[str] = EXTRA_NA_VALUES,
+    processes: int | None = None,
+) -> pd.DataFrame:
+    """Reads a local CSV file in chunks parsed in parallel processes
+
+    Small files, compressed files and URLs are read with read_pandas().
+    """
+    if (
+        compression is not None
+        or (path := local_path(filename)) is None
+        or os.path.getsize(path) < 2 * CHUNK_SIZE
+    ):
+        return read_pandas(filename, compression, columns, na_values)
+    with open(path, "rb") as f:
+        names = parse_header(f.readline())
+    offsets = chunk_offsets(
+        path,
+        max(CHUNK_SIZE, os.path.getsize(path) // (processes or os.cpu_count() or 1)),
+    )
+    with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+        chunks = executor.map(
+            read_chunk,
+            *zip(
+                *[
+                    (path, start, end, names, columns, na_values)
+                    for start, end in offsets
+                ]
+            ),
+        )
+        return pd.concat(list(chunks), ignore_index=True)
+
+
+READERS: dict[str, Reader] = {
+    "pandas": read_pandas,
+    "arrow": read_arrow,
+    "chunked": read_chunked,
+}
+
+
+def get_reader(name: str) -> Reader:
+    if name not in READERS:
+        raise ValueError(f"Unknown CSV reader {name}, expected one of {list(READERS)}")
+    return READERS[name]
@@ -0,0 +1,51 @@
+"""
+Registry of outbreak configurations
+
+Only reads outbreak metadata, without importing the data processing
+libraries, so that listing outbreaks and validating arguments is fast.
+"""
+
+import copy
+from pathlib import Path
+from typing import Any
+
+import yaml
+
+OUTBREAKS_PATH = Path(__file__).parents[2] / "outbreaks"
+OUTBREAKS = [f.stem for f in OUTBREAKS_PATH.glob("*.yml")]
+REQUIRED_OUTBREAK_ATTRIBUTES = {
+    "id",
+    "description",
+    "name",
+    "display_name",
+    "update_number",
+    "reporting_period",
+    "event_classification",
+    "primary_data_sources",
+}
+
+_metadata_cache: dict[Path, tuple[float, dict[str, Any]]] = {}
+
+
+def read_metadata(config: str | Path) -> dict[str, Any]:
+    """Reads outbreak configuration and checks required attributes are present
+
+    Parsed configurations are cached by file modification time, and each
+    call returns a copy, which callers can modify.
+    """
+    config = Path(config).resolve()
+    mtime = config.stat().st_mtime
+    if (cached := _metadata_cache.get(config)) is not None and cached[0] == mtime:
+        return copy.deepcopy(cached[1])
+    metadata = yaml.safe_load(config.read_text())
+    if missing := REQUIRED_OUTBREAK_ATTRIBUTES - set(metadata):
+        raise ValueError(
+            f"All required attributes not present in YAML file {config.name}, missing: {', '.join(sorted(missing))}"
+        )
+    _metadata_cache[config] = (mtime, metadata)
+    return copy.deepcopy(metadata)
+
+
+def get_metadata(outbreak: str) -> dict[str, Any]:
+    "Returns metadata for a named outbreak"
+    return read_metadata(OUTBREAKS_PATH / f"{outbreak}.yml")
@@ -0,0 +1,434 @@
+"""
+Report service, which builds briefing reports on demand
+
+GET /<outbreak> returns the briefing report for an outbreak configuration
+in the outbreaks folder. The data URL defaults to the url key of the
+configuration and can be overridden with ?data=<url>, which must be a
+http(s) URL or a local file in one of the data folders the server was
+started with, so that clients cannot read arbitrary files. The publication
+date defaults to today and can be set with ?date=YYYY-MM-DD. Configurations,
+templates, includes, and the data versions of the linelist and of the
+secondary datasets used by plot entries are checked on every request, so a
+draft configuration can be previewed by editing it and reloading the page.
+
+Loaded outbreaks, parsed linelists and secondary datasets, plot fragments
+and rendered reports are kept in least recently used caches. A report is
+rebuilt only when one of its sources changes. A rebuild only recomputes
+the plot entries whose configuration or data changed. Plot entries are built in a thread pool,
+so the event loop keeps serving cached reports. Concurrent requests for a
+report, linelist or plot entry that is already being built wait for that
+build. Reports are stored gzip compressed and sent as they are to clients
+which accept gzip.
+"""
+
+import copy
+import gzip
+import html
+import json
+import time
+import asyncio
+import hashlib
+import datetime
+import functools
+import urllib.parse
+import concurrent.futures
+from collections import OrderedDict
+from http import HTTPStatus
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Generic, TypeVar
+
+import pandas as pd
+
+from .types import Response
+from .console import msg_ok, msg_fail
+from .readers import local_path
+from .registry import OUTBREAKS_PATH
+from .outbreaks import Outbreak, render_template
+from .watch import get_data_version, get_mtimes, template_files
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+
+class LRUCache(Generic[K, V]):
+    "Mapping with at most maxsize items, which evicts the least recently used item"
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.items: OrderedDict[K, V] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __contains__(self, key: K) -> bool:
+        return key in self.items
+
+    def get(self, key: K, default: V | None = None) -> V | None:
+        if key not in self.items:
+            return default
+        self.items.move_to_end(key)
+        return self.items[key]
+
+    def put(self, key: K, value: V):
+        self.items[key] = value
+        self.items.move_to_end(key)
+        while len(self.items) > self.maxsize:
+            self.items.popitem(last=False)
+
+
+def make_response(status: int, content_type: str, text: str) -> Response:
+    "Returns response with gzip compressed body, compressed once when it is made"
+    body = text.encode("utf-8")
+    return Response(
+        status,
+        f"{content_type}; charset=utf-8",
+        gzip.compress(body, compresslevel=6, mtime=0),
+        hashlib.sha256(body).hexdigest()[:32],
+    )
+
+
+def error_response(status: HTTPStatus, message: str) -> Response:
+    return make_response(status, "text/plain", f"{status} {status.phrase}: {message}\n")
+
+
+def render_report(outbreak: str, var: dict[str, Any]) -> Response:
+    return make_response(
+        HTTPStatus.OK, "text/html", "".join(render_template(outbreak, var))
+    )
+
+
+def accepts_gzip(headers: dict[str, str]) -> bool:
+    return "gzip" in [
+        e.split(";")[0].strip() for e in headers.get("accept-encoding", "").split(",")
+    ]
+
+
+def json_key(*parts: Any) -> str:
+    return json.dumps(parts, default=str, sort_keys=True)
+
+
+class ReportServer:
+    """Builds reports for outbreak configurations on request, see olm.serve
+
+    Parameters
+    ----------
+    outbreaks_path
+        Folder of outbreak configurations, defaults to the olm outbreaks folder
+    workers
+        Number of threads which build plot entries and render reports
+    data_folders
+        Folders of local files which can be requested with ?data=, in
+        addition to http(s) URLs
+    max_outbreaks, max_linelists, max_fragments, max_reports
+        Number of loaded outbreaks, parsed linelists and secondary datasets,
+        plot fragments and rendered reports kept in memory
+    """
+
+    def __init__(
+        self,
+        outbreaks_path: str | Path = OUTBREAKS_PATH,
+        workers: int = 2,
+        data_folders: list[str | Path] = [],
+        max_outbreaks: int = 16,
+        max_linelists: int = 4,
+        max_fragments: int = 256,
+        max_reports: int = 32,
+    ):
+        self.outbreaks_path = Path(outbreaks_path)
+        self.data_folders = [Path(f).resolve() for f in data_folders]
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            workers, thread_name_prefix="olm-serve"
+        )
+        self.outbreaks: LRUCache[str, Outbreak] = LRUCache(max_outbreaks)
+        self.linelists: LRUCache[str, pd.DataFrame] = LRUCache(max_linelists)
+        self.fragments: LRUCache[str, dict[str, Any]] = LRUCache(max_fragments)
+        self.reports: LRUCache[str, Response] = LRUCache(max_reports)
+        # builds in progress, by kind and cache key
+        self.builds: dict[tuple[str, str], asyncio.Future] = {}
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, func: Callable[..., V], *args) -> V:
+        "Runs func in the thread pool, so that it does not block the event loop"
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, func, *args
+        )
+
+    async def coalesce(
+        self, kind: str, key: str, build: Callable[[], Awaitable[V]]
+    ) -> V:
+        """Awaits build, or the build of the same kind and key which is in progress
+
+        Builds are shielded, so that a client disconnecting does not cancel a
+        build which other requests wait for.
+        """
+        if (task := self.builds.get((kind, key))) is None:
+            task = self.builds[kind, key] = asyncio.ensure_future(build())
+            task.add_done_callback(lambda _: self.builds.pop((kind, key), None))
+        return await asyncio.shield(task)
+
+    def allows_data_url(self, data_url: str) -> bool:
+        "Returns whether a ?data= URL is a http(s) URL, or a file in a data folder"
+        if (path := local_path(data_url)) is None:
+            return urllib.parse.urlsplit(data_url).scheme in ["http", "https"]
+        path = Path(path).resolve()
+        return any(path.is_relative_to(folder) for folder in self.data_folders)
+
+    def outbreak_names(self) -> list[str]:
+        return sorted(f.stem for f in self.outbreaks_path.glob("*.yml"))
+
+    def get_outbreak(self, name: str, data_url: str | None = None) -> Outbreak:
+        "Returns outbreak, loaded again if its configuration changed"
+        config = self.outbreaks_path / f"{name}.yml"
+        key = json_key(str(config), config.stat().st_mtime_ns, data_url)
+        if (outbreak := self.outbreaks.get(key)) is None:
+            outbreak = Outbreak(config, data_url)
+            self.outbreaks.put(key, outbreak)
+        return outbreak
+
+    async def read_linelist(
+        self, key: str, read: Callable[[], pd.DataFrame]
+    ) -> pd.DataFrame:
+        "Returns linelist, read once for each cache key, which includes the data version"
+        if (df := self.linelists.get(key)) is None:
+
+            async def build() -> pd.DataFrame:
+                df = await self.run(read)
+                self.linelists.put(key, df)
+                return df
+
+            df = await self.coalesce("linelist", key, build)
+        return df
+
+    async def data_keys(
+        self, outbreak: Outbreak, date: datetime.date
+    ) -> tuple[dict[str, str], dict[str, str | None]]:
+        """Returns linelist cache keys, with the current data version, of the
+        outbreak data (with an empty name) and of secondary datasets used by
+        plot entries, and the URL of each dataset for the report date (None
+        if it has no snapshot, see Outbreak.dataset_url())"""
+        names = outbreak.plot_datasets()
+        if missing := [n for n in names if n not in outbreak.dataset_config]:
+            raise ValueError(
+                f"Dataset {', '.join(missing)} not specified for outbreak: {outbreak.name}"
+            )
+        dataset_urls = dict(
+            zip(
+                names,
+                await asyncio.gather(
+                    *(self.run(outbreak.dataset_url, n, date) for n in names)
+                ),
+            )
+        )
+        names = [n for n in names if dataset_urls[n] is not None]
+        urls = [outbreak.url] + [dataset_urls[n] for n in names]
+        versions = await asyncio.gather(
+            *(self.run(get_data_version, url) for url in urls)
+        )
+        keys = {
+            "": json_key(
+                outbreak.url,
+                versions[0],
+                outbreak.reader,
+                outbreak.columns,
+                outbreak.filters,
+                outbreak.additional_date_columns,
+            )
+        }
+        for name, url, version in zip(names, urls[1:], versions[1:]):
+            config = outbreak.dataset_config[name]
+            keys[name] = json_key(
+                url,
+                version,
+                outbreak.reader,
+                config.get("additional_date_columns", []),
+            )
+        return keys, dataset_urls
+
+    async def fragment(
+        self, outbreak: Outbreak, plot: str, data_key: str
+    ) -> dict[str, Any]:
+        "Returns template variables of a plot entry, built once for each data version"
+        key = json_key(data_key, outbreak.name, plot, outbreak.plots[plot])
+        if (fragment := self.fragments.get(key)) is None:
+
+            async def build() -> dict[str, Any]:
+                fragment = await self.run(outbreak.build_plot, plot, outbreak.data)
+                self.fragments.put(key, fragment)
+                return fragment
+
+            fragment = await self.coalesce("fragment", key, build)
+        return fragment
+
+    async def report(
+        self, name: str, data_url: str | None = None, date: datetime.date | None = None
+    ) -> Response:
+        "Returns report for outbreak, built again only if its sources changed"
+        config = self.get_outbreak(name, data_url)
+        if config.url is None:
+            return error_response(
+                HTTPStatus.BAD_REQUEST,
+                f"no data URL for outbreak {name}, use ?data=<url>",
+            )
+        date = date or datetime.datetime.today().date()
+        data_keys, dataset_urls = await self.data_keys(config, date)
+        key = json_key(
+            str(config.config),
+            Path(config.config).stat().st_mtime_ns,
+            {str(f): mtime for f, mtime in get_mtimes(template_files(name)).items()},
+            data_keys,
+            date,
+        )
+        if (response := self.reports.get(key)) is not None:
+            return response
+
+        async def build() -> Response:
+            start_time = time.perf_counter()
+            # each build has its own outbreak data, as builds for other data
+            # versions may run at the same time
+            outbreak = copy.copy(config)
+            names = [n for n in data_keys if n]
+            outbreak.data, *datasets = await asyncio.gather(
+                self.read_linelist(data_keys[""], config.read),
+                *(
+                    self.read_linelist(
+                        data_keys[n],
+                        functools.partial(config.read_dataset, n, dataset_urls[n]),
+                    )
+                    for n in names
+                ),
+            )
+            outbreak.datasets = dict(zip(names, datasets))
+            outbreak.date = date
+            outbreak.dataset_urls = {n: (date, url) for n, url in dataset_urls.items()}
+            var = outbreak.report_variables(date)
+            data_key = json_key(data_keys)
+            fragments = await asyncio.gather(
+                *(self.fragment(outbreak, plot, data_key) for plot in outbreak.plots)
+            )
+            for fragment in fragments:
+                var.update(fragment)
+            response = await self.run(render_report, name, var)
+            self.reports.put(key, response)
+            msg_ok(
+                "serve",
+                f"built {name} report for {date} ({time.perf_counter() - start_time:.2f}s)",
+            )
+            return response
+
+        return await self.coalesce("report", key, build)
+
+    def index(self) -> Response:
+        links = "\n".join(
+            f'<li><a href="/{urllib.parse.quote(name)}">{html.escape(name)}</a></li>'
+            for name in self.outbreak_names()
+        )
+        return make_response(
+            HTTPStatus.OK,
+            "text/html",
+            f"<!doctype html>\n<title>olm</title>\n<ul>\n{links}\n</ul>\n",
+        )
+
+    async def respond(self, method: str, target: str) -> Response:
+        "Returns response for a request, see olm.serve"
+        if method not in ["GET", "HEAD"]:
+            return error_response(
+                HTTPStatus.METHOD_NOT_ALLOWED, f"{method} not supported"
+            )
+        url = urllib.parse.urlsplit(target)
+        query = dict(urllib.parse.parse_qsl(url.query))
+        if not (name := urllib.parse.unquote(url.path.strip("/"))):
+            return self.index()
+        # only outbreaks in the outbreaks folder can be requested
+        if name not in self.outbreak_names():
+            return error_response(HTTPStatus.NOT_FOUND, f"outbreak {name} not found")
+        try:
+            date = (
+                datetime.date.fromisoformat(query["date"]) if "date" in query else None
+            )
+        except ValueError:
+            return error_response(
+                HTTPStatus.BAD_REQUEST,
+                f"date should be YYYY-MM-DD, got {query['date']}",
+            )
+        if "data" in query and not self.allows_data_url(query["data"]):
+            return error_response(
+                HTTPStatus.FORBIDDEN,
+                "data should be a http(s) URL, or a file in a folder "
+                "given with --data-folder",
+            )
+        try:
+            return await self.report(name, query.get("data"), date)
+        except Exception as e:
+            msg_fail("serve", f"{name}: {type(e).__name__}: {e}")
+            return error_response(
+                HTTPStatus.INTERNAL_SERVER_ERROR, f"{type(e).__name__}: {e}"
+            )
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        "Handles a HTTP/1.1 connection with a single request"
+        try:
+            request = (
+                (await reader.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+            )
+            method, target, _ = request[0].split(" ", 2)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            writer.close()
+            return
+        headers = {
+            k.strip().lower(): v.strip()
+            for k, _, v in (line.partition(":") for line in request[1:] if line)
+        }
+        response = await self.respond(method, target)
+        status, body = HTTPStatus(response.status), response.body
+        response_headers = {
+            "Content-Type": response.content_type,
+            "ETag": f'"{response.etag}"',
+            "Vary": "Accept-Encoding",
+            "Connection": "close",
+        }
+        if (
+            status == HTTPStatus.OK
+            and headers.get("if-none-match") == response_headers["ETag"]
+        ):
+            status, body = HTTPStatus.NOT_MODIFIED, b""
+        elif accepts_gzip(headers):
+            response_headers["Content-Encoding"] = "gzip"
+        else:
+            body = gzip.decompress(body)
+        response_headers["Content-Length"] = str(len(body))
+        head = f"HTTP/1.1 {status.value} {status.phrase}\r\n" + "".join(
+            f"{k}: {v}\r\n" for k, v in response_headers.items()
+        )
+        try:
+            writer.write(
+                head.encode("latin-1") + b"\r\n" + (b"" if method == "HEAD" else body)
+            )
+            await writer.drain()
+            writer.close()
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+def serve(
+    host: str = "127.0.0.1",
+    port: int = 8000,
+    workers: int = 2,
+    data_folders: list[str | Path] = [],
+):
+    "Serves reports for outbreaks in the outbreaks folder until interrupted"
+
+    async def main():
+        server = ReportServer(workers=workers, data_folders=data_folders)
+        try:
+            async with await asyncio.start_server(
+                server.handle, host, port
+            ) as http_server:
+                msg_ok("serve", f"serving reports at http://{host}:{port}/")
+                await http_server.serve_forever()
+        finally:
+            server.close()
+
+    asyncio.run(main())
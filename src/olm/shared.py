@@ -0,0 +1,109 @@
+"""
+Linelists shared between processes as memory-mapped Arrow IPC files
+
+A linelist is published once to an uncompressed Arrow IPC file, by default
+in /dev/shm, and worker processes attach to it with a memory map. Columns of
+the attached dataframe are backed by the mapped file, so workers share one
+copy of the data in the page cache instead of each unpickling their own.
+"""
+
+import os
+import json
+import shutil
+import tempfile
+import contextlib
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+SHARED_FOLDER = Path(
+    os.getenv(
+        "OLM_SHARED_FOLDER",
+        "/dev/shm" if Path("/dev/shm").is_dir() else tempfile.gettempdir(),
+    )
+)
+
+# schema metadata key holding the dataframe attrs, such as read statistics
+ATTRS_KEY = b"olm_attrs"
+
+
+def import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc  # noqa: F401
+    except ImportError:
+        raise ImportError(
+            "Shared linelists require pyarrow, install olm with the arrow extra"
+        )
+    return pyarrow
+
+
+def string_dtype() -> pd.StringDtype:
+    "Returns Arrow backed string dtype with the same missing value semantics as read_csv()"
+    try:
+        return pd.StringDtype("pyarrow", na_value=np.nan)
+    except TypeError:  # pandas < 2.3
+        return pd.StringDtype("pyarrow_numpy")
+
+
+def publish_linelist(df: pd.DataFrame, file: Path) -> Path:
+    """Writes linelist to an uncompressed Arrow IPC file, which can be memory mapped
+
+    Dataframe attrs, such as the read statistics of read_csv(), are stored
+    as JSON in the schema metadata, and restored by attach_linelist().
+    """
+    pa = import_pyarrow()
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if df.attrs:
+        table = table.replace_schema_metadata(
+            {
+                **(table.schema.metadata or {}),
+                ATTRS_KEY: json.dumps(df.attrs).encode("utf-8"),
+            }
+        )
+    tmp_file = file.with_suffix(".tmp")
+    with (
+        pa.OSFile(str(tmp_file), "wb") as sink,
+        pa.ipc.new_file(sink, table.schema) as writer,
+    ):
+        writer.write_table(table)
+    tmp_file.replace(file)
+    return file
+
+
+def attach_linelist(file: Path) -> pd.DataFrame:
+    """Returns linelist published by publish_linelist()
+
+    String columns are not copied: they use an Arrow backed string dtype
+    referencing the memory-mapped file. The dataframe must be treated as
+    read only, which is already the case for plot functions.
+    """
+    pa = import_pyarrow()
+    table = pa.ipc.open_file(pa.memory_map(str(file))).read_all()
+    dtype = string_dtype()
+    df = table.to_pandas(
+        types_mapper=lambda t: (
+            dtype if pa.types.is_string(t) or pa.types.is_large_string(t) else None
+        )
+    )
+    if attrs := (table.schema.metadata or {}).get(ATTRS_KEY):
+        df.attrs = json.loads(attrs)
+    return df
+
+
+@contextlib.contextmanager
+def shared_linelists(frames: dict[str, pd.DataFrame]) -> Iterator[dict[str, Path]]:
+    """Publishes linelists for the duration of the context, returning their files
+
+    Files are removed when the context exits.
+    """
+    folder = Path(tempfile.mkdtemp(prefix="olm-", dir=SHARED_FOLDER))
+    try:
+        yield {
+            name: publish_linelist(df, folder / f"{i}.arrow")
+            for i, (name, df) in enumerate(frames.items())
+        }
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
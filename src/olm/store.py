@@ -0,0 +1,251 @@
+"""
+Deduplicated store of linelist snapshots
+
+Each version of a linelist added to the store is split into rows, which
+are identified by a 128-bit hash of their column names and values. Rows
+which are not already in the store are written to a new Parquet chunk,
+named by the hash of its rows, and each version is recorded in a manifest,
+{version}.snapshot, listing the runs of consecutive chunk rows which make
+up the linelist in order. Storage grows with the rows added or changed in
+each version, and versions are restored by slicing chunks, without
+parsing or hashing rows.
+
+Snapshot manifests are read by read_csv() like any other file, so they can
+be passed as the data URL of an outbreak, and a store folder can be used as
+the snapshots of olm backfill, see olm.backfill.local_snapshots().
+"""
+
+import hashlib
+import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .types import Snapshot
+from .readers import SNAPSHOT_EXTENSION, import_pyarrow, arrow_to_pandas, local_path
+from .util import CACHE_FOLDER
+
+STORE_FOLDER = CACHE_FOLDER / "store"
+# row hashes are stored in chunks with the rows
+HASH_COLUMNS = ["_olm_row_hash_hi", "_olm_row_hash_lo"]
+HASH_KEYS = ["olm-row-hash-hi0", "olm-row-hash-lo0"]
+MISSING_HASH = np.uint64(0x9E3779B97F4A7C15)
+
+
+def row_hashes(df: pd.DataFrame) -> tuple[np.ndarray, np.ndarray]:
+    """Returns 128-bit hash of each row, as two arrays of 64-bit hashes
+
+    Each column is factorized, and only its distinct values are hashed and
+    combined with the hash of the column name. Rows with the same values in the same
+    columns have the same hash whatever the order of columns.
+    """
+    hashes = [np.zeros(len(df), dtype=np.uint64) for _ in HASH_KEYS]
+    for name in sorted(map(str, df.columns)):
+        codes, uniques = pd.factorize(df[name])
+        uniques = np.asarray(uniques, dtype=object)
+        for i, key in enumerate(HASH_KEYS):
+            name_hash = pd.util.hash_array(np.array([name], dtype=object), hash_key=key)
+            # missing values have code -1, and are hashed as the last value
+            values = np.append(
+                pd.util.hash_array(uniques, hash_key=key, categorize=False),
+                MISSING_HASH,
+            )
+            hashes[i] = pd.util.hash_array(hashes[i] ^ (values ^ name_hash)[codes])
+    return hashes[0], hashes[1]
+
+
+def row_runs(chunks: np.ndarray, rows: np.ndarray) -> list[tuple[int, int, int]]:
+    "Returns runs of consecutive rows of the same chunk, as (chunk, start, stop)"
+    if len(rows) == 0:
+        return []
+    breaks = (
+        np.flatnonzero((chunks[1:] != chunks[:-1]) | (rows[1:] != rows[:-1] + 1)) + 1
+    )
+    starts = np.concatenate([[0], breaks])
+    stops = np.concatenate([breaks, [len(rows)]])
+    return [
+        (int(chunks[start]), int(rows[start]), int(rows[stop - 1]) + 1)
+        for start, stop in zip(starts, stops)
+    ]
+
+
+class SnapshotStore:
+    """Deduplicated store of the versions of a linelist
+
+    Parameters
+    ----------
+    folder
+        Store folder, with snapshot manifests and a chunks folder. Requires
+        pyarrow, install olm with the arrow extra.
+    """
+
+    def __init__(self, folder: str | Path):
+        self.folder = Path(folder)
+        self.chunks_folder = self.folder / "chunks"
+        self.pa = import_pyarrow("The snapshot store")
+
+    def versions(self) -> list[str]:
+        "Returns versions in the store, oldest first"
+        return sorted(f.stem for f in self.folder.glob(f"*{SNAPSHOT_EXTENSION}"))
+
+    def manifest_file(self, version: str) -> Path:
+        return self.folder / f"{version}{SNAPSHOT_EXTENSION}"
+
+    def snapshot(self, version: str) -> Snapshot:
+        if not (file := self.manifest_file(version)).exists():
+            raise ValueError(f"Snapshot {version} not found in store {self.folder}")
+        return Snapshot.from_json(file.read_text())
+
+    def chunk_file(self, chunk: str) -> Path:
+        return self.chunks_folder / f"{chunk}.parquet"
+
+    def index(self) -> tuple[pd.MultiIndex, list[str], np.ndarray, np.ndarray]:
+        """Returns row hashes of all stored rows, with the chunk names, and
+        the chunk and row number of each hash"""
+        chunks = sorted(f.stem for f in self.chunks_folder.glob("*.parquet"))
+        tables = [
+            self.pa.parquet.read_table(self.chunk_file(c), columns=HASH_COLUMNS)
+            for c in chunks
+        ]
+        hashes = [
+            np.concatenate([t[c].to_numpy() for t in tables])
+            if tables
+            else np.array([], dtype=np.uint64)
+            for c in HASH_COLUMNS
+        ]
+        return (
+            pd.MultiIndex.from_arrays(hashes),
+            chunks,
+            np.repeat(np.arange(len(tables)), [len(t) for t in tables]),
+            np.concatenate([np.arange(len(t)) for t in tables])
+            if tables
+            else np.array([], dtype=int),
+        )
+
+    def add(
+        self, df: pd.DataFrame, version: str | None = None, source: str | None = None
+    ) -> Snapshot:
+        """Adds a version of the linelist to the store
+
+        Parameters
+        ----------
+        df
+            Linelist, as read by read_raw(), with every column as strings
+            and NA markers kept
+        version
+            Version name, which must contain the date of the version as
+            YYYY-MM-DD. Defaults to the current UTC time.
+        source
+            URL or path the linelist was read from, recorded in the manifest
+        """
+        now = datetime.datetime.now(datetime.timezone.utc)
+        version = version or now.strftime("%Y-%m-%dT%H%M%SZ")
+        if self.manifest_file(version).exists():
+            raise ValueError(
+                f"Snapshot {version} already exists in store {self.folder}"
+            )
+        columns = [str(c) for c in df.columns]
+        hi, lo = row_hashes(df)
+        stored, chunks, stored_chunks, stored_rows = self.index()
+        found = stored.get_indexer(pd.MultiIndex.from_arrays([hi, lo]))
+        known = found >= 0
+        chunk_of_row = np.full(len(df), len(chunks))
+        chunk_of_row[known] = stored_chunks[found[known]]
+        row_of_row = np.full(len(df), -1)
+        row_of_row[known] = stored_rows[found[known]]
+
+        # new rows are written once each to a new chunk, in order of first appearance
+        new = np.flatnonzero(found < 0)
+        new_hashes = pd.MultiIndex.from_arrays([hi[new], lo[new]])
+        first = new[~new_hashes.duplicated()]
+        if len(first):
+            chunk = hashlib.sha256(
+                hi[first].tobytes() + lo[first].tobytes()
+            ).hexdigest()
+            self.write_chunk(chunk, df.iloc[first], hi[first], lo[first])
+            chunks = chunks + [chunk]
+            row_of_row[new] = pd.MultiIndex.from_arrays(
+                [hi[first], lo[first]]
+            ).get_indexer(new_hashes)
+
+        runs = row_runs(chunk_of_row, row_of_row)
+        used = {
+            chunk: i for i, chunk in enumerate(sorted({chunk for chunk, _, _ in runs}))
+        }
+        snapshot = Snapshot(
+            version=version,
+            created=now.isoformat(timespec="seconds"),
+            source=source,
+            columns=columns,
+            n_rows=len(df),
+            n_new_rows=len(first),
+            chunks=[chunks[i] for i in used],
+            runs=[(used[chunk], start, stop) for chunk, start, stop in runs],
+        )
+        self.folder.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.manifest_file(version).with_suffix(".tmp")
+        tmp_file.write_text(snapshot.as_json())
+        tmp_file.replace(self.manifest_file(version))
+        return snapshot
+
+    def write_chunk(self, chunk: str, df: pd.DataFrame, hi: np.ndarray, lo: np.ndarray):
+        pa = self.pa
+        schema = pa.schema(
+            [(str(c), pa.string()) for c in df.columns]
+            + [(c, pa.uint64()) for c in HASH_COLUMNS]
+        )
+        table = pa.Table.from_pandas(
+            df.assign(**dict(zip(HASH_COLUMNS, [hi, lo]))),
+            schema=schema,
+            preserve_index=False,
+        )
+        self.chunks_folder.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.chunk_file(chunk).with_suffix(".tmp")
+        pa.parquet.write_table(table, tmp_file, compression="zstd")
+        tmp_file.replace(self.chunk_file(chunk))
+
+    def restore(self, version: str, columns: list[str] | None = None) -> pd.DataFrame:
+        """Returns linelist version as a dataframe
+
+        Parameters
+        ----------
+        version
+            Version to restore, see versions()
+        columns
+            Columns to restore, defaults to all columns
+        """
+        snapshot = self.snapshot(version)
+        columns = [c for c in snapshot.columns if columns is None or c in columns]
+        if not snapshot.chunks:
+            return arrow_to_pandas(
+                self.pa.table({c: self.pa.array([], self.pa.string()) for c in columns})
+            )
+        tables = [
+            self.pa.parquet.read_table(self.chunk_file(chunk), columns=columns)
+            for chunk in snapshot.chunks
+        ]
+        offsets = np.cumsum([0] + [len(t) for t in tables])
+        runs = np.array(snapshot.runs, dtype=np.int64).reshape(-1, 3)
+        starts = offsets[runs[:, 0]] + runs[:, 1]
+        lengths = runs[:, 2] - runs[:, 1]
+        # row numbers of all runs, in the concatenated chunks
+        indices = np.arange(lengths.sum()) + np.repeat(
+            starts - np.cumsum(lengths) + lengths, lengths
+        )
+        return arrow_to_pandas(self.pa.concat_tables(tables).take(indices))
+
+
+def read_snapshot(filename: str, columns: list[str] | None = None) -> pd.DataFrame:
+    "Restores the linelist version of a snapshot manifest, see SnapshotStore"
+    if (path := local_path(filename)) is None:
+        raise ValueError(
+            f"Snapshots can only be read from a local store, got {filename}"
+        )
+    file = Path(path)
+    return SnapshotStore(file.parent).restore(file.stem, columns)
+
+
+def get_store(outbreak: str, folder: str | Path | None = None) -> SnapshotStore:
+    "Returns snapshot store of an outbreak, by default in the olm cache folder"
+    return SnapshotStore(folder or STORE_FOLDER / outbreak)
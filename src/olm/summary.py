@@ -0,0 +1,143 @@
+"""
+Summary statistics engine for template variables and plots
+
+Counts returned by data/ entries such as get_counts(), and the counts
+plotted by figures such as epicurves, are views over a cube with the
+number of rows for each combination of case status, outcome, gender, age,
+location, animal contact and flags, built by a single groupby and shared
+by all entries for a linelist. Views which need other columns, such as a
+date column for an epicurve, use a cube with only the columns they need.
+
+Cubes are cached for the lifetime of the dataframe, and stored as Parquet
+files by a hash of the data (if pyarrow is installed), so that reports for
+a data version which was already summarised do not aggregate rows again.
+"""
+
+import json
+import weakref
+import hashlib
+import importlib.util
+
+import pandas as pd
+
+from .util import CACHE_FOLDER, temporary_file, replace_file
+from .profile import get_data_hash
+
+# columns used as dimensions of every summary table, if present
+SUMMARY_DIMENSIONS = [
+    "Case_status",
+    "Outcome",
+    "Gender",
+    "Age",
+    "Country",
+    "Location_Admin0",
+    "Location_Admin1",
+    "Location_District",
+    "Contact_animal",
+    "Contact_animal_species",
+]
+VALID_AGE_GENDER = "_valid_age_gender"
+FARM_WORKER = "_farm_worker"
+SUMMARY_CACHE_FOLDER = CACHE_FOLDER / "summaries"
+
+
+def summary_flags(df: pd.DataFrame) -> list[str]:
+    "Returns flags which summary tables with flags have for a linelist"
+    return ([VALID_AGE_GENDER] if {"Age", "Gender"} <= set(df.columns) else []) + (
+        [FARM_WORKER] if "Occupation" in df.columns else []
+    )
+
+
+def summary_table(
+    df: pd.DataFrame, dimensions: list[str], flags: bool = True
+) -> pd.DataFrame:
+    """Returns number of rows (column n) for each combination of dimension values
+
+    Missing values are kept as a separate value of each dimension. If flags
+    is True, two flags are added as dimensions: whether both Age and Gender
+    are present, and whether Occupation mentions farm work.
+    """
+    keys = {d: df[d] for d in dimensions}
+    if flags and VALID_AGE_GENDER in summary_flags(df):
+        keys[VALID_AGE_GENDER] = df.Age.notna() & df.Gender.notna()
+    if flags and FARM_WORKER in summary_flags(df):
+        keys[FARM_WORKER] = df.Occupation.str.lower().str.contains(
+            "farm worker", regex=False, na=False
+        )
+    return (
+        pd.DataFrame(keys)
+        .groupby(list(keys), dropna=False, observed=True)
+        .size()
+        .rename("n")
+        .reset_index()
+    )
+
+
+def stored_summary_table(
+    df: pd.DataFrame, dimensions: list[str], flags: bool = True
+) -> pd.DataFrame:
+    "Returns summary_table(), read from or written to SUMMARY_CACHE_FOLDER if pyarrow is installed"
+    if importlib.util.find_spec("pyarrow") is None:
+        return summary_table(df, dimensions, flags)
+    key = hashlib.sha256(json.dumps([dimensions, flags]).encode("utf-8")).hexdigest()[
+        :16
+    ]
+    file = SUMMARY_CACHE_FOLDER / f"{get_data_hash(df)}-{key}.parquet"
+    if file.exists():
+        return pd.read_parquet(file)
+    table = summary_table(df, dimensions, flags)
+    SUMMARY_CACHE_FOLDER.mkdir(parents=True, exist_ok=True)
+    # threads and processes building reports for the same data may write the same file
+    tmp_file = temporary_file(file)
+    table.to_parquet(tmp_file, index=False)
+    replace_file(tmp_file, file)
+    return table
+
+
+_summary_cache: dict[int, list[pd.DataFrame]] = {}
+
+
+def get_summary_table(df: pd.DataFrame, columns: list[str] = []) -> pd.DataFrame:
+    """Returns summary table for a linelist, cached for the lifetime of the dataframe
+
+    The table has all SUMMARY_DIMENSIONS present in the linelist, and flags
+    (see summary_flags()). If columns are requested which are not all
+    dimensions or flags, a table is built with only these columns as
+    dimensions and no flags, unless a cached table already has them. Callers
+    must request every column of the table they use, including flags.
+    """
+    key = id(df)
+    if key not in _summary_cache:
+        _summary_cache[key] = []
+        weakref.finalize(df, _summary_cache.pop, key, None)
+    tables = _summary_cache[key]
+    flags = summary_flags(df)
+    columns = [c for c in columns if c in df.columns or c in flags]
+    # the smallest table with the requested columns
+    for table in sorted(tables, key=len):
+        if set(columns) <= set(table.columns):
+            return table
+    dimensions = [c for c in SUMMARY_DIMENSIONS if c in df.columns]
+    if set(columns) <= set(dimensions) | set(flags):
+        tables.append(stored_summary_table(df, dimensions))
+    else:
+        # dimensions such as dates have many values, so tables with them
+        # only have the requested dimensions, without flags
+        tables.append(
+            stored_summary_table(df, list(dict.fromkeys(columns)), flags=False)
+        )
+    return tables[-1]
+
+
+def summary_counts(df: pd.DataFrame, columns: list[str]) -> pd.DataFrame:
+    """Returns number of rows (column n) for each combination of values of columns
+
+    Counts are summed from the summary table, so rows are only aggregated
+    once for all views over the same columns. Missing values are kept.
+    """
+    return (
+        get_summary_table(df, columns)
+        .groupby(columns, dropna=False, observed=True, sort=False)
+        .n.sum()
+        .reset_index()
+    )
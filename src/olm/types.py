@@ -1,14 +1,123 @@
 "Types used by olm"
 
+import html
 import json
 import dataclasses
 from typing import Callable, Any, NamedTuple
 
+import pandas as pd
 import plotly.graph_objects as go
 
 PlotFunction = Callable[..., dict[str, Any] | go.Figure]
 PlotData = tuple[str, PlotFunction, dict[str, Any]]
 
+# number of lint error groups shown in Slack messages
+SLACK_MAX_ERROR_GROUPS = 10
+
+
+@dataclasses.dataclass
+class DelayDistribution:
+    "Distribution of delays in days from onset to a target date column"
+
+    target: str
+    n: int
+    median: float
+    iqr: float
+    quantiles: dict[float, float]
+    n_beyond_max: int
+    histogram: pd.Series
+
+
+class TermFrequencies(NamedTuple):
+    "Number of entries mentioning each term, and number of entries with terms"
+
+    counts: dict[str, int]
+    total_entry_count: int
+
+
+@dataclasses.dataclass
+class ColumnProfile:
+    """Data quality statistics of a linelist column
+
+    na_markers and invalid_dates count values which were read as missing,
+    because they were NA markers such as N/K, or were not dates in a date
+    column; they are included in missing.
+    """
+
+    column: str
+    count: int
+    missing: int
+    distinct: int
+    top_values: list[tuple[str, int]]
+    na_markers: int = 0
+    invalid_dates: int = 0
+
+    @property
+    def completeness(self) -> float:
+        "Fraction of values which are present"
+        return (
+            self.count / (self.count + self.missing)
+            if self.count + self.missing
+            else 0.0
+        )
+
+
+@dataclasses.dataclass
+class DataProfile:
+    "Per-column data quality statistics of a linelist"
+
+    n_rows: int
+    columns: list[ColumnProfile]
+
+    def as_json(self) -> str:
+        return json.dumps(dataclasses.asdict(self))
+
+    @classmethod
+    def from_json(cls, data: str) -> "DataProfile":
+        profile = json.loads(data)
+        return cls(
+            n_rows=profile["n_rows"],
+            columns=[
+                ColumnProfile(
+                    **(c | {"top_values": [tuple(v) for v in c["top_values"]]})
+                )
+                for c in profile["columns"]
+            ],
+        )
+
+
+@dataclasses.dataclass
+class Snapshot:
+    """Manifest of a linelist version in the snapshot store, see olm.store
+
+    The linelist is made up of runs of rows, in order, each given as
+    (chunk, start, stop), where chunk is an index into chunks.
+    """
+
+    version: str
+    created: str
+    source: str | None
+    columns: list[str]
+    n_rows: int
+    n_new_rows: int
+    chunks: list[str]
+    runs: list[tuple[int, int, int]]
+
+    def as_json(self) -> str:
+        return json.dumps(dataclasses.asdict(self))
+
+    @classmethod
+    def from_json(cls, data: str) -> "Snapshot":
+        snapshot = json.loads(data)
+        return cls(**(snapshot | {"runs": [tuple(r) for r in snapshot["runs"]]}))
+
+
+class LintRule(NamedTuple):
+    "Check across rows or columns of a linelist, see olm.lint.LINT_RULES"
+
+    rule: str
+    columns: list[str]
+
 
 class RowError(NamedTuple):
     id: str
@@ -17,23 +126,76 @@ class RowError(NamedTuple):
     message: str
 
 
+@dataclasses.dataclass
+class ErrorGroup:
+    "Lint errors with the same column and message"
+
+    column: str
+    message: str
+    count: int = 0
+    examples: list[tuple[str, Any]] = dataclasses.field(default_factory=list)
+    first_id: str | None = None
+    last_id: str | None = None
+
+    def __str__(self) -> str:
+        examples = ", ".join(f"ID {id} found={value}" for id, value in self.examples)
+        rows = (
+            "1 row"
+            if self.count == 1
+            else f"{self.count} rows, IDs {self.first_id} to {self.last_id}"
+        )
+        return f"- {self.column}: {self.message} ({rows}), e.g. {examples}"
+
+
 @dataclasses.dataclass
 class LintResult:
+    "Lint errors for an outbreak, aggregated by column and message"
+
     outbreak: str
     schema: str
     ok: bool
-    errors: list[RowError]
+    groups: list[ErrorGroup]
+
+    @property
+    def n_errors(self) -> int:
+        return sum(g.count for g in self.groups)
 
     def as_json(self) -> str:
-        return json.dumps(dataclasses.asdict(self), sort_keys=True, indent=2)
+        return json.dumps(
+            dataclasses.asdict(self) | {"n_errors": self.n_errors},
+            sort_keys=True,
+            indent=2,
+            default=str,
+        )
 
     def __str__(self) -> str:
-        return "\n".join(
-            f"- ID {e.id}: {e.message}, found={e.value}" for e in self.errors
-        )
+        return "\n".join(map(str, self.groups))
 
     def as_html(self) -> str:
-        pass
+        rows = "\n".join(
+            "<tr>"
+            + "".join(
+                f"<td>{html.escape(str(v))}</td>"
+                for v in [
+                    g.column,
+                    g.message,
+                    g.count,
+                    g.first_id,
+                    g.last_id,
+                    ", ".join(f"{id}: {value}" for id, value in g.examples),
+                ]
+            )
+            + "</tr>"
+            for g in self.groups
+        )
+        return f"""<p>Lint {"succeeded" if self.ok else "failed"} for <b>{html.escape(self.outbreak)}</b>
+with {self.n_errors} errors</p>
+<table class="lint-errors">
+<thead><tr><th>Column</th><th>Error</th><th>Rows</th><th>First ID</th><th>Last ID</th><th>Examples</th></tr></thead>
+<tbody>
+{rows}
+</tbody>
+</table>"""
 
     def as_slack(self) -> str:
         header = (
@@ -41,7 +203,19 @@ class LintResult:
         ) + f"*{self.outbreak}*"
         if self.ok:
             return header
-        errors = "\n".join(
-            f"- ID {e.id}: {e.message}, found={e.value}" for e in self.errors
-        )
-        return header + "\n" + errors
+        lines = [
+            f"{header}: {self.n_errors} errors",
+            *map(str, self.groups[:SLACK_MAX_ERROR_GROUPS]),
+        ]
+        if (n_more := len(self.groups) - SLACK_MAX_ERROR_GROUPS) > 0:
+            lines.append(f"… and {n_more} more kinds of error")
+        return "\n".join(lines)
+
+
+class Response(NamedTuple):
+    "HTTP response of olm serve, with a gzip compressed body"
+
+    status: int
+    content_type: str
+    body: bytes
+    etag: str
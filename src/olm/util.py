@@ -2,15 +2,26 @@
 Briefing report generator for Marburg 2023 outbreak
 """
 
+import os
 import re
+import json
+import hashlib
 import logging
 import datetime
+import threading
+import importlib.util
+import concurrent.futures
+from pathlib import Path
 from typing import Callable, Any
 
 import yaml
 import boto3
+import requests
+import numpy as np
 import pandas as pd
 
+from .readers import get_reader, detect_format, read_parquet, EXTRA_NA_VALUES
+from .console import msg_ok, msg_fail, bold_brackets  # noqa: F401
 
 pd.options.mode.chained_assignment = None
 
@@ -28,6 +39,10 @@ AGE_BINS = [
     (80, 120),
 ]
 REGEX_DATE = r"^202\d-[0,1]\d-[0-3]\d"
+# dataframe attribute set by read_csv(), with the number of NA markers and
+# invalid dates set to missing in each column
+READ_STATS = "olm_read_stats"
+CACHE_FOLDER = Path(os.getenv("OLM_CACHE_FOLDER", Path.home() / ".cache" / "olm"))
 
 # Upper bounded ages below this are upper bounded to 60 Example: an age
 # of '>15' would be mapped to 15-60 while an age of '>70' would be
@@ -52,23 +67,10 @@ def non_null_unique(arr: pd.Series) -> pd.Series:
     return uniq[~pd.isna(uniq)]
 
 
-def msg_ok(module: str, s: str):
-    print(f"\033[0;32m✓ olm[{module}]\t\033[0m {s}")
-
-
-def msg_fail(module: str, s: str):
-    print(f"\033[0;31m✗ olm[{module}]\t\033[0m {s}")
-
-
 def rename_columns(df: pd.DataFrame, columns: dict[str, str]) -> pd.DataFrame:
     return df.rename(columns=columns)
 
 
-def bold_brackets(s: str) -> str:
-    """Given a text with brackets such as [this], renders it in bold font"""
-    return s.replace("[", "\033[1m").replace("]", "\033[0m")
-
-
 def sort_values(
     by: list[str], ascending: bool
 ) -> Callable[[pd.DataFrame], pd.DataFrame]:
@@ -78,19 +80,61 @@ def sort_values(
     return sort_table
 
 
-def fix_datetimes(df: pd.DataFrame, additional_date_columns: list[str] = []):
-    "Convert date fields to datetime in place"
-    date_columns = [
+def date_columns(
+    df: pd.DataFrame, additional_date_columns: list[str] = []
+) -> list[str]:
+    "Returns columns which are converted to dates, see fix_datetimes()"
+    return [
         c for c in df.columns if c.startswith("Date_") or "Date " in c
     ] + additional_date_columns
-    for date_col in date_columns:
-        df[date_col] = df[date_col].map(
-            lambda x: (
-                pd.to_datetime(x)
-                if isinstance(x, str) and re.match(REGEX_DATE, x)
-                else None
-            )
+
+
+def fix_datetimes(
+    df: pd.DataFrame, additional_date_columns: list[str] = []
+) -> dict[str, int]:
+    """Convert date fields to datetime in place
+
+    Values which do not start with a date are set to missing. Distinct values
+    are converted once, and the number of values set to missing in each
+    column is returned.
+    """
+    invalid = {}
+    for date_col in date_columns(df, additional_date_columns):
+        codes, uniques = pd.factorize(df[date_col])
+        is_date = (
+            pd.Series(uniques, dtype=object)
+            .map(lambda x: isinstance(x, str) and re.match(REGEX_DATE, x) is not None)
+            .to_numpy(dtype=bool)
+        )
+        dates = pd.to_datetime(
+            pd.Series(uniques, dtype=object).where(is_date),
+            format="mixed",
+            errors="coerce",
         )
+        # missing values (code -1) take the trailing NaT
+        df[date_col] = pd.Series(
+            np.append(dates.to_numpy(), np.datetime64("NaT"))[codes], index=df.index
+        )
+        invalid[date_col] = int(
+            np.bincount(codes[codes >= 0], minlength=len(uniques))[
+                dates.isna().to_numpy()
+            ].sum()
+        )
+    return invalid
+
+
+def replace_na_markers(
+    df: pd.DataFrame, markers: list[str] = EXTRA_NA_VALUES
+) -> dict[str, int]:
+    "Sets values which are NA markers, such as N/K, to missing in place, returning counts by column"
+    counts = {}
+    for col in df.columns:
+        if df[col].dtype.kind in "OSU" or isinstance(df[col].dtype, pd.StringDtype):
+            is_marker = df[col].isin(markers)
+            if n := int(is_marker.sum()):
+                df[col] = df[col].mask(is_marker)
+                counts[col] = n
+    return counts
 
 
 def get_age_bins(age: str) -> range:
@@ -148,6 +192,171 @@ def store_s3(
             logging.exception("An exception occurred while trying to upload files")
             raise
 
+
+class S3Writer:
+    """Writes text to a S3 object using a multipart upload, so that the
+    object does not have to be held in memory
+
+    Parts are uploaded once they reach part_size bytes; S3 requires all parts
+    except the last one to be at least 5 MiB. If an exception occurs, the
+    upload is aborted and no object is created.
+    """
+
+    def __init__(
+        self,
+        bucket_name: str,
+        key: str,
+        content_type: str,
+        part_size: int = 8 * 1024 * 1024,
+    ):
+        self.bucket_name = bucket_name
+        self.key = key
+        self.content_type = content_type
+        self.part_size = part_size
+        self.client = boto3.client("s3")
+        self.buffer = bytearray()
+        self.parts: list[dict[str, Any]] = []
+
+    def __enter__(self):
+        logging.info(f"Uploading data to s3://{self.bucket_name}/{self.key}")
+        self.upload_id = self.client.create_multipart_upload(
+            Bucket=self.bucket_name, Key=self.key, ContentType=self.content_type
+        )["UploadId"]
+        return self
+
+    def write(self, s: str):
+        self.buffer += s.encode("utf-8")
+        if len(self.buffer) >= self.part_size:
+            self.upload_part()
+
+    def upload_part(self):
+        part_number = len(self.parts) + 1
+        res = self.client.upload_part(
+            Bucket=self.bucket_name,
+            Key=self.key,
+            UploadId=self.upload_id,
+            PartNumber=part_number,
+            Body=bytes(self.buffer),
+        )
+        self.parts.append({"ETag": res["ETag"], "PartNumber": part_number})
+        self.buffer.clear()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.client.abort_multipart_upload(
+                Bucket=self.bucket_name, Key=self.key, UploadId=self.upload_id
+            )
+            return False
+        try:
+            if self.buffer or not self.parts:
+                self.upload_part()
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket_name,
+                Key=self.key,
+                UploadId=self.upload_id,
+                MultipartUpload={"Parts": self.parts},
+            )
+        except Exception:
+            logging.exception("An exception occurred while trying to upload files")
+            self.client.abort_multipart_upload(
+                Bucket=self.bucket_name, Key=self.key, UploadId=self.upload_id
+            )
+            raise
+
+
+def copy_s3(bucket_name: str, source_key: str, keys: list[str]):
+    "Copies S3 object to other keys in the same bucket"
+    client = boto3.client("s3")
+    for k in keys:
+        logging.info(
+            f"Copying s3://{bucket_name}/{source_key} to s3://{bucket_name}/{k}"
+        )
+        client.copy_object(
+            Bucket=bucket_name,
+            Key=k,
+            CopySource={"Bucket": bucket_name, "Key": source_key},
+        )
+
+
+def upload_files(
+    bucket_name: str, files: dict[str, Path], content_type: str, max_workers: int = 16
+):
+    "Uploads local files to S3 keys concurrently, files maps keys to paths"
+    client = boto3.client("s3")
+
+    def upload(key: str):
+        logging.info(f"Uploading {files[key]} to s3://{bucket_name}/{key}")
+        client.upload_file(
+            str(files[key]), bucket_name, key, ExtraArgs={"ContentType": content_type}
+        )
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # consume results so that the first exception is raised
+        list(executor.map(upload, files))
+
+
+def temporary_file(file: Path) -> Path:
+    "Returns temporary file next to file, unique to the process and thread writing it"
+    return file.with_name(f"{file.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+
+def replace_file(tmp_file: Path, file: Path):
+    """Moves tmp_file to file, which is written atomically
+
+    Threads and processes writing the same file from the same data write the
+    same contents, so if another writer's file could not be replaced, it is
+    kept and tmp_file is removed.
+    """
+    try:
+        tmp_file.replace(file)
+    except OSError:
+        tmp_file.unlink(missing_ok=True)
+        if not file.exists():
+            raise
+
+
+def cached_get(url: str, folder: str = "http", timeout: int = 30) -> Path:
+    """Fetches URL to a file in the olm cache folder and returns its path
+
+    The response ETag and Last-Modified headers are stored alongside the
+    cached file and sent on subsequent requests, so an unchanged resource
+    is revalidated with a 304 Not Modified instead of being downloaded
+    again. If the network is unavailable, the cached copy is returned.
+    """
+    cache = CACHE_FOLDER / folder
+    cache.mkdir(parents=True, exist_ok=True)
+    key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+    body, meta = cache / key, cache / f"{key}.json"
+    headers = {}
+    if body.exists() and meta.exists():
+        validators = json.loads(meta.read_text())
+        if etag := validators.get("etag"):
+            headers["If-None-Match"] = etag
+        if last_modified := validators.get("last_modified"):
+            headers["If-Modified-Since"] = last_modified
+    try:
+        res = requests.get(url, headers=headers, timeout=timeout)
+    except requests.RequestException:
+        if body.exists():
+            logging.warning(f"Could not revalidate {url}, using cached copy")
+            return body
+        raise
+    if res.status_code == 304:
+        return body
+    res.raise_for_status()
+    body.write_bytes(res.content)
+    meta.write_text(
+        json.dumps(
+            {
+                "url": url,
+                "etag": res.headers.get("ETag"),
+                "last_modified": res.headers.get("Last-Modified"),
+            }
+        )
+    )
+    return body
+
+
 def get_archives_for_outbreak(
     outbreak: str,
     bucket: str = REPORT_BUCKET
@@ -177,8 +386,45 @@ def invalidate_cache(
         raise
 
 
+def read_raw(
+    filename: str,
+    reader: str = "pandas",
+    columns: list[str] | None = None,
+    filters: list[Any] | None = None,
+) -> pd.DataFrame:
+    """Reads file with every column as strings, keeping NA markers
+
+    Snapshot manifests (.snapshot) are restored from the snapshot store,
+    see olm.store. See read_csv() for the parameters.
+    """
+    file_format, compression = detect_format(filename)
+    if file_format == "parquet":
+        return read_parquet(filename, columns, filters)
+    if filters:
+        raise ValueError(
+            f"Row filters are only supported for Parquet files, got {filename}"
+        )
+    if file_format == "snapshot":
+        from .store import read_snapshot
+
+        return read_snapshot(filename, columns)
+    if (
+        compression == "zstd"
+        and reader == "pandas"
+        and importlib.util.find_spec("zstandard") is None
+    ):
+        # pandas requires zstandard for zstd, pyarrow includes it
+        reader = "arrow"
+    return get_reader(reader)(filename, compression, columns, na_values=[])
+
+
 def read_csv(
-    filename: str, additional_date_columns: list[str] = [], convert_dates: bool = True
+    filename: str,
+    additional_date_columns: list[str] = [],
+    convert_dates: bool = True,
+    reader: str = "pandas",
+    columns: list[str] | None = None,
+    filters: list[Any] | None = None,
 ) -> pd.DataFrame:
     """Helper function with post-processing steps after pd.read_csv
 
@@ -186,13 +432,28 @@ def read_csv(
     ----------
     filename
         File or URL to read from. This is passed to pd.read_csv() so any URL
-        supported by pandas is supported here
-    date_columns
+        supported by pandas is supported here. CSV files may be gzip (.gz)
+        or zstd (.zst) compressed, and Parquet files (.parquet) and snapshots
+        (.snapshot) are also read, see olm.readers.detect_format()
+    additional_date_columns
         Additional date columns that should be converted. By default read_csv
         fixes date columns to be of the correct type if they start with 'Date_'
         or have 'Date ' in their column name
+    reader
+        CSV reader backend, one of pandas, arrow or chunked, see olm.readers
+    columns
+        Columns to read, defaults to all columns
+    filters
+        Row filters for Parquet files, see olm.readers.read_parquet()
     """
-    df = pd.read_csv(filename, dtype=str, na_values=["N/K", "NK"])
+    # NA markers are replaced after parsing, so that they can be counted
+    df = read_raw(filename, reader, columns, filters)
+    stats = {
+        "n_rows": len(df),
+        "na_markers": replace_na_markers(df),
+        "invalid_dates": {},
+    }
     if convert_dates:
-        fix_datetimes(df, additional_date_columns)
+        stats["invalid_dates"] = fix_datetimes(df, additional_date_columns)
+    df.attrs[READ_STATS] = stats
     return df
@@ -0,0 +1,200 @@
+"""
+Watch mode, which rebuilds a report when its configuration, templates,
+includes or data change
+"""
+
+import time
+import datetime
+from pathlib import Path
+from typing import Any
+
+import requests
+
+from .console import msg_ok, msg_fail
+from .registry import OUTBREAKS_PATH
+from .outbreaks import INCLUDES, TEMPLATES, Outbreak, write_report
+
+
+def get_data_version(url: str) -> str | None:
+    "Returns ETag or Last-Modified for a data URL, or modification time for a path"
+    if url.startswith("http"):
+        res = requests.head(url, timeout=10, allow_redirects=True)
+        return res.headers.get("ETag") or res.headers.get("Last-Modified")
+    return str(Path(url.removeprefix("file://")).stat().st_mtime_ns)
+
+
+def get_mtimes(files: list[Path]) -> dict[Path, int]:
+    return {f: f.stat().st_mtime_ns for f in files if f.exists()}
+
+
+def template_files(outbreak: str) -> list[Path]:
+    "Returns report template files and includes for an outbreak"
+    includes = INCLUDES / outbreak
+    return [
+        TEMPLATES / "_header.html",
+        TEMPLATES / f"{outbreak}.html",
+        TEMPLATES / "_footer.html",
+        *(sorted(includes.iterdir()) if includes.exists() else []),
+    ]
+
+
+def read_options(outbreak: Outbreak) -> tuple[Any, ...]:
+    "Returns outbreak attributes which affect how its data is read"
+    return (
+        outbreak.url,
+        outbreak.additional_date_columns,
+        outbreak.reader,
+        outbreak.columns,
+        outbreak.filters,
+    )
+
+
+def plot_datasets(kwargs: dict[str, Any] | None) -> list[str]:
+    "Returns secondary datasets used by a plot entry"
+    kwargs = kwargs or {}
+    return ([kwargs["dataset"]] if "dataset" in kwargs else []) + list(
+        kwargs.get("datasets", {}).values()
+    )
+
+
+class ReportWatcher:
+    """Keeps an outbreak report and its computed fragments in memory
+
+    Each poll() checks the outbreak configuration, templates and includes
+    for changes, and the version of the data and of each secondary dataset
+    used by plot entries every data_interval seconds. Only the plot entries
+    whose configuration or datasets changed are recomputed; template and
+    include changes only re-render the report.
+    """
+
+    def __init__(
+        self, config: str | Path, data_url: str | None = None, data_interval: float = 60
+    ):
+        self.config = Path(config)
+        self.data_url = data_url
+        self.data_interval = data_interval
+        self.outbreak = Outbreak(self.config, data_url)
+        self.output_file = f"{self.outbreak.name}.html"
+        self.fragments: dict[str, tuple[Any, dict[str, Any]]] = {}
+        self.config_mtime = self.config.stat().st_mtime_ns
+        self.template_mtimes = get_mtimes(self.template_files())
+        self.data_version = get_data_version(self.outbreak.url)
+        self.dataset_versions = self.get_dataset_versions()
+        self.data_checked = time.monotonic()
+
+    def template_files(self) -> list[Path]:
+        return template_files(self.outbreak.name)
+
+    def get_dataset_versions(self) -> dict[str, tuple[str, str | None]]:
+        """Returns URL for the report date and its data version, of each
+        secondary dataset used by plot entries, leaving out datasets which
+        have no URL for the report date (see Outbreak.dataset_url())"""
+        versions = {}
+        for name in self.outbreak.plot_datasets():
+            if (url := self.outbreak.dataset_url(name)) is not None:
+                versions[name] = (url, get_data_version(url))
+        return versions
+
+    def fragment_key(self, kwargs: dict[str, Any] | None) -> Any:
+        "Returns plot entry configuration and versions of the datasets it uses"
+        return kwargs, [self.dataset_versions.get(n) for n in plot_datasets(kwargs)]
+
+    def build(self) -> int:
+        "Builds report, recomputing plot entries which are not up to date"
+        recomputed = 0
+        plots = self.outbreak.plots
+        for plot in set(self.fragments) - set(plots):
+            del self.fragments[plot]
+        for plot, kwargs in plots.items():
+            key = self.fragment_key(kwargs)
+            if plot not in self.fragments or self.fragments[plot][0] != key:
+                self.fragments[plot] = (
+                    key,
+                    self.outbreak.build_plot(plot, self.outbreak.data),
+                )
+                recomputed += 1
+        var = self.outbreak.report_variables(datetime.datetime.today().date())
+        for _, fragment in self.fragments.values():
+            var.update(fragment)
+        write_report(self.outbreak.name, var, self.output_file)
+        return recomputed
+
+    def changed(self) -> list[str]:
+        "Returns list of changes since last check, and updates outbreak accordingly"
+        changes = []
+        if (config_mtime := self.config.stat().st_mtime_ns) != self.config_mtime:
+            self.config_mtime = config_mtime
+            outbreak = Outbreak(self.config, self.data_url)
+            if (
+                read_options(outbreak) == read_options(self.outbreak)
+                and "data" in self.outbreak.__dict__
+            ):
+                outbreak.data = self.outbreak.data
+            else:
+                self.fragments.clear()
+            self.outbreak = outbreak
+            self.dataset_versions = self.get_dataset_versions()
+            changes.append(self.config.name)
+        if (
+            template_mtimes := get_mtimes(self.template_files())
+        ) != self.template_mtimes:
+            changes.extend(
+                f.name
+                for f in set(template_mtimes) | set(self.template_mtimes)
+                if template_mtimes.get(f) != self.template_mtimes.get(f)
+            )
+            self.template_mtimes = template_mtimes
+        if time.monotonic() - self.data_checked > self.data_interval:
+            self.data_checked = time.monotonic()
+            if (
+                data_version := get_data_version(self.outbreak.url)
+            ) != self.data_version:
+                self.data_version = data_version
+                self.outbreak.__dict__.pop("data", None)
+                self.fragments.clear()
+                changes.append("data")
+            dataset_versions = self.get_dataset_versions()
+            for name in set(dataset_versions) | set(self.dataset_versions):
+                if dataset_versions.get(name) != self.dataset_versions.get(name):
+                    # read again by Outbreak.load() when next used
+                    self.outbreak.datasets.pop(name, None)
+                    self.outbreak.dataset_urls.pop(name, None)
+                    changes.append(f"dataset {name}")
+            self.dataset_versions = dataset_versions
+        return changes
+
+    def poll(self) -> bool:
+        "Rebuilds report if anything changed, returns True if report was rebuilt"
+        if not (changes := self.changed()):
+            return False
+        start_time = time.perf_counter()
+        recomputed = self.build()
+        msg_ok(
+            "watch",
+            f"rebuilt {self.output_file} after changes to {', '.join(sorted(set(changes)))} "
+            f"({recomputed} plots recomputed, {time.perf_counter() - start_time:.2f}s)",
+        )
+        return True
+
+
+def watch(
+    outbreak: str,
+    data_url: str | None = None,
+    interval: float = 0.25,
+    data_interval: float = 60,
+):
+    "Builds report for outbreak, and rebuilds it whenever its sources change"
+    watcher = ReportWatcher(OUTBREAKS_PATH / f"{outbreak}.yml", data_url, data_interval)
+    start_time = time.perf_counter()
+    watcher.build()
+    msg_ok(
+        "watch",
+        f"wrote {watcher.output_file} ({time.perf_counter() - start_time:.1f}s), watching for changes",
+    )
+    while True:
+        time.sleep(interval)
+        try:
+            watcher.poll()
+        except Exception as e:
+            # keep watching, so that the error can be fixed in place
+            msg_fail("watch", f"{type(e).__name__}: {e}")
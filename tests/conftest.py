@@ -0,0 +1,10 @@
+import pytest
+
+import olm.summary
+
+
+@pytest.fixture(autouse=True)
+def summary_cache(tmp_path, monkeypatch):
+    "Summary tables are stored in a temporary folder, see olm.summary"
+    monkeypatch.setattr(olm.summary, "SUMMARY_CACHE_FOLDER", tmp_path / "summaries")
+    return tmp_path / "summaries"
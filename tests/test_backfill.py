@@ -0,0 +1,117 @@
+import gzip
+import shutil
+import datetime
+from pathlib import Path
+
+import yaml
+import pytest
+import pandas as pd
+
+from olm.registry import REQUIRED_OUTBREAK_ATTRIBUTES
+import olm.backfill
+from olm.backfill import (
+    parse_s3_url,
+    local_snapshots,
+    group_dates,
+    fetch_snapshot,
+    build_snapshot_reports,
+    backfill,
+)
+from olm.util import read_csv
+
+DATA = Path(__file__).with_name("test_data.csv")
+STATUS = Path(__file__).with_name("test_status_data.csv")
+
+
+def test_parse_s3_url():
+    assert parse_s3_url("s3://bucket/path/latest.csv") == ("bucket", "path/latest.csv")
+    assert parse_s3_url(
+        "https://mpox-2024.s3.eu-central-1.amazonaws.com/latest.csv"
+    ) == ("mpox-2024", "latest.csv")
+    assert parse_s3_url("https://example.com/latest.csv") is None
+
+
+def test_fetch_snapshot_keeps_extension(tmp_path, monkeypatch):
+    class S3Client:
+        def download_file(self, bucket, key, file, ExtraArgs):
+            assert (bucket, key, ExtraArgs) == (
+                "bucket",
+                "path/latest.csv.gz",
+                {"VersionId": "v1"},
+            )
+            Path(file).write_bytes(gzip.compress(DATA.read_bytes()))
+
+    monkeypatch.setattr(olm.backfill, "SNAPSHOTS_FOLDER", tmp_path)
+    monkeypatch.setattr(olm.backfill.boto3, "client", lambda service: S3Client())
+    file = fetch_snapshot("s3://bucket/path/latest.csv.gz?versionId=v1")
+    assert file == str(tmp_path / "bucket" / "path" / "latest.csv.gz" / "v1.gz")
+    pd.testing.assert_frame_equal(read_csv(file), read_csv(DATA))
+
+
+def test_group_dates():
+    snapshots = {datetime.date(2024, 6, 1): "a.csv", datetime.date(2024, 6, 3): "b.csv"}
+    dates = [datetime.date(2024, 5, 31) + datetime.timedelta(days=i) for i in range(5)]
+    assert group_dates(snapshots, dates) == {
+        "a.csv": [datetime.date(2024, 6, 1), datetime.date(2024, 6, 2)],
+        "b.csv": [datetime.date(2024, 6, 3), datetime.date(2024, 6, 4)],
+    }
+
+
+def test_backfill(tmp_path):
+    (snapshots := tmp_path / "snapshots").mkdir()
+    shutil.copy(DATA, snapshots / "2023-04-01.csv")
+    shutil.copy(DATA, snapshots / "latest-2023-04-03.csv")
+    (snapshots / "README").write_text("not a snapshot")
+    assert list(local_snapshots(snapshots)) == [
+        datetime.date(2023, 4, 1),
+        datetime.date(2023, 4, 3),
+    ]
+
+    metadata = {attr: "test" for attr in REQUIRED_OUTBREAK_ATTRIBUTES}
+    metadata["plots"] = {"data/get_counts": {"date_col": "Date_onset"}}
+    # uses the marburg report template
+    (config := tmp_path / "marburg.yml").write_text(yaml.safe_dump(metadata))
+    files = backfill(
+        str(config),
+        datetime.date(2023, 4, 2),
+        datetime.date(2023, 4, 4),
+        snapshots=str(snapshots),
+        output_folder=tmp_path / "output",
+        processes=2,
+    )
+    assert list(files) == [datetime.date(2023, 4, d) for d in [2, 3, 4]]
+    for date, file in files.items():
+        assert file == tmp_path / "output" / f"{date}.html"
+        assert str(date) in file.read_text()
+
+
+def test_build_snapshot_reports_datasets(tmp_path, monkeypatch):
+    (snapshots := tmp_path / "status").mkdir()
+    status = pd.read_csv(STATUS, dtype=str)
+    status.to_csv(snapshots / "2023-04-01.csv", index=False)
+    status.head(2).to_csv(snapshots / "2023-04-03.csv", index=False)
+    metadata = {attr: "test" for attr in REQUIRED_OUTBREAK_ATTRIBUTES}
+    metadata["datasets"] = {"status": {"url": str(STATUS), "snapshots": str(snapshots)}}
+    metadata["plots"] = {
+        "data/status_counts/get_dataset_counts": {
+            "dataset": "status",
+            "prefix": "status",
+        }
+    }
+    (config := tmp_path / "marburg.yml").write_text(yaml.safe_dump(metadata))
+    counts = {}
+    monkeypatch.setattr(
+        olm.backfill,
+        "write_report",
+        lambda name, var, file: counts.__setitem__(
+            Path(file).stem, var["n_status_cases"]
+        ),
+    )
+    dates = [datetime.date(2023, 4, 2), datetime.date(2023, 4, 3)]
+    build_snapshot_reports(str(config), str(DATA), dates, tmp_path)
+    # each report uses the dataset as it was on its date
+    assert counts == {"2023-04-02": len(status), "2023-04-03": 2}
+    with pytest.raises(ValueError, match="No snapshot"):
+        build_snapshot_reports(
+            str(config), str(DATA), [datetime.date(2023, 3, 31)], tmp_path
+        )
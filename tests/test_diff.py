@@ -0,0 +1,52 @@
+from pathlib import Path
+
+import pandas as pd
+
+from olm.diff import count_added, diff_linelists, get_changes
+from olm.util import read_csv
+
+DATA = read_csv(Path(__file__).with_name("test_data.csv"))
+
+
+def make_current():
+    current = DATA[DATA.ID != "2"].copy()
+    current.loc[current.ID == "3", "Outcome"] = "death"
+    current.loc[current.ID == "5", "Case_status"] = "confirmed"
+    return current
+
+
+def test_diff_linelists():
+    diff = diff_linelists(DATA, make_current())
+    assert list(diff.added.index) == []
+    assert list(diff.removed.index) == ["2"]
+    assert list(diff.changed.index) == ["3", "5"]
+    assert diff.changed_columns.loc["3"][lambda s: s].index.tolist() == ["Outcome"]
+    assert diff.delta("Case_status").to_dict() == {"confirmed": 1, "probable": -2}
+
+
+def test_get_changes():
+    assert get_changes(make_current(), DATA) == {
+        "n_rows_added": 0,
+        "n_rows_removed": 1,
+        "n_rows_changed": 2,
+        "n_new_confirmed": 1,
+        "n_new_probable": -2,
+        "n_new_suspected": 0,
+        "n_new_dead": 0,
+        "has_new_confirmed": True,
+        "has_new_probable": False,
+        "has_new_suspected": False,
+        "has_new_dead": False,
+    }
+
+
+def test_count_added():
+    current = make_current()
+    added = DATA[DATA.ID == "1"].assign(ID="8")
+    assert count_added(DATA, current) == 0
+    assert count_added(DATA, current.iloc[1:]) == 0
+    assert count_added(DATA, pd.concat([current, added])) == 1
+    # without IDs, rows are matched on their values
+    current, previous = current.drop(columns="ID"), DATA.drop(columns="ID")
+    assert count_added(previous, current) == 2
+    assert count_added(previous, pd.concat([current, added.drop(columns="ID")])) == 3
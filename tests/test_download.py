@@ -0,0 +1,154 @@
+import re
+import gzip
+import hashlib
+import functools
+import threading
+from pathlib import Path
+from http.server import (
+    ThreadingHTTPServer,
+    BaseHTTPRequestHandler,
+    SimpleHTTPRequestHandler,
+)
+
+import pytest
+import pandas as pd
+
+import olm.download
+from olm.download import download, download_parquet
+from olm.util import read_csv
+
+DATA = Path(__file__).with_name("test_data.csv")
+
+BODY = b"ID,Case_status\n" + b"".join(f"{i},confirmed\n".encode() for i in range(10000))
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def send_body(self, body: bytes):
+        etag = '"' + hashlib.md5(BODY).hexdigest() + '"'
+        start, end = 0, len(body) - 1
+        if match := re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", "")):
+            start = int(match[1])
+            end = int(match[2]) if match[2] else end
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(body)}")
+        else:
+            self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        return body[start : end + 1]
+
+    def do_HEAD(self):
+        self.send_body(BODY)
+
+    def do_GET(self):
+        self.wfile.write(self.send_body(BODY))
+
+
+class CorruptHandler(RangeHandler):
+    "Serves a body which does not match the ETag"
+
+    def do_GET(self):
+        self.wfile.write(self.send_body(BODY.replace(b"confirmed", b"probable ")))
+
+
+def serve(handler):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/latest.csv"
+    server.shutdown()
+
+
+@pytest.fixture(scope="module")
+def url():
+    yield from serve(RangeHandler)
+
+
+@pytest.fixture(scope="module")
+def corrupt_url():
+    yield from serve(CorruptHandler)
+
+
+def test_download(url, tmp_path):
+    assert download(url, tmp_path / "data.csv").read_bytes() == BODY
+
+
+def test_download_parallel(url, tmp_path, monkeypatch):
+    monkeypatch.setattr(olm.download, "PART_SIZE", 1000)
+    monkeypatch.setattr(olm.download, "PARALLEL_THRESHOLD", 1000)
+    assert download(url, tmp_path / "data.csv", parts=4).read_bytes() == BODY
+
+
+def test_download_resume(url, tmp_path):
+    (tmp_path / "data.csv.part").write_bytes(BODY[:5000])
+    (tmp_path / "data.csv.part.json").write_text(
+        f'{{"etag": "\\"{hashlib.md5(BODY).hexdigest()}\\"", "size": {len(BODY)}, "completed": []}}'
+    )
+    assert download(url, tmp_path / "data.csv").read_bytes() == BODY
+    assert not (tmp_path / "data.csv.part.json").exists()
+
+
+def test_download_corrupt(corrupt_url, tmp_path):
+    with pytest.raises(ValueError, match="does not match ETag"):
+        download(corrupt_url, tmp_path / "data.csv")
+    assert list(tmp_path.iterdir()) == []
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    "Serves files without Accept-Ranges headers"
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def plain_server(tmp_path):
+    (folder := tmp_path / "served").mkdir()
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", 0), functools.partial(QuietHandler, directory=folder)
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield folder, f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def test_download_parquet_formats(plain_server, tmp_path):
+    pytest.importorskip("pyarrow")
+    folder, url = plain_server
+    expected = read_csv(DATA, convert_dates=False)
+    (folder / "data.csv.gz").write_bytes(gzip.compress(DATA.read_bytes()))
+    download_parquet(f"{url}/data.csv.gz", tmp_path / "from-gzip.parquet")
+    pd.testing.assert_frame_equal(
+        read_csv(tmp_path / "from-gzip.parquet", convert_dates=False), expected
+    )
+
+    expected.to_parquet(folder / "data.parquet", index=False)
+    download_parquet(f"{url}/data.parquet", tmp_path / "copy.parquet")
+    assert (tmp_path / "copy.parquet").read_bytes() == (
+        folder / "data.parquet"
+    ).read_bytes()
+
+
+def test_download_parquet_header_only(plain_server, tmp_path):
+    pytest.importorskip("pyarrow")
+    folder, url = plain_server
+    (folder / "header.csv").write_text("ID,Case_status\n")
+    df = pd.read_parquet(
+        download_parquet(f"{url}/header.csv", tmp_path / "header.parquet")
+    )
+    assert list(df.columns) == ["ID", "Case_status"]
+    assert df.empty
+
+
+def test_read_parquet_without_range_requests(plain_server):
+    pytest.importorskip("pyarrow")
+    folder, url = plain_server
+    expected = read_csv(DATA, convert_dates=False)
+    expected.to_parquet(folder / "data.parquet", index=False)
+    pd.testing.assert_frame_equal(
+        read_csv(f"{url}/data.parquet", convert_dates=False), expected
+    )
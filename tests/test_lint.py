@@ -0,0 +1,242 @@
+import io
+import json
+
+import yaml
+import pytest
+import pandas as pd
+import fastjsonschema
+
+import olm.lint
+from olm.lint import (
+    read_schema,
+    get_validator,
+    schema_hash,
+    lint_rows,
+    aggregate_errors,
+    write_ndjson,
+    parse_lint_rules,
+    iter_rule_errors,
+)
+from olm.outbreaks import Outbreak
+from olm.registry import REQUIRED_OUTBREAK_ATTRIBUTES
+from olm.types import RowError, LintResult, LintRule
+
+SCHEMA = {
+    "type": "object",
+    "properties": {
+        "ID": {"type": "string"},
+        "Date_onset": {"type": "string", "format": "date"},
+    },
+}
+
+
+DATA = pd.DataFrame(
+    {"ID": ["1", "2", "3"], "Date_onset": ["2024-01-02", "2024-13-02", None]}
+)
+
+
+@pytest.fixture
+def validators_folder(tmp_path, monkeypatch):
+    monkeypatch.setattr(olm.lint, "VALIDATORS_FOLDER", tmp_path)
+    monkeypatch.setattr(olm.lint, "_validators", {})
+    return tmp_path
+
+
+@pytest.fixture
+def lint_index_folder(tmp_path, monkeypatch):
+    monkeypatch.setattr(olm.lint, "LINT_INDEX_FOLDER", tmp_path)
+    return tmp_path
+
+
+def test_read_schema_path(tmp_path):
+    (schema_file := tmp_path / "schema.json").write_text(json.dumps(SCHEMA))
+    assert read_schema(str(schema_file)) == SCHEMA
+
+
+def test_get_validator_writes_module(validators_folder):
+    validate = get_validator(SCHEMA)
+    assert (validators_folder / f"schema_{schema_hash(SCHEMA)}.py").exists()
+    assert validate({"ID": "1", "Date_onset": "2024-01-02"})
+    with pytest.raises(fastjsonschema.JsonSchemaValueException):
+        validate({"ID": "1", "Date_onset": "2024-13-02"})
+
+
+def test_get_validator_reuses_module(validators_folder, monkeypatch):
+    get_validator(SCHEMA)
+    monkeypatch.setattr(olm.lint, "_validators", {})
+    monkeypatch.setattr(
+        fastjsonschema, "compile_to_code", lambda _: pytest.fail("schema recompiled")
+    )
+    assert get_validator(SCHEMA)({"ID": "2"})
+
+
+def test_lint_rows_incremental(validators_folder, lint_index_folder, monkeypatch):
+    expected = [
+        RowError("2", "Date_onset", "2024-13-02", "data.Date_onset must be date")
+    ]
+    assert lint_rows("test", DATA, SCHEMA) == expected
+
+    validated = []
+    validate_row = olm.lint.validate_row
+    monkeypatch.setattr(
+        olm.lint,
+        "validate_row",
+        lambda row, *args: validated.append(row["ID"]) or validate_row(row, *args),
+    )
+    assert lint_rows("test", DATA, SCHEMA) == expected
+    assert validated == []
+
+    changed = DATA.copy()
+    changed.loc[2, "Date_onset"] = "2024-02-99"
+    assert lint_rows("test", changed, SCHEMA) == expected + [
+        RowError("3", "Date_onset", "2024-02-99", "data.Date_onset must be date")
+    ]
+    assert validated == ["3"]
+
+    # errors are yielded as rows are validated
+    changed.loc[:, "Date_onset"] = "2024-13-02"
+    validated.clear()
+    assert next(olm.lint.iter_lint_rows("test", changed, SCHEMA)).id == "1"
+    assert validated == ["1"]
+
+
+def test_lint_rows_incremental_duplicate_ids(validators_folder, lint_index_folder):
+    df = pd.DataFrame(
+        {
+            "ID": ["1", "1", "2"],
+            "Date_onset": ["2024-13-02", "2024-01-02", "2024-01-03"],
+        }
+    )
+    error = RowError("1", "Date_onset", "2024-13-02", "data.Date_onset must be date")
+    assert lint_rows("test", df, SCHEMA) == [error]
+    # errors are reused by row, not by ID
+    assert lint_rows("test", df.iloc[::-1], SCHEMA) == [error]
+    fixed = df.copy()
+    fixed.loc[0, "Date_onset"] = "2024-01-01"
+    assert lint_rows("test", fixed, SCHEMA) == []
+    assert lint_rows("test", df, SCHEMA) == [error]
+
+
+def test_aggregate_errors():
+    errors = [
+        RowError(
+            str(i), "Date_onset", f"2024-13-{i:02d}", "data.Date_onset must be date"
+        )
+        for i in range(1000)
+    ]
+    errors.insert(
+        10, RowError("x", "Age", "-1", "data.Age must be bigger than or equal to 0")
+    )
+    date_errors, age_errors = aggregate_errors(errors, max_examples=3)
+    assert (date_errors.count, date_errors.first_id, date_errors.last_id) == (
+        1000,
+        "0",
+        "999",
+    )
+    assert len(date_errors.examples) == 3
+    assert all(value == f"2024-13-{int(id):02d}" for id, value in date_errors.examples)
+    assert (age_errors.count, age_errors.examples) == (1, [("x", "-1")])
+
+    result = LintResult("test", "schema.json", False, [date_errors, age_errors])
+    assert result.n_errors == 1001
+    assert (
+        str(result).splitlines()[1]
+        == "- Age: data.Age must be bigger than or equal to 0 (1 row), e.g. ID x found=-1"
+    )
+    assert "<td>1000</td>" in result.as_html()
+    assert json.loads(result.as_json())["n_errors"] == 1001
+
+
+def test_write_ndjson():
+    errors = [RowError("2", "Date_onset", "2024-13-02", "data.Date_onset must be date")]
+    buf = io.StringIO()
+    assert list(write_ndjson(errors, buf)) == errors
+    assert json.loads(buf.getvalue()) == errors[0]._asdict()
+
+
+def test_lint_rules():
+    df = pd.DataFrame(
+        {
+            "ID": ["1", "2", "1", "3", "5", "4"],
+            "Date_onset": [
+                "2024-01-02",
+                "2024-01-05",
+                "2024-01-03",
+                "2024-01-01",
+                None,
+                "2024-02",
+            ],
+            "Date_death": [
+                "2024-01-01",
+                "2024-01-05",
+                None,
+                "2023-12-31",
+                "2024-01-01",
+                "2024-01-31",
+            ],
+            "Data_up_to": ["2024-01-10"] * 4 + ["2023-12-31", "2024-01-01"],
+        }
+    )
+    rules = parse_lint_rules(
+        [
+            {"rule": "unique", "columns": ["ID"]},
+            {
+                "rule": "date_order",
+                "columns": ["Date_onset", "Date_death", "Data_up_to"],
+            },
+        ]
+    )
+    assert rules[0] == LintRule("unique", ["ID"])
+    assert list(iter_rule_errors(df, rules)) == [
+        RowError("1", "ID", "1", "ID must be unique"),
+        RowError("1", "ID", "1", "ID must be unique"),
+        RowError(
+            "1", "Date_death", "2024-01-01", "Date_death must not be before Date_onset"
+        ),
+        RowError(
+            "3", "Date_death", "2023-12-31", "Date_death must not be before Date_onset"
+        ),
+        RowError(
+            "4", "Date_death", "2024-01-31", "Date_death must not be before Date_onset"
+        ),
+        RowError(
+            "5", "Data_up_to", "2023-12-31", "Data_up_to must not be before Date_death"
+        ),
+        RowError(
+            "4", "Data_up_to", "2024-01-01", "Data_up_to must not be before Date_onset"
+        ),
+    ]
+    assert list(iter_rule_errors(df, rules, ignore_fields=["Date_death"])) == [
+        RowError("1", "ID", "1", "ID must be unique"),
+        RowError("1", "ID", "1", "ID must be unique"),
+    ]
+    # missing values are not duplicates
+    assert (
+        list(iter_rule_errors(pd.DataFrame({"ID": ["1", None, None]}), rules[:1])) == []
+    )
+    with pytest.raises(ValueError, match="not present in data"):
+        list(iter_rule_errors(df[["ID"]], rules))
+    with pytest.raises(ValueError, match="Unknown lint rule"):
+        parse_lint_rules([{"rule": "sorted", "columns": ["ID"]}])
+
+
+def test_outbreak_lint_rules(tmp_path, validators_folder, lint_index_folder):
+    (schema_file := tmp_path / "schema.json").write_text(json.dumps(SCHEMA))
+    (data_file := tmp_path / "data.csv").write_text(
+        "ID,Date_onset\n1,2024-01-02\n2,2024-13-02\n1,\n"
+    )
+    metadata = {attr: "test" for attr in REQUIRED_OUTBREAK_ATTRIBUTES}
+    metadata |= {
+        "schema": str(schema_file),
+        "url": str(data_file),
+        "lint_rules": [{"rule": "unique", "columns": ["ID"]}],
+    }
+    (config := tmp_path / "test.yml").write_text(yaml.safe_dump(metadata))
+    result = Outbreak(config).lint()
+    assert not result.ok
+    assert [(g.column, g.message, g.count) for g in result.groups] == [
+        ("ID", "ID must be unique", 2),
+        ("Date_onset", "data.Date_onset must be date", 1),
+    ]
+    # rules are checked on all rows, not only rows changed since the last lint
+    assert Outbreak(config).lint().n_errors == 3
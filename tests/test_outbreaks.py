@@ -0,0 +1,167 @@
+import datetime
+from pathlib import Path
+
+import yaml
+import pytest
+import chevron
+import pandas as pd
+
+from olm.diff import get_changes
+from olm.plots import image_wordcloud
+from olm.registry import REQUIRED_OUTBREAK_ATTRIBUTES
+from olm.outbreaks import TEMPLATES, Outbreak, render_static_figure, render_template
+from olm.outbreaks.avian_influenza import table_avian_influenza_exposure
+from olm.util import read_csv
+
+EXPOSURE_DATA = pd.DataFrame(
+    {
+        "Case_status": ["confirmed"] * 5 + ["probable"],
+        "Location_Admin1": ["Ohio", "Ohio", "Texas", "Ohio", "Texas", "Ohio"],
+        "Contact_animal": [
+            "COMMERCIAL",
+            "COMMERCIAL",
+            "BACKYARD",
+            None,
+            "COMMERCIAL",
+            None,
+        ],
+        "Contact_animal_species": ["Cow", "Poultry", "Poultry", None, "Cow", None],
+    }
+)
+
+
+def test_render_static_figure_image():
+    image = image_wordcloud(None, {"fever": 3, "cough": 1})
+    assert render_static_figure(image, "wordcloud")["wordcloud"].startswith(
+        '<img class="static-figure" alt="wordcloud" src="data:image/png;base64,'
+    )
+
+
+def test_static_header_omits_plotly():
+    header = (TEMPLATES / "_header.html").read_text()
+    assert "cdn.plot.ly" in chevron.render(header, {"static": False})
+    assert "cdn.plot.ly" not in chevron.render(header, {"static": True})
+
+
+@pytest.mark.parametrize(
+    "outbreak", sorted(t.stem for t in TEMPLATES.glob("[!_]*.html"))
+)
+def test_static_report_has_no_scripts(outbreak):
+    assert "<script" not in "".join(render_template(outbreak, {"static": True}))
+
+
+def test_avian_influenza_new_case_images():
+    previous = read_csv(Path(__file__).with_name("test_data.csv"))
+    # a probable case is removed, and another is confirmed
+    current = previous[previous.ID != "2"].copy()
+    current.loc[current.ID == "5", "Case_status"] = "confirmed"
+    changes = get_changes(current, previous)
+    assert changes["n_new_probable"] == -2
+    report = "".join(render_template("avian-influenza", {"static": True, **changes}))
+    assert 'src="images/confirmed_new.png"' in report
+    assert 'src="images/probable.png"' in report
+    assert 'src="images/dead.png"' in report
+
+
+def test_table_avian_influenza_exposure():
+    table = table_avian_influenza_exposure(
+        EXPOSURE_DATA, "confirmed", "Location_Admin1", "State", {"Texas": 1}
+    )
+    assert table.to_dict("list") == {
+        "State": ["Ohio", "Texas"],
+        "Exposure from Commercial Cattle": [1, 1],
+        "Exposure from Commercial Poultry": [1, 0],
+        "Other Animal Exposure": [0, 1],
+        "Exposure Source Unknown": [1, 0],
+        "Total": [3, 2],
+        "Change Since Last Report": [0, 1],
+    }
+
+
+def test_secondary_datasets(tmp_path):
+    # one row was removed since the previous dataset, and five added
+    (previous := tmp_path / "previous_status.csv").write_text(
+        "ID,Country,Case_status\n"
+        "1,Antarctica,confirmed\n"
+        "2,Antarctica,suspected\n"
+        "3,Atlantis,confirmed\n"
+        "9,Midgard,confirmed\n"
+    )
+    metadata = {attr: "test" for attr in REQUIRED_OUTBREAK_ATTRIBUTES}
+    metadata["url"] = str(Path(__file__).with_name("test_data.csv"))
+    metadata["datasets"] = {
+        "status": str(Path(__file__).with_name("test_status_data.csv")),
+        "previous_status": str(previous),
+    }
+    metadata["plots"] = {
+        "data/status_counts/get_dataset_counts": {
+            "dataset": "status",
+            "prefix": "status",
+            "location_col": "Country",
+            "location_name": "countries",
+            "datasets": {"previous": "previous_status"},
+        }
+    }
+    (config := tmp_path / "test.yml").write_text(yaml.safe_dump(metadata))
+    outbreak = Outbreak(config)
+    assert outbreak.plot_datasets() == ["previous_status", "status"]
+    outbreak.load(outbreak.plot_datasets())
+    assert outbreak.build_plot(
+        "data/status_counts/get_dataset_counts", outbreak.data
+    ) == {
+        "n_status_cases": len(outbreak.datasets["status"]),
+        "n_status_countries_affected": 4,
+        "n_new_status_cases": 5,
+        "has_new_status_cases": True,
+    }
+
+
+def test_dataset_as_of(tmp_path):
+    (snapshots := tmp_path / "snapshots").mkdir()
+    data = pd.read_csv(Path(__file__).with_name("test_data.csv"), dtype=str)
+    data.to_csv(snapshots / "2024-01-01.csv", index=False)
+    data.head(3).to_csv(snapshots / "2024-01-08.csv", index=False)
+    metadata = {attr: "test" for attr in REQUIRED_OUTBREAK_ATTRIBUTES}
+    metadata["url"] = str(snapshots / "2024-01-08.csv")
+    metadata["datasets"] = {
+        "previous": {
+            "url": metadata["url"],
+            "snapshots": str(snapshots),
+            "as_of": "-1w",
+        }
+    }
+    metadata["plots"] = {"data/get_changes": {"datasets": {"previous": "previous"}}}
+    (config := tmp_path / "test.yml").write_text(yaml.safe_dump(metadata))
+    outbreak = Outbreak(config)
+    # the previous dataset is the snapshot a week before the report date
+    outbreak.date = datetime.date(2024, 1, 10)
+    changes = outbreak.build_plot("data/get_changes", outbreak.data)
+    assert (changes["n_rows_added"], changes["n_rows_removed"]) == (0, len(data) - 3)
+    outbreak.date = datetime.date(2024, 1, 15)
+    changes = outbreak.build_plot("data/get_changes", outbreak.data)
+    assert (changes["n_rows_added"], changes["n_rows_removed"]) == (0, 0)
+
+    # entries using a dataset without a snapshot are left out
+    outbreak.date = datetime.date(2024, 1, 5)
+    assert outbreak.build_plot("data/get_changes", outbreak.data) == {}
+    outbreak.snapshot_datasets, outbreak.dataset_urls = True, {}
+    with pytest.raises(ValueError, match="No snapshot"):
+        outbreak.build_plot("data/get_changes", outbreak.data)
+
+    metadata["datasets"]["previous"]["as_of"] = "2024-01-01"
+    config.write_text(yaml.safe_dump(metadata))
+    with pytest.raises(ValueError, match="Invalid as_of offset"):
+        Outbreak(config)
+
+
+def test_render_template():
+    template = "".join(
+        (TEMPLATES / f).read_text()
+        for f in ["_header.html", "marburg.html", "_footer.html"]
+    )
+    var = {
+        "description": "Marburg",
+        "epicurve": "<div>epicurve</div>",
+        "archives": [{"link": "2023-04-04.html", "text": "2023-04-04"}],
+    }
+    assert "".join(render_template("marburg", var)) == chevron.render(template, var)
@@ -1,19 +1,37 @@
+import concurrent.futures
 from pathlib import Path
 
 import pytest
+import numpy as np
 import pandas as pd
+import plotly.io
+import plotly.graph_objects as go
 
 from olm.plots import (
     get_epicurve,
     get_aggregate,
     get_delays,
+    get_delay_distributions,
     get_counts,
     get_age_bin_data,
     get_timeseries_location_status,
     get_countries_with_status,
     get_countries_with_anyof_statuses,
-    get_trailing_case_count
+    get_trailing_case_count,
+    get_term_frequencies,
+    lttb,
+    wordcloud_png,
+    plot_epicurve,
+    plot_age_gender,
+    plot_data_availability,
+    plot_delay_distribution,
+    stacked_barchart,
 )
+from olm.figures import TEMPLATE, to_array
+from olm.outbreaks import render_figure
+from olm.summary import get_summary_table, stored_summary_table, summary_counts
+import olm.plots
+import olm.profile
 from olm.util import read_csv
 
 DATA = read_csv(
@@ -47,6 +65,16 @@ def test_get_delays(target_column, expected_delay_series, onset_column):
     assert list(get_delays(DATA, target_column, onset_column).dt.days) == expected_delay_series
 
 
+def test_get_delay_distributions():
+    distributions = get_delay_distributions(
+        DATA, ["Date_death", "Date_of_first_consult"], max_delay_days=7
+    )
+    death = distributions["Date_death"]
+    assert (death.n, death.median, death.iqr, death.n_beyond_max) == (4, 6, 1, 1)
+    assert death.histogram.to_dict() == {4: 1, 6: 2, 7: 0, 8: 1}
+    assert distributions["Date_of_first_consult"].quantiles[0.5] == 4
+
+
 def test_aggregate():
     assert get_aggregate(
         DATA, "Country", [("Case_status", "confirmed"), ("Outcome", "death")]
@@ -105,6 +133,38 @@ def test_get_epicurve():
     )
 
 
+def test_get_epicurve_resample():
+    epicurve = get_epicurve(
+        DATA,
+        "Date_onset",
+        "Case_status",
+        ["confirmed", "probable"],
+        cumulative=False,
+        resample="epiweek",
+    )
+    # epidemiological weeks start on Sunday
+    assert list(epicurve.index.strftime("%Y-%m-%d")) == [
+        "2023-01-01",
+        "2023-01-08",
+        "2023-02-05",
+        "2023-02-19",
+        "2023-03-05",
+        "2023-03-26",
+    ]
+    assert epicurve.sum().to_dict() == {"confirmed": 5, "probable": 2}
+
+
+def test_lttb():
+    x = np.arange(1000)
+    y = np.where(x < 500, x, 500)
+    indices = lttb(x, y, 10)
+    assert len(indices) == 10
+    assert (indices[0], indices[-1]) == (0, 999)
+    # the corner of the curve is kept
+    assert 499 in indices or 500 in indices
+    assert list(lttb(x[:5], y[:5], 10)) == [0, 1, 2, 3, 4]
+
+
 def test_get_counts():
     assert get_counts(DATA, date_col="Data_up_to") == {
         "n_confirmed": 5,
@@ -116,6 +176,91 @@ def test_get_counts():
     }
 
 
+def test_get_counts_states_farm_workers():
+    df = DATA.assign(
+        Location_Admin1=["Ohio", "Ohio", None, "Texas"] + [None] * (len(DATA) - 4),
+        Occupation=["Farm worker", "dairy farm worker"] + [None] * (len(DATA) - 2),
+    )
+    counts = get_counts(df, date_col="Data_up_to")
+    # n_unique_states is a tuple, see get_counts()
+    assert counts["n_unique_states"] == (2,)
+    assert counts["n_farm_workers_infected"] == 1
+    assert get_summary_table(df) is get_summary_table(df, ["Country"])
+
+
+def test_get_counts_after_other_views():
+    df = DATA.copy()
+    # a table without flags has Case_status and Outcome, but not the flags get_counts() uses
+    summary_counts(df, ["Case_status", "Outcome", "Date_onset"])
+    assert get_counts(df, date_col="Data_up_to") == get_counts(
+        DATA.copy(), date_col="Data_up_to"
+    )
+
+
+def test_summary_table_stored(summary_cache, monkeypatch):
+    df = DATA.copy()
+    table = get_summary_table(df, ["Date_onset", "Case_status"])
+    assert list(table.columns) == ["Date_onset", "Case_status", "n"]
+    assert get_summary_table(df, ["Case_status", "Date_onset"]) is table
+    assert len(list(summary_cache.glob("*.parquet"))) == 1
+
+    def fail(*args):
+        raise AssertionError("summary table should be read from the cache")
+
+    monkeypatch.setattr(olm.summary, "summary_table", fail)
+    pd.testing.assert_frame_equal(
+        get_summary_table(DATA.copy(), ["Date_onset", "Case_status"]), table
+    )
+
+
+def test_summary_table_stored_by_threads(summary_cache):
+    # threads building reports for the same data write the same file
+    with concurrent.futures.ThreadPoolExecutor(8) as executor:
+        tables = list(
+            executor.map(
+                lambda _: stored_summary_table(DATA, ["Case_status", "Outcome"]),
+                range(16),
+            )
+        )
+    assert all(t.equals(tables[0]) for t in tables)
+    assert [f.suffix for f in summary_cache.iterdir()] == [".parquet"]
+
+
+def test_summary_views_match_rows():
+    rng = np.random.default_rng(1)
+    n = 2000
+    df = pd.DataFrame(
+        {
+            "Case_status": pd.Series(
+                rng.choice(["confirmed", "probable", "suspected"], n)
+            ).mask(rng.random(n) < 0.1),
+            "Date_onset": pd.Series(
+                pd.to_datetime("2024-01-01")
+                + pd.to_timedelta(rng.integers(0, 60, n), "D")
+            ).mask(rng.random(n) < 0.2),
+        }
+    )
+    expected = (
+        df[df.Date_onset.notna() & df.Case_status.isin(["confirmed", "probable"])]
+        .groupby(["Date_onset", "Case_status"])
+        .size()
+        .unstack(fill_value=0)
+    )
+    pd.testing.assert_frame_equal(
+        get_epicurve(
+            df, "Date_onset", "Case_status", ["confirmed", "probable"], cumulative=False
+        ),
+        expected,
+        check_names=False,
+        check_dtype=False,
+    )
+    trailing = get_trailing_case_count(df, "Date_onset", 1)
+    assert trailing == {
+        d.strftime("%Y-%m-%d"): n
+        for d, n in df.Date_onset.value_counts().sort_index().items()
+    }
+
+
 def test_get_timeseries_location_status():
     data = DATA.rename(columns={"Date_onset": "Date_onset_estimated"})
     assert (
@@ -174,3 +319,101 @@ def test_get_trailing_case_count():
         '2023-04-03': 1,
         '2023-04-04': 1
     }
+
+
+def test_get_term_frequencies():
+    df = pd.DataFrame(
+        {
+            "Symptoms": [
+                "Fever, cough",
+                "fever;Pink eye, conjunctivitis",
+                None,
+                "",
+                " Sore throat , fever ,fever",
+            ]
+        }
+    )
+    synonyms = {"pink_eye_conjunctivitis": ["pink eye", "conjunctivitis"]}
+    terms = get_term_frequencies(df, "Symptoms", synonyms)
+    assert terms.counts == {
+        "fever": 3,
+        "cough": 1,
+        "pink_eye_conjunctivitis": 1,
+        "sore_throat": 1,
+    }
+    assert terms.total_entry_count == 3
+    assert get_term_frequencies(df, "Symptoms", synonyms) is terms
+
+
+def test_wordcloud_png_cached(tmp_path, monkeypatch):
+    monkeypatch.setattr(olm.plots, "WORDCLOUD_CACHE_FOLDER", tmp_path)
+    png = wordcloud_png({"fever": 3, "cough": 1})
+    assert png.startswith(b"\x89PNG")
+    assert len(list(tmp_path.glob("*.png"))) == 1
+    assert wordcloud_png({"cough": 1, "fever": 3}) == png
+
+
+def test_wordcloud_png_by_threads(tmp_path, monkeypatch):
+    monkeypatch.setattr(olm.plots, "WORDCLOUD_CACHE_FOLDER", tmp_path)
+    with concurrent.futures.ThreadPoolExecutor(4) as executor:
+        pngs = list(
+            executor.map(lambda _: wordcloud_png({"fever": 3, "cough": 1}), range(4))
+        )
+    assert [f.suffix for f in tmp_path.iterdir()] == [".png"]
+    assert next(tmp_path.iterdir()).read_bytes() in pngs
+
+
+@pytest.mark.parametrize(
+    "plot,kwargs",
+    [
+        (
+            plot_epicurve,
+            {"title": "Onset", "date_col": "Date_onset", "groupby_col": "Case_status"},
+        ),
+        (plot_age_gender, {}),
+        (plot_data_availability, {}),
+        (
+            plot_delay_distribution,
+            {"col": "Date_death", "title": "Delay to death", "index": "A"},
+        ),
+        (
+            stacked_barchart,
+            {
+                "y_axis": "Age",
+                "color_column": "Gender",
+                "x_label": "Count",
+                "y_label": "Age",
+            },
+        ),
+    ],
+)
+def test_figure_specifications(plot, kwargs, tmp_path, monkeypatch):
+    monkeypatch.setattr(olm.profile, "PROFILE_CACHE_FOLDER", tmp_path)
+    fig = plot(DATA, **kwargs)
+    # specifications are valid plotly figures, with the olm template
+    validated = go.Figure(fig)
+    assert (
+        validated.layout.template.layout.plot_bgcolor
+        == plotly.io.templates[TEMPLATE].layout.plot_bgcolor
+    )
+    assert "Plotly.newPlot" in render_figure(fig, "figure")["figure"]
+
+
+def test_stacked_barchart_counts():
+    df = pd.DataFrame(
+        {"Age": ["a", "b", "a", "c", "a"], "Gender": ["f", None, "m", "m", "f"]}
+    )
+    fig = stacked_barchart(df, "Age", "Gender", "Count", "Age")
+    assert [(t["name"], list(t["y"]), list(t["x"])) for t in fig["data"]] == [
+        ("f", ["a"], [2]),
+        ("m", ["a", "c"], [1, 1]),
+    ]
+
+
+def test_to_array():
+    assert to_array(pd.Series(pd.to_datetime(["2024-01-02", None]))) == [
+        "2024-01-02",
+        None,
+    ]
+    assert to_array(pd.to_datetime(["2024-01-02 10:00"])) == ["2024-01-02T10:00:00"]
+    assert to_array(pd.Series(["a", None], dtype=object)) == ["a", None]
@@ -0,0 +1,113 @@
+import concurrent.futures
+
+import pytest
+
+import olm.profile
+from olm.profile import profile, get_profile, get_data_profile, data_hash
+from olm.types import ColumnProfile
+from olm.util import read_csv
+
+CSV = """ID,Case_status,Date_onset,Occupation
+1,confirmed,2024-01-02,N/K
+2,confirmed,2024-01-05,farm worker
+3,probable,unknown,NK
+4,confirmed,,farm worker
+5,N/K,2024-01-05,
+"""
+
+
+@pytest.fixture
+def linelist(tmp_path):
+    (file := tmp_path / "linelist.csv").write_text(CSV)
+    return file
+
+
+@pytest.fixture(autouse=True)
+def profile_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(olm.profile, "PROFILE_CACHE_FOLDER", tmp_path / "profiles")
+    return tmp_path / "profiles"
+
+
+def test_profile(linelist):
+    df = read_csv(linelist)
+    assert df.Occupation.isna().sum() == 3
+    result = profile(df, top_values=2)
+    assert result.n_rows == 5
+    columns = {c.column: c for c in result.columns}
+    assert columns["Case_status"] == ColumnProfile(
+        "Case_status",
+        count=4,
+        missing=1,
+        distinct=2,
+        top_values=[("confirmed", 3), ("probable", 1)],
+        na_markers=1,
+    )
+    assert columns["Date_onset"] == ColumnProfile(
+        "Date_onset",
+        count=3,
+        missing=2,
+        distinct=2,
+        top_values=[("2024-01-05", 2), ("2024-01-02", 1)],
+        invalid_dates=1,
+    )
+    assert columns["Occupation"].na_markers == 2
+    assert columns["Occupation"].completeness == 0.4
+
+
+def test_profile_unconverted_dates(linelist):
+    columns = {
+        c.column: c for c in profile(read_csv(linelist, convert_dates=False)).columns
+    }
+    assert columns["Date_onset"].invalid_dates == 1
+    assert columns["Date_onset"].count == 4
+    # read statistics do not describe subsets of the linelist
+    assert profile(read_csv(linelist).head(2)).columns[1].na_markers == 0
+
+
+def test_get_profile_cached_by_hash(linelist, profile_cache, monkeypatch):
+    df = read_csv(linelist)
+    result = get_profile(df)
+    assert len(list(profile_cache.glob("*.json"))) == 1
+    assert get_profile(df) is result
+
+    def fail(*args):
+        raise AssertionError("profile should be read from the cache")
+
+    monkeypatch.setattr(olm.profile, "profile", fail)
+    assert get_profile(read_csv(linelist)) == result
+
+
+def test_get_profile_by_threads(linelist, profile_cache):
+    # threads building reports for the same data write the same file
+    with concurrent.futures.ThreadPoolExecutor(8) as executor:
+        results = list(
+            executor.map(lambda _: get_profile(read_csv(linelist)), range(16))
+        )
+    assert all(r == results[0] for r in results)
+    assert [f.suffix for f in profile_cache.iterdir()] == [".json"]
+
+
+def test_data_hash(linelist):
+    df = read_csv(linelist)
+    assert data_hash(df) == data_hash(read_csv(linelist))
+    changed = df.copy()
+    changed.loc[4, "Case_status"] = "probable"
+    assert data_hash(changed) != data_hash(df)
+    assert data_hash(df.iloc[1:]) != data_hash(df.iloc[:-1])
+
+
+def test_get_data_profile(linelist):
+    var = get_data_profile(read_csv(linelist))
+    assert var["profile_n_rows"] == 5
+    assert var["profile_pc_complete"] == 70.0
+    assert var["profile_columns"][1] | {"top_values": None} == {
+        "column": "Case_status",
+        "count": 4,
+        "missing": 1,
+        "pc_complete": 80.0,
+        "distinct": 2,
+        "na_markers": 1,
+        "invalid_dates": 0,
+        "top_values": None,
+    }
+    assert var["profile_columns"][1]["top_values"] == "confirmed (3), probable (1)"
@@ -0,0 +1,159 @@
+import re
+import gzip
+import threading
+from pathlib import Path
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+import numpy as np
+import pandas as pd
+
+import olm.readers
+import olm.download
+from olm.readers import read_pandas, read_chunked, chunk_offsets, detect_format
+from olm.util import read_csv
+
+DATA = Path(__file__).with_name("test_data.csv")
+
+CSV_QUOTED = """ID,Notes,Age
+1,"fever, ""rash""
+and cough",N/K
+2,,NA
+3,"NK",30
+4,plain,null
+"""
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(olm.readers, "CHUNK_SIZE", 8)
+
+
+def test_arrow_reader_parity(tmp_path):
+    pytest.importorskip("pyarrow")
+    pd.testing.assert_frame_equal(read_csv(DATA, reader="arrow"), read_csv(DATA))
+    (quoted := tmp_path / "quoted.csv").write_text(CSV_QUOTED)
+    pd.testing.assert_frame_equal(olm.readers.read_arrow(quoted), read_pandas(quoted))
+
+
+def test_chunked_reader_parity(tmp_path, small_chunks):
+    pd.testing.assert_frame_equal(read_csv(DATA, reader="chunked"), read_csv(DATA))
+    (quoted := tmp_path / "quoted.csv").write_text(CSV_QUOTED)
+    # chunks do not end inside the quoted line break
+    assert all(
+        start != CSV_QUOTED.index("and cough") for start, _ in chunk_offsets(quoted, 8)
+    )
+    pd.testing.assert_frame_equal(
+        read_chunked(quoted, processes=2), read_pandas(quoted)
+    )
+
+
+def test_unknown_reader():
+    with pytest.raises(ValueError, match="Unknown CSV reader"):
+        read_csv(DATA, reader="fast")
+
+
+class FileRangeHandler(BaseHTTPRequestHandler):
+    "Serves files from the server folder, with range requests"
+
+    def log_message(self, *args):
+        pass
+
+    def send_file(self) -> bytes:
+        body = (self.server.folder / self.path.lstrip("/")).read_bytes()
+        start, end = 0, len(body) - 1
+        if match := re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", "")):
+            start, end = int(match[1]), int(match[2] or end)
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(body)}")
+        else:
+            self.send_response(200)
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Type", "application/vnd.apache.parquet")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        return body[start : end + 1]
+
+    def do_HEAD(self):
+        self.send_file()
+
+    def do_GET(self):
+        self.wfile.write(self.send_file())
+
+
+@pytest.fixture
+def server_folder(tmp_path):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FileRangeHandler)
+    server.folder = tmp_path
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield tmp_path, f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def test_detect_format():
+    assert detect_format("data/latest.csv") == ("csv", None)
+    assert detect_format("https://example.org/latest.csv.gz") == ("csv", "gzip")
+    assert detect_format("file:///data/latest.CSV.ZST") == ("csv", "zstd")
+    assert detect_format("s3://bucket/latest.parquet?versionId=1") == ("parquet", None)
+
+
+@pytest.mark.parametrize("reader", ["pandas", "arrow", "chunked"])
+def test_read_gzip(tmp_path, reader):
+    if reader == "arrow":
+        pytest.importorskip("pyarrow")
+    (file := tmp_path / "data.csv.gz").write_bytes(gzip.compress(DATA.read_bytes()))
+    pd.testing.assert_frame_equal(read_csv(file, reader=reader), read_csv(DATA))
+    pd.testing.assert_frame_equal(
+        read_csv(file, reader=reader, columns=["ID", "Case_status"]),
+        read_csv(DATA)[["ID", "Case_status"]],
+    )
+
+
+def test_read_zstd(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    with pa.CompressedOutputStream(
+        str(file := tmp_path / "data.csv.zst"), "zstd"
+    ) as out:
+        out.write(DATA.read_bytes())
+    # falls back to the arrow reader if zstandard is not installed
+    pd.testing.assert_frame_equal(read_csv(file), read_csv(DATA))
+
+
+def test_read_parquet_remote(server_folder):
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+
+    folder, url = server_folder
+    rng = np.random.default_rng(0)
+    n = 20000
+    large = pd.DataFrame(
+        {
+            "ID": [str(i) for i in range(n)],
+            "Case_status": rng.choice(["confirmed", "probable", "suspected"], n),
+            "Notes": [f"{x:016x}" for x in rng.integers(0, 2**63, n)],
+        }
+    ).astype(str)
+    pq.write_table(
+        pa.Table.from_pandas(large, preserve_index=False),
+        folder / "data.parquet",
+        row_group_size=n // 10,
+    )
+    # served without an extension, so the format is detected from the Content-Type
+    (folder / "latest").write_bytes((folder / "data.parquet").read_bytes())
+
+    pd.testing.assert_frame_equal(read_csv(f"{url}/latest", convert_dates=False), large)
+
+    source = olm.download.HTTPRangeFile(f"{url}/data.parquet")
+    result = pq.read_table(source, columns=["ID", "Case_status"])
+    assert source.bytes_fetched < source.size / 2
+    assert result.num_rows == len(large)
+
+    selected = read_csv(
+        f"{url}/data.parquet",
+        columns=["ID", "Case_status"],
+        filters=[["Case_status", "==", "confirmed"]],
+    )
+    expected = large.loc[
+        large.Case_status == "confirmed", ["ID", "Case_status"]
+    ].reset_index(drop=True)
+    pd.testing.assert_frame_equal(selected, expected)
@@ -0,0 +1,23 @@
+import pytest
+import yaml
+
+from olm.registry import read_metadata, REQUIRED_OUTBREAK_ATTRIBUTES
+
+METADATA = {attr: "test" for attr in REQUIRED_OUTBREAK_ATTRIBUTES}
+
+
+def test_read_metadata(tmp_path, monkeypatch):
+    (config := tmp_path / "test.yml").write_text(yaml.safe_dump(METADATA))
+    assert read_metadata(config) == METADATA
+    # cached, and changes to a result do not change the cache
+    monkeypatch.setattr(
+        yaml, "safe_load", lambda _: pytest.fail("configuration parsed again")
+    )
+    read_metadata(config)["plots"] = {}
+    assert read_metadata(config) == METADATA
+
+
+def test_read_metadata_missing_attributes(tmp_path):
+    (config := tmp_path / "test.yml").write_text(yaml.safe_dump({"id": "test"}))
+    with pytest.raises(ValueError, match="missing: description"):
+        read_metadata(config)
@@ -0,0 +1,160 @@
+import os
+import gzip
+import asyncio
+from pathlib import Path
+
+import yaml
+
+from olm.outbreaks import Outbreak
+from olm.registry import REQUIRED_OUTBREAK_ATTRIBUTES
+from olm.serve import LRUCache, ReportServer
+
+DATA = Path(__file__).with_name("test_data.csv")
+STATUS = Path(__file__).with_name("test_status_data.csv")
+
+
+def write_config(config: Path, title: str):
+    metadata = {attr: "test" for attr in REQUIRED_OUTBREAK_ATTRIBUTES}
+    metadata["datasets"] = {"status": str(config.with_name("status.csv"))}
+    metadata["plots"] = {
+        "data/get_counts": {"date_col": "Date_onset"},
+        "figure/epicurve": {
+            "title": title,
+            "date_col": "Date_onset",
+            "groupby_col": "Case_status",
+        },
+        "data/status_counts/get_dataset_counts": {
+            "dataset": "status",
+            "prefix": "status",
+        },
+    }
+    config.write_text(yaml.safe_dump(metadata))
+
+
+async def get(
+    port: int, path: str, headers: dict[str, str] = {}
+) -> tuple[int, dict[str, str], bytes]:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    request = f"GET {path} HTTP/1.1\r\nHost: localhost\r\n" + "".join(
+        f"{k}: {v}\r\n" for k, v in headers.items()
+    )
+    writer.write(request.encode("latin-1") + b"\r\n")
+    head, _, body = (await reader.read()).partition(b"\r\n\r\n")
+    writer.close()
+    status, *lines = head.decode("latin-1").split("\r\n")
+    return int(status.split()[1]), dict(line.split(": ", 1) for line in lines), body
+
+
+def test_lru_cache():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert "b" not in cache
+    assert (cache.get("a"), cache.get("c"), len(cache)) == (1, 3, 2)
+
+
+def test_report_server(tmp_path, monkeypatch):
+    # uses the marburg report template
+    write_config(config := tmp_path / "marburg.yml", "Date of onset")
+    (status_file := tmp_path / "status.csv").write_text(STATUS.read_text())
+    built, reads = [], []
+    build_plot, read = Outbreak.build_plot, Outbreak.read
+    monkeypatch.setattr(
+        Outbreak,
+        "build_plot",
+        lambda self, plot, df: built.append(plot) or build_plot(self, plot, df),
+    )
+    monkeypatch.setattr(
+        Outbreak, "read", lambda self: reads.append(self.url) or read(self)
+    )
+    url = f"/marburg?data={DATA.as_uri()}&date=2024-01-02"
+
+    async def main():
+        server = ReportServer(tmp_path, data_folders=[DATA.parent])
+        async with await asyncio.start_server(
+            server.handle, "127.0.0.1", 0
+        ) as http_server:
+            port = http_server.sockets[0].getsockname()[1]
+            # concurrent requests share a single build
+            responses = await asyncio.gather(
+                *(
+                    get(port, url, {"Accept-Encoding": "gzip, deflate"})
+                    for _ in range(3)
+                )
+            )
+            assert sorted(built) == [
+                "data/get_counts",
+                "data/status_counts/get_dataset_counts",
+                "figure/epicurve",
+            ]
+            assert reads == [DATA.as_uri()]
+            status, headers, body = responses[0]
+            assert status == 200 and headers["Content-Encoding"] == "gzip"
+            assert all(r[2] == body for r in responses)
+            assert "Date of onset" in gzip.decompress(body).decode("utf-8")
+
+            status, headers, plain = await get(port, url)
+            assert "Content-Encoding" not in headers and plain == gzip.decompress(body)
+            assert (await get(port, url, {"If-None-Match": headers["ETag"]}))[:1] == (
+                304,
+            )
+
+            # only the plot entry whose configuration changed is built again
+            write_config(config, "Date of symptom onset")
+            os.utime(config, ns=(0, config.stat().st_mtime_ns + 1))
+            status, _, plain = await get(port, url)
+            assert status == 200 and "Date of symptom onset" in plain.decode("utf-8")
+            assert built[3:] == ["figure/epicurve"] and len(reads) == 1
+
+            # secondary datasets are read again when they change
+            status_file.write_text(STATUS.read_text() + "99,Antarctica,confirmed\n")
+            os.utime(status_file, ns=(0, status_file.stat().st_mtime_ns + 1))
+            assert (await get(port, url))[0] == 200
+            assert sorted(built[4:]) == [
+                "data/get_counts",
+                "data/status_counts/get_dataset_counts",
+                "figure/epicurve",
+            ]
+            n_status = len(STATUS.read_text().splitlines()) - 1
+            counts = [
+                f["n_status_cases"]
+                for f in server.fragments.items.values()
+                if "n_status_cases" in f
+            ]
+            assert counts == [n_status, n_status + 1]
+            # builds do not set data on the cached outbreaks
+            assert all(
+                "data" not in o.__dict__ for o in server.outbreaks.items.values()
+            )
+
+            assert (await get(port, "/"))[2].count(b"<li>") == 1
+            assert (await get(port, "/ebola"))[0] == 404
+            assert (await get(port, "/marburg?date=2024-13-01"))[0] == 400
+            assert (await get(port, "/marburg"))[0] == 400  # no data URL
+        server.close()
+
+    asyncio.run(main())
+
+
+def test_report_server_data_urls(tmp_path):
+    write_config(tmp_path / "marburg.yml", "Date of onset")
+    server = ReportServer(tmp_path, data_folders=[DATA.parent])
+    assert server.allows_data_url("https://example.com/latest.csv")
+    assert server.allows_data_url(DATA.as_uri())
+    assert server.allows_data_url(str(DATA))
+
+    async def main():
+        for data_url in [
+            "/etc/passwd",
+            "file:///etc/passwd",
+            f"file://{DATA.parent}/../../../etc/passwd",
+            str(tmp_path / "marburg.yml"),
+            "s3://bucket/latest.csv",
+        ]:
+            response = await server.respond("GET", f"/marburg?data={data_url}")
+            assert response.status == 403, data_url
+
+    asyncio.run(main())
+    server.close()
@@ -0,0 +1,78 @@
+import json
+from pathlib import Path
+
+import yaml
+import pytest
+import pandas as pd
+
+import olm.profile
+from olm.registry import REQUIRED_OUTBREAK_ATTRIBUTES
+from olm.util import read_csv, READ_STATS
+from olm.outbreaks import Outbreak
+
+pytest.importorskip("pyarrow")
+
+import pyarrow  # noqa: E402
+
+from olm.shared import ATTRS_KEY, shared_linelists, attach_linelist  # noqa: E402
+
+DATA = str(Path(__file__).with_name("test_data.csv"))
+
+PROFILE_CSV = """ID,Case_status,Date_onset,Occupation
+1,confirmed,2024-01-02,N/K
+2,confirmed,2024-01-05,farm worker
+3,probable,unknown,NK
+4,confirmed,,farm worker
+"""
+
+
+def test_attach_linelist():
+    df = read_csv(DATA)
+    with shared_linelists({"data": df}) as files:
+        attached = attach_linelist(files["data"])
+        pd.testing.assert_frame_equal(attached, df, check_dtype=False)
+        assert (attached.Case_status == "confirmed").sum() == (
+            df.Case_status == "confirmed"
+        ).sum()
+        assert attached.Date_onset.dtype == df.Date_onset.dtype
+        assert attached.attrs[READ_STATS] == df.attrs[READ_STATS]
+        # attrs are stored explicitly, not only in pyarrow's pandas metadata
+        schema = pyarrow.ipc.open_file(str(files["data"])).schema
+        assert json.loads(schema.metadata[ATTRS_KEY]) == df.attrs
+    assert not files["data"].exists()
+
+
+def test_build_plots_processes(tmp_path):
+    metadata = {attr: "test" for attr in REQUIRED_OUTBREAK_ATTRIBUTES}
+    metadata["url"] = DATA
+    metadata["plots"] = {
+        "data/get_counts": {"date_col": "Date_onset"},
+        "data/get_dataset_counts": {"dataset": "cases", "prefix": "n_cases"},
+        "table/aggregate/get_aggregate": {
+            "country_col": "Country",
+            "columns": [["Case_status", "confirmed"]],
+        },
+    }
+    metadata["datasets"] = {"cases": DATA}
+    (config := tmp_path / "test.yml").write_text(yaml.safe_dump(metadata))
+    outbreak = Outbreak(config)
+    outbreak.load(outbreak.plot_datasets())
+    assert list(outbreak.build_plots(outbreak.data, processes=2)) == list(
+        outbreak.build_plots(outbreak.data)
+    )
+
+
+def test_build_plots_processes_profile(tmp_path, monkeypatch):
+    monkeypatch.setattr(olm.profile, "PROFILE_CACHE_FOLDER", tmp_path / "profiles")
+    (data := tmp_path / "data.csv").write_text(PROFILE_CSV)
+    metadata = {attr: "test" for attr in REQUIRED_OUTBREAK_ATTRIBUTES}
+    metadata["url"] = str(data)
+    metadata["plots"] = {"data/get_data_profile": {}}
+    (config := tmp_path / "test.yml").write_text(yaml.safe_dump(metadata))
+    outbreak = Outbreak(config)
+    outbreak.load(outbreak.plot_datasets())
+    [shared] = outbreak.build_plots(outbreak.data, processes=2)
+    assert [shared] == list(outbreak.build_plots(outbreak.data))
+    columns = {c["column"]: c for c in shared["profile_columns"]}
+    assert columns["Occupation"]["na_markers"] == 2
+    assert columns["Date_onset"]["invalid_dates"] == 1
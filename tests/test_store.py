@@ -0,0 +1,73 @@
+import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from olm.backfill import local_snapshots
+from olm.store import SnapshotStore, row_hashes
+from olm.util import read_csv, read_raw, READ_STATS
+
+DATA = Path(__file__).with_name("test_data.csv")
+
+
+@pytest.fixture
+def linelist() -> pd.DataFrame:
+    return read_raw(str(DATA))
+
+
+def test_row_hashes():
+    df = pd.DataFrame(
+        {"a": ["1", "2", None, "1"], "b": ["x", "y", "", "x"]}, dtype=object
+    )
+    hi, lo = row_hashes(df)
+    assert hi[0] == hi[3] and lo[0] == lo[3]
+    assert len(set(zip(hi[:3], lo[:3]))) == 3
+    # independent of column order, but not of column names
+    assert (row_hashes(df[["b", "a"]])[0] == hi).all()
+    assert not (row_hashes(df.rename(columns={"a": "c"}))[0] == hi).any()
+    # missing values are not empty strings
+    assert row_hashes(df.fillna(""))[0][2] != hi[2]
+
+
+def test_snapshot_store(tmp_path, linelist):
+    store = SnapshotStore(tmp_path)
+    first = store.add(linelist.iloc[:-2], "2023-04-01", source=str(DATA))
+    assert first.n_new_rows == first.n_rows == len(linelist) - 2
+
+    changed = linelist.copy()
+    changed.loc[1, "Case_status"] = "confirmed"
+    second = store.add(changed, "2023-04-02")
+    # only the changed row and the rows added are stored again
+    assert second.n_new_rows == 3
+    assert second.runs == [(0, 0, 1), (1, 0, 1), (0, 2, len(linelist) - 2), (1, 1, 3)]
+    assert len(list(store.chunks_folder.glob("*.parquet"))) == 2
+    assert store.versions() == ["2023-04-01", "2023-04-02"]
+
+    pd.testing.assert_frame_equal(store.restore("2023-04-01"), linelist.iloc[:-2])
+    pd.testing.assert_frame_equal(store.restore("2023-04-02"), changed)
+    pd.testing.assert_frame_equal(
+        store.restore("2023-04-02", columns=["Case_status", "ID"]),
+        changed[["ID", "Case_status"]],
+    )
+    with pytest.raises(ValueError, match="already exists"):
+        store.add(changed, "2023-04-02")
+
+    # unchanged versions only add a manifest
+    assert store.add(changed, "2023-04-03").n_new_rows == 0
+    assert len(list(store.chunks_folder.glob("*.parquet"))) == 2
+
+
+def test_read_snapshot(tmp_path, linelist):
+    store = SnapshotStore(tmp_path)
+    store.add(linelist, "2023-04-01T120000Z")
+    df = read_csv(str(tmp_path / "2023-04-01T120000Z.snapshot"))
+    expected = read_csv(str(DATA))
+    pd.testing.assert_frame_equal(df, expected)
+    assert df.attrs[READ_STATS] == expected.attrs[READ_STATS]
+    assert np.issubdtype(df.Date_onset.dtype, np.datetime64)
+    # store folders can be used as backfill snapshots
+    assert local_snapshots(tmp_path) == {
+        datetime.date(2023, 4, 1): str(tmp_path / "2023-04-01T120000Z.snapshot")
+    }
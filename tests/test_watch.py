@@ -0,0 +1,76 @@
+import os
+import shutil
+from pathlib import Path
+
+import yaml
+
+from olm.registry import REQUIRED_OUTBREAK_ATTRIBUTES
+from olm.watch import ReportWatcher
+
+DATA = str(Path(__file__).with_name("test_data.csv"))
+
+
+def write_config(config: Path, title: str, **options):
+    metadata = {attr: "test" for attr in REQUIRED_OUTBREAK_ATTRIBUTES}
+    metadata["url"] = DATA
+    metadata["plots"] = {
+        "data/get_counts": {"date_col": "Date_onset"},
+        "figure/epicurve": {
+            "title": title,
+            "date_col": "Date_onset",
+            "groupby_col": "Case_status",
+        },
+    }
+    metadata.update(options)
+    config.write_text(yaml.safe_dump(metadata))
+
+
+def test_report_watcher(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    # uses the marburg report template
+    write_config(config := tmp_path / "marburg.yml", "Date of onset")
+    watcher = ReportWatcher(config)
+    assert watcher.build() == 2
+    assert not watcher.poll()
+    write_config(config, "Date of symptom onset")
+    watcher.config_mtime = 0
+    assert watcher.poll()
+    assert watcher.build() == 0
+    assert "Date of symptom onset" in (tmp_path / "marburg.html").read_text()
+
+    # changes to how the data is read read it again, and recompute all plots
+    data, fragments = watcher.outbreak.data, dict(watcher.fragments)
+    write_config(config, "Date of symptom onset", csv_reader="chunked")
+    watcher.config_mtime = 0
+    assert watcher.poll()
+    assert watcher.outbreak.reader == "chunked" and watcher.outbreak.data is not data
+    assert all(
+        watcher.fragments[plot] is not fragment for plot, fragment in fragments.items()
+    )
+
+
+def test_report_watcher_datasets(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    shutil.copy(DATA, cases := tmp_path / "cases.csv")
+    write_config(
+        config := tmp_path / "marburg.yml",
+        "Date of onset",
+        datasets={"cases": str(cases)},
+        plots={
+            "data/get_counts": {"date_col": "Date_onset"},
+            "data/get_dataset_counts": {"dataset": "cases", "prefix": "cases"},
+        },
+    )
+    watcher = ReportWatcher(config, data_interval=0)
+    assert watcher.build() == 2
+    assert not watcher.poll()
+    counts, dataset_counts = watcher.fragments.values()
+
+    # only plot entries using the changed dataset are recomputed
+    cases.write_text("".join(cases.read_text().splitlines(keepends=True)[:3]))
+    os.utime(cases, ns=(0, 0))
+    assert watcher.changed() == ["dataset cases"]
+    assert watcher.build() == 1
+    assert watcher.fragments["data/get_counts"] is counts
+    assert watcher.fragments["data/get_dataset_counts"][1]["n_cases_cases"] == 2
+    assert dataset_counts[1]["n_cases_cases"] > 2